@@ -1,109 +1,82 @@
+import os
 import json
 import asyncpg
+import logging
+from metrics import INSERT_BATCH_ROWS, INSERT_BATCH_SECONDS
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+class PostgresBackend:
+    name = "postgres"
+    supports_notify = True
+    migrations_dir = MIGRATIONS_DIR
+    exceptions = asyncpg.exceptions
+
+    async def create_pool(self, dsn):
+        return await asyncpg.create_pool(
+            dsn=dsn,
+            min_size=1,
+            max_size=100
+        )
+
+    async def table_exists(self, conn, table_name):
+        return await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", table_name)
+
+    async def select_rows(self, conn, sql, params):
+        # Rows are aggregated to JSON by Postgres, which is faster than decoding records one by one
+        record = await conn.fetchval(f"SELECT json_agg(t) FROM ({sql}) t", *params)
+        return json.loads(record) if record else None
+
+    def search_condition(self, search_query, threshold):
+        condition = "((similarity(title, %s) > %s OR EXISTS (SELECT 1 FROM jsonb_array_elements_text(additional_info->'tags') AS tag WHERE similarity(tag, %s) > %s ) OR similarity(additional_info->>'creator', %s) > %s) OR title ILIKE %s OR additional_info->>'creator' ILIKE %s OR url ILIKE %s)"
+        pattern = f"%{search_query}%"
+        return condition, [search_query, threshold, search_query, threshold, search_query, threshold, pattern, pattern, pattern]
+
+def get_backend(dsn):
+    if dsn and dsn.startswith("sqlite:"):
+        from sqlite_backend import SQLiteBackend
+        return SQLiteBackend()
+    return PostgresBackend()
 
 class DBManager:
     def __init__(self, dsn=None):
         self.pool = None
         self.dsn = dsn
-        self.exceptions = asyncpg.exceptions
+        self.backend = get_backend(dsn)
+        self.exceptions = self.backend.exceptions
 
     async def get_pool(self, dsn=None):
         if self.pool is None:
-            self.pool = await asyncpg.create_pool(
-                dsn=dsn or self.dsn,
-                min_size=1,
-                max_size=100
-            )
+            self.pool = await self.backend.create_pool(dsn or self.dsn)
         return self.pool
-    
-    async def drop_table(self, pool, table_name=None):
-        async with pool.acquire() as conn:
-            async with conn.transaction():
-                if table_name:  # If a specific table name is provided
-                    await conn.execute(f"""DROP TABLE IF EXISTS {table_name};""")
-                else:  # If no table name is provided, drop all tables listed
-                    await conn.execute("""DROP TABLE IF EXISTS feed_entries;""")
-                    await conn.execute("""DROP TABLE IF EXISTS feed_metadata;""")
-                    await conn.execute("""DROP TABLE IF EXISTS feeds;""")
-                    await conn.execute("""DROP TABLE IF EXISTS categories;""")
-
-    async def create_tables(self, pool):
-        async with pool.acquire() as conn:
-            async with conn.transaction():
-                await conn.execute("""
-                    CREATE TABLE IF NOT EXISTS categories (
-                        id SERIAL PRIMARY KEY,
-                        name TEXT
-                    )
-                """)
-                
-                await conn.execute("""
-                    CREATE TABLE IF NOT EXISTS feeds (
-                        id SERIAL PRIMARY KEY,
-                        name TEXT,
-                        description TEXT,
-                        url TEXT,
-                        category_id INTEGER REFERENCES categories(id)
-                    )
-                """)
-
-                # Create table for feed metadata
-                await conn.execute("""
-                    CREATE TABLE IF NOT EXISTS feed_metadata (
-                        url TEXT PRIMARY KEY,
-                        etag TEXT,
-                        content_length BIGINT,
-                        last_modified TIMESTAMP WITH TIME ZONE,
-                        expires TIMESTAMP WITH TIME ZONE,
-                        last_checked TIMESTAMP WITH TIME ZONE DEFAULT now(),
-                        latest_title TEXT
-                    )
-                """)
-
-                await conn.execute("""
-                    CREATE TABLE IF NOT EXISTS feed_entries (
-                        id BIGSERIAL PRIMARY KEY,
-                        original_link TEXT UNIQUE,
-                        category_id INTEGER REFERENCES categories(id),
-                        title TEXT,
-                        content TEXT,
-                        thumbnail TEXT,
-                        video_id TEXT,
-                        additional_info JSONB,
-                        published_date TIMESTAMP WITH TIME ZONE,
-                        url TEXT
-                    );
-                """)
-
-    async def drop_columns_from_table(self, pool, table_name, columns_to_drop):
-        # Create a single query to drop multiple columns
-        alter_statements = ', '.join([f'DROP COLUMN IF EXISTS {column}' for column in columns_to_drop])
-        drop_columns_query = f'ALTER TABLE {table_name} {alter_statements};'
-        
-        async with pool.acquire() as conn:
-            async with conn.transaction():
-                try:
-                    await conn.execute(drop_columns_query)
-                    print(f"Columns {columns_to_drop} have been dropped from {table_name}")
-                except Exception as e:
-                    print(f"An error occurred: {e}")
+
+    @staticmethod
+    def dsn_from_env(database=None):
+        """Returns DATABASE_URL if set, otherwise builds a Postgres DSN from the DB_* environment variables."""
+        database_url = os.getenv("DATABASE_URL")
+        if database_url and database is None:
+            return database_url
+        db_user = os.getenv("DB_USER")
+        db_pass = os.getenv("DB_PASS")
+        db_host = os.getenv("DB_HOST")
+        db_port = os.getenv("DB_PORT")
+        db_name = database or os.getenv("DB_NAME")
+        return f"postgresql://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}"
 
     async def select_data(self, pool, table_name, query=None, params=None):
         async with pool.acquire() as conn:
             async with conn.transaction():
                 # If a custom query is provided, use it directly
                 if query:
-                    final_query = f"SELECT json_agg(t) FROM (SELECT * FROM {table_name} {query}) t"
+                    final_query = f"SELECT * FROM {table_name} {query}"
                 else:
                     # If no custom query is provided, select all from the table
-                    final_query = f"SELECT json_agg(t) FROM (SELECT * FROM {table_name}) t"
-    
-                print(final_query)
-                if params:
-                    print(*params)
+                    final_query = f"SELECT * FROM {table_name}"
+
+                logging.debug("%s %s", final_query, params or "")
                 # Execute the query with the provided parameters and return the result
-                record = await conn.fetchval(final_query, *params) if params else await conn.fetchval(final_query)
-                return json.loads(record) if record else None
+                rows = await self.backend.select_rows(conn, final_query, params or [])
+                return rows or None
 
     async def delete_data(self, pool, table_name, condition):
         async with pool.acquire() as conn:
@@ -113,7 +86,7 @@ class DBManager:
                 query = f"DELETE FROM {table_name} WHERE {where_clause}"
                 await conn.execute(query, *condition.values())
 
-    async def insert_data(self, pool, table_name, data, on_conflict_action="DO NOTHING", conflict_target=None, update_columns=None):
+    async def insert_data(self, pool, table_name, data, on_conflict_action="DO NOTHING", conflict_target=None, update_columns=None, returning=None):
         # Serialize any JSON fields if necessary
         data = {k: (json.dumps(v) if isinstance(v, (dict, list)) else v) for k, v in data.items()}
 
@@ -144,10 +117,15 @@ class DBManager:
             VALUES({values_placeholders})
             {conflict_clause}
         """
+        if returning:
+            sql += f" RETURNING {returning}"
 
         async with pool.acquire() as conn:
             async with conn.transaction():
                 try:
+                    if returning:
+                        record = await conn.fetchrow(sql, *values)
+                        return dict(record) if record else None
                     await conn.execute(sql, *values)
                 except Exception as e:
                     # Log the exception or re-raise if needed
@@ -180,17 +158,17 @@ class DBManager:
         # SQL template for inserting data
         sql = f"INSERT INTO {table_name}({columns}) VALUES({values_placeholders}) {conflict_clause}"
 
-        # Use a prepared statement
-        async with pool.acquire() as conn:
-            async with conn.transaction():
-                # Prepare the statement once
-                prepared_stmt = await conn.prepare(sql)
-                
-                # Execute the prepared statement with each set of data
-                for row in data_list:
-                    for field in json_fields:
-                        row[field] = json.dumps(row[field])
-                    await prepared_stmt.executemany([list(row.values())])
+        rows = [
+            [json.dumps(value) if key in json_fields else value for key, value in row.items()]
+            for row in data_list
+        ]
+
+        # A single batched executemany, rather than a round-trip per row
+        INSERT_BATCH_ROWS.observe(len(rows), table_name)
+        with INSERT_BATCH_SECONDS.time(table_name):
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.executemany(sql, rows)
 
 class QueryBuilder:
     def __init__(self):
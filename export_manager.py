@@ -0,0 +1,205 @@
+import json
+import hashlib
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape, quoteattr
+from cachetools import LRUCache
+from metrics import CACHE_REQUESTS
+
+OPML_TREE_QUERY = """
+    SELECT c.id AS category_id, c.name AS category_name, f.name, f.url, f.description
+    FROM categories c
+    LEFT JOIN feeds f ON f.category_id = c.id
+    ORDER BY c.id, f.name, f.id
+"""
+
+TIMELINE_QUERY = """
+    SELECT e.id, e.title, e.content, e.thumbnail, e.additional_info, e.published_date, e.original_link, e.url,
+        s.web_name
+    FROM feed_entries e
+    LEFT JOIN feed_sources s ON s.url = e.url
+    WHERE e.category_id = $1
+    ORDER BY e.published_date DESC, e.id DESC
+    LIMIT $2
+"""
+
+FORMATS = {
+    "atom": "application/atom+xml; charset=utf-8",
+    "json": "application/feed+json; charset=utf-8"
+}
+
+
+def load_json(value):
+    # JSONB comes back as text from asyncpg and already decoded from SQLite
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+async def expire_exports(conn, entry_ids):
+    """Bumps the ingest version of the categories holding `entry_ids`, after changing those entries in place."""
+    await conn.execute(
+        "UPDATE categories SET ingest_version = ingest_version + 1 "
+        "WHERE id IN (SELECT category_id FROM feed_entries WHERE id = ANY($1::bigint[]))",
+        list(entry_ids)
+    )
+
+
+def isoformat(value):
+    if value is None:
+        return datetime.now(timezone.utc).isoformat()
+    if isinstance(value, str):
+        return value
+    return value.astimezone(timezone.utc).isoformat()
+
+
+class FeedExporter:
+    """
+    Publishes the subscriptions as OPML and each category's timeline as Atom or JSON Feed.
+
+    OPML is streamed, from a cursor on Postgres. Timelines are rendered once per category ingest
+    version and name, and served from an LRU cache until either changes. Ingest, feed
+    moves and the enrichment pipelines bump the version of the categories they touch.
+    """
+
+    def __init__(self, db_manager, entries=50, cache_size=256):
+        self.db_manager = db_manager
+        self.entries = entries
+        self.rendered = LRUCache(maxsize=cache_size)
+
+    async def stream_opml(self, pool, title="NexaFeed subscriptions"):
+        """Yields the OPML document chunk by chunk, one category at a time."""
+        yield (
+            '<?xml version="1.0" encoding="UTF-8"?>\n<opml version="2.0">\n'
+            f'<head><title>{escape(title)}</title><dateCreated>{datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S GMT")}</dateCreated></head>\n<body>\n'
+        )
+        current = None
+        chunk = []
+        async for row in self.tree_rows(pool):
+            if row['category_id'] != current:
+                if current is not None:
+                    chunk.append('</outline>\n')
+                    yield ''.join(chunk)
+                    chunk = []
+                current = row['category_id']
+                name = row['category_name'] or str(current)
+                chunk.append(f'<outline text={quoteattr(name)} title={quoteattr(name)}>\n')
+            if row['url']:
+                name = row['name'] or row['url']
+                description = f" description={quoteattr(row['description'])}" if row['description'] else ''
+                chunk.append(f'  <outline type="rss" text={quoteattr(name)} title={quoteattr(name)} xmlUrl={quoteattr(row["url"])}{description}/>\n')
+        if current is not None:
+            chunk.append('</outline>\n')
+        yield ''.join(chunk)
+        yield '</body>\n</opml>\n'
+
+    async def tree_rows(self, pool):
+        """Yields the categories and their feeds, from a cursor on Postgres."""
+        if self.db_manager.backend.name == "sqlite":
+            # A SQLite transaction holds the write lock, so the rows are read up front
+            # instead of keeping ingest waiting on a slow download
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(OPML_TREE_QUERY)
+            for row in rows:
+                yield row
+            return
+        async with pool.acquire() as conn:
+            # asyncpg cursors only live inside a transaction
+            async with conn.transaction():
+                async for row in conn.cursor(OPML_TREE_QUERY, prefetch=500):
+                    yield row
+
+    async def render(self, pool, category_id, fmt, base_url):
+        """
+        Returns (body, etag) of the category's timeline in `fmt`, or None if the category doesn't exist.
+
+        Only the category's version is read when the cached rendering is still current.
+        """
+        async with pool.acquire() as conn:
+            category = await conn.fetchrow("SELECT id, name, ingest_version FROM categories WHERE id = $1", category_id)
+            if category is None:
+                return None
+            # The name is part of the rendering too, a rename doesn't bump the version
+            version = (category['ingest_version'], category['name'])
+            key = (category_id, fmt, base_url)
+            cached = self.rendered.get(key)
+            if cached and cached[0] == version:
+                CACHE_REQUESTS.inc("exports", "hit")
+                return cached[1], cached[2]
+            CACHE_REQUESTS.inc("exports", "miss")
+            rows = await conn.fetch(TIMELINE_QUERY, category_id, self.entries)
+
+        entries = [self.entry(row) for row in rows]
+        if fmt == "atom":
+            body = self.atom(category, entries, base_url)
+        else:
+            body = self.json_feed(category, entries, base_url)
+        name_hash = hashlib.blake2b((category['name'] or '').encode(), digest_size=4).hexdigest()
+        etag = f'"{category_id}-{category["ingest_version"]}-{name_hash}-{fmt}"'
+        self.rendered[key] = (version, body, etag)
+        return body, etag
+
+    def entry(self, row):
+        info = load_json(row['additional_info']) or {}
+        source_names = load_json(row['web_name']) or info.get('web_name') or []
+        return {
+            "id": row['id'],
+            "title": row['title'] or '',
+            "content": row['content'] or '',
+            "link": row['original_link'],
+            "image": row['thumbnail'] or None,
+            "published": isoformat(row['published_date']),
+            "author": info.get('creator') or (source_names[0] if source_names else None),
+            "tags": info.get('tags') or []
+        }
+
+    def atom(self, category, entries, base_url):
+        self_url = f"{base_url}api/categories/{category['id']}/feed.atom"
+        updated = entries[0]["published"] if entries else isoformat(None)
+        parts = [
+            '<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom">\n',
+            f'<id>{escape(self_url)}</id>\n<title>{escape(category["name"] or "")}</title>\n<updated>{updated}</updated>\n',
+            f'<link rel="self" href={quoteattr(self_url)}/>\n<link rel="alternate" href={quoteattr(base_url)}/>\n',
+            '<generator>NexaFeed</generator>\n'
+        ]
+        for entry in entries:
+            parts.append('<entry>\n')
+            entry_id = entry["link"] or f"{self_url}#{entry['id']}"
+            parts.append(f'  <id>{escape(entry_id)}</id>\n')
+            parts.append(f'  <title>{escape(entry["title"])}</title>\n')
+            parts.append(f'  <updated>{entry["published"]}</updated>\n  <published>{entry["published"]}</published>\n')
+            if entry["link"]:
+                parts.append(f'  <link rel="alternate" href={quoteattr(entry["link"])}/>\n')
+            if entry["author"]:
+                parts.append(f'  <author><name>{escape(entry["author"])}</name></author>\n')
+            for tag in entry["tags"]:
+                parts.append(f'  <category term={quoteattr(str(tag))}/>\n')
+            if entry["image"]:
+                parts.append(f'  <link rel="enclosure" type="image/*" href={quoteattr(entry["image"])}/>\n')
+            parts.append(f'  <content type="html">{escape(entry["content"])}</content>\n')
+            parts.append('</entry>\n')
+        parts.append('</feed>\n')
+        return ''.join(parts)
+
+    def json_feed(self, category, entries, base_url):
+        feed = {
+            "version": "https://jsonfeed.org/version/1.1",
+            "title": category['name'] or '',
+            "home_page_url": base_url,
+            "feed_url": f"{base_url}api/categories/{category['id']}/feed.json",
+            "items": [
+                {
+                    key: value for key, value in {
+                        "id": entry["link"] or str(entry["id"]),
+                        "url": entry["link"],
+                        "title": entry["title"],
+                        "content_html": entry["content"],
+                        "image": entry["image"],
+                        "date_published": entry["published"],
+                        "authors": [{"name": entry["author"]}] if entry["author"] else None,
+                        "tags": entry["tags"] or None
+                    }.items() if value is not None
+                }
+                for entry in entries
+            ]
+        }
+        return json.dumps(feed, ensure_ascii=False)
@@ -1,15 +1,60 @@
 from rss_fetcher import RSSFetcher
 from db_manager import QueryBuilder
-import time
+from metrics import CATEGORY_FETCH_SECONDS
+from profiler import PROFILER
+
+# Rows per multi-row INSERT, well below the bind parameter limits of both backends
+BULK_CHUNK_ROWS = 1000
+# The steps of apply_changes, in the order they run
+CHANGE_STEPS = ("add_categories", "add_feeds", "move_feeds", "remove_feeds", "remove_categories")
+
+
+def values_list(rows):
+    """Returns the VALUES placeholders of equally long rows and their parameters, flattened."""
+    width = len(rows[0])
+    placeholders = ", ".join(
+        "(" + ", ".join(f"${row * width + column + 1}" for column in range(width)) + ")"
+        for row in range(len(rows))
+    )
+    return placeholders, [value for row in rows for value in row]
+
+
+async def insert_rows(conn, table, columns, rows, returning):
+    """Inserts rows with multi-row INSERTs on an open connection, returns the RETURNING rows."""
+    inserted = []
+    for start in range(0, len(rows), BULK_CHUNK_ROWS):
+        placeholders, params = values_list(rows[start:start + BULK_CHUNK_ROWS])
+        records = await conn.fetch(f"INSERT INTO {table} ({', '.join(columns)}) VALUES {placeholders} RETURNING {returning}", *params)
+        inserted.extend(dict(record) for record in records)
+    return inserted
+
+
+async def check_ids(conn, table, ids):
+    """Raises ValueError unless every id exists in `table`."""
+    if not ids:
+        return
+    found = {row['id'] for row in await conn.fetch(f"SELECT id FROM {table} WHERE id = ANY($1::int[])", list(ids))}
+    missing = sorted(set(ids) - found)
+    if missing:
+        raise ValueError(f"No {table} with id {', '.join(map(str, missing))}")
+
 
 class Feed:
-    def __init__(self, db_manager, config_manager):
+    def __init__(self, db_manager, config_manager, registry=None, reddit_resolver=None, thumbnails=None, pipelines=(), websub=None, suggestions=None, stats=None):
         self.rss_fetcher = None
+        self.websub = websub
+        self.suggestions = suggestions
+        self.stats = stats
+        self.reddit_resolver = reddit_resolver
+        self.thumbnails = thumbnails
+        self.pipelines = pipelines
         self.db_manager = db_manager
         self.config_manager = config_manager
-        self.urls = {}
+        self.registry = registry
     
     async def get_categories(self):
+        if self.registry and self.registry.loaded:
+            return self.registry.get_categories()
         pool = await self.db_manager.get_pool()
         categories = await self.db_manager.select_data(pool, "categories")
         return categories
@@ -17,6 +62,9 @@ class Feed:
     async def get_feeds(self, category):
         if not category:
             return []
+        if self.registry and self.registry.loaded:
+            return self.registry.get_feeds(int(category))
+
         query_builder = QueryBuilder()
 
         # Adding basic conditions
@@ -26,53 +74,181 @@ class Feed:
         query, params = query_builder.build()
         pool = await self.db_manager.get_pool()
         feeds = await self.db_manager.select_data(pool, "feeds", query, params)
-        if feeds:
-            self.urls[category] = [feed['url'] for feed in feeds]
         return feeds
 
+    async def get_urls(self, category):
+        if self.registry and self.registry.loaded:
+            return self.registry.get_urls(int(category))
+        feeds = await self.get_feeds(category)
+        return [feed['url'] for feed in feeds] if feeds else []
+
     async def add_category(self, category_name):
         pool = await self.db_manager.get_pool()
         data = {"name": category_name}
-        await self.db_manager.insert_data(pool, "categories", data)
+        category = await self.db_manager.insert_data(pool, "categories", data, returning="id, name")
+        # Applied right away so the caller reads its own write, the notification that follows is idempotent
+        if category and self.registry:
+            self.registry.upsert_category(category)
 
     async def remove_category(self, category_id):
-        condition_fd = {"category_id": category_id}
-        condition_cg = {"id": category_id}
         pool = await self.db_manager.get_pool()
-        await self.db_manager.delete_data(pool, "feeds", condition_fd)
-        await self.db_manager.delete_data(pool, "feed_entries", condition_fd)
-        await self.db_manager.delete_data(pool, "categories", condition_cg)
+        # Its feeds and entries go with it, through ON DELETE CASCADE
+        await self.db_manager.delete_data(pool, "categories", {"id": category_id})
+        if self.registry:
+            self.registry.remove_category(category_id)
 
     async def add_feed(self, category_id, feed_url):
         pool = await self.db_manager.get_pool()
         data = {"name": feed_url, "url": feed_url, "category_id": category_id}
-        await self.db_manager.insert_data(pool, "feeds", data)
+        feed = await self.db_manager.insert_data(pool, "feeds", data, returning="id, name, url, category_id")
+        if feed and self.registry:
+            self.registry.upsert_feed(feed)
 
     async def remove_feed(self, feed_id):
         pool = await self.db_manager.get_pool()
         condition = {"id": feed_id}
         await self.db_manager.delete_data(pool, "feeds", condition)
+        if self.registry:
+            self.registry.remove_feed(feed_id)
     
-    async def remove_feeds_by_category(self, category_id):
-        condition = {"category_id": category_id}
+    async def apply_changes(self, changes):
+        """
+        Applies a batch of category and feed changes in a single transaction.
+
+        The steps run in this order, each as set-based SQL: add_categories (names),
+        add_feeds ({url, name, category_id}), move_feeds ({ids, category_id}), remove_feeds
+        (ids) and remove_categories (ids). Feeds may point at a category added in the same
+        batch with "category": name instead of "category_id". Removing a category removes
+        its feeds and entries too, moving a feed moves its entries along.
+
+        :raises ValueError: If the batch is malformed or refers to missing rows, in which case nothing changes.
+        :return: A summary with the added categories and the rows each step touched.
+        """
+        unknown = sorted(str(key) for key in set(changes) - set(CHANGE_STEPS))
+        if unknown:
+            raise ValueError(f"Unknown changes {', '.join(unknown)}, expected any of {', '.join(CHANGE_STEPS)}")
+        try:
+            category_names = list(dict.fromkeys(str(name).strip() for name in changes.get("add_categories", []) if str(name).strip()))
+            new_feeds = [(feed.get("name") or feed["url"], feed["url"], feed) for feed in changes.get("add_feeds", []) if feed.get("url")]
+            moves = [([int(feed_id) for feed_id in move["ids"]], move) for move in changes.get("move_feeds", [])]
+            removed_feed_ids = [int(feed_id) for feed_id in changes.get("remove_feeds", [])]
+            removed_category_ids = [int(category_id) for category_id in changes.get("remove_categories", [])]
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise ValueError(f"Malformed changes: {e}")
+
         pool = await self.db_manager.get_pool()
-        await self.db_manager.delete_data(pool, "feeds", condition)
-    
-    async def init_fetch(self, pool, category):
-        start_time = time.time()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                added_categories = await insert_rows(conn, "categories", ("name",), [(name,) for name in category_names], "id, name") if category_names else []
+                ids_by_name = {category['name']: category['id'] for category in added_categories}
+
+                def category_of(item):
+                    if item.get("category") is not None:
+                        if item["category"] not in ids_by_name:
+                            raise ValueError(f"Category {item['category']!r} isn't added in this batch, refer to existing categories by category_id")
+                        return ids_by_name[item["category"]]
+                    try:
+                        return int(item["category_id"])
+                    except (KeyError, TypeError, ValueError):
+                        raise ValueError(f"Missing or invalid category_id in {item}")
 
+                new_feeds = [(name, url, category_of(feed)) for name, url, feed in new_feeds]
+                moves = [(feed_ids, category_of(move)) for feed_ids, move in moves]
+                await check_ids(conn, "categories", {category_id for _, _, category_id in new_feeds} | {category_id for _, category_id in moves})
+                await check_ids(conn, "feeds", {feed_id for feed_ids, _ in moves for feed_id in feed_ids} | set(removed_feed_ids))
+
+                added_feeds = []
+                if new_feeds:
+                    # Feeds already in their category, or listed twice, are added once
+                    existing = await conn.fetch(
+                        "SELECT url, category_id FROM feeds WHERE category_id = ANY($1::int[])",
+                        list({category_id for _, _, category_id in new_feeds})
+                    )
+                    seen = {(row['url'], row['category_id']) for row in existing}
+                    rows = []
+                    for name, url, category_id in new_feeds:
+                        if (url, category_id) not in seen:
+                            seen.add((url, category_id))
+                            rows.append((name, url, category_id))
+                    if rows:
+                        added_feeds = await insert_rows(conn, "feeds", ("name", "url", "category_id"), rows, "id, name, url, category_id")
+
+                moved_feeds = []
+                for feed_ids, category_id in moves:
+                    # Both ends' cached exports change, as the entries move with their feed
+                    await conn.execute(
+                        "UPDATE categories SET ingest_version = ingest_version + 1 "
+                        "WHERE id = $1 OR id IN (SELECT category_id FROM feeds WHERE id = ANY($2::int[]))",
+                        category_id, feed_ids
+                    )
+                    await conn.execute(
+                        "UPDATE feed_entries SET category_id = $1 "
+                        "WHERE (url, category_id) IN (SELECT url, category_id FROM feeds WHERE id = ANY($2::int[]) AND category_id <> $1)",
+                        category_id, feed_ids
+                    )
+                    records = await conn.fetch(
+                        "UPDATE feeds SET category_id = $1 WHERE id = ANY($2::int[]) RETURNING id, name, url, category_id",
+                        category_id, feed_ids
+                    )
+                    moved_feeds.extend(dict(record) for record in records)
+
+                removed_feeds = 0
+                if removed_feed_ids:
+                    status = await conn.execute("DELETE FROM feeds WHERE id = ANY($1::int[])", removed_feed_ids)
+                    removed_feeds = int(status.split()[-1])
+                removed_categories = 0
+                if removed_category_ids:
+                    status = await conn.execute("DELETE FROM categories WHERE id = ANY($1::int[])", removed_category_ids)
+                    removed_categories = int(status.split()[-1])
+
+        # Applied right away so the caller reads its own writes, the notifications that follow are idempotent
+        if self.registry:
+            for category in added_categories:
+                self.registry.upsert_category(category)
+            for feed in added_feeds + moved_feeds:
+                self.registry.upsert_feed(feed)
+            for feed_id in removed_feed_ids:
+                self.registry.remove_feed(feed_id)
+            for category_id in removed_category_ids:
+                self.registry.remove_category(category_id)
+        if self.stats and moved_feeds:
+            # Moved entries count towards their new category from the next refresh on
+            self.stats.invalidate()
+
+        return {
+            "categories": added_categories,
+            "feeds_added": len(added_feeds),
+            "feeds_moved": len(moved_feeds),
+            "feeds_removed": removed_feeds,
+            "categories_removed": removed_categories
+        }
+
+    def get_rss_fetcher(self):
         if not self.rss_fetcher:
-            self.rss_fetcher = RSSFetcher(self.db_manager)
+            self.rss_fetcher = RSSFetcher(
+                self.db_manager, registry=self.registry, reddit_resolver=self.reddit_resolver, thumbnails=self.thumbnails,
+                pipelines=self.pipelines, fetch_log_retention_days=self.config_manager.get("fetch_log.retention_days", 90),
+                websub=self.websub,
+                suggestions=self.suggestions,
+                stats=self.stats,
+                max_body_bytes=self.config_manager.get("feed.max_size_mb", 20) * 1024 * 1024,
+                header_timeout=self.config_manager.get("feed.header_timeout", 15),
+                body_timeout=self.config_manager.get("feed.body_timeout", 60),
+                memory_budget_bytes=self.config_manager.get("feed.memory_budget_mb", 256) * 1024 * 1024
+            )
+        return self.rss_fetcher
+
+    async def init_fetch(self, pool, category):
+        rss_fetcher = self.get_rss_fetcher()
 
-        # Ensure the category exists in the dictionary and has a list initialized
-        if category not in self.urls:
-            await self.get_feeds(category)
-        # If still None cancel
-        if category not in self.urls:
+        urls = await self.get_urls(category)
+        if not urls:
             return False
 
         try:
-            failed_urls, rate_limited_urls = await self.rss_fetcher.fetch_feeds(category, self.urls[category], pool)
+            with CATEGORY_FETCH_SECONDS.time():
+                async with PROFILER.fetch_cycle(f"category {category}"):
+                    failed_urls, rate_limited_urls = await rss_fetcher.fetch_feeds(category, urls, pool)
         except ValueError:
             print("Error: init_fetch did not return enough values.")
             return False
@@ -82,30 +258,51 @@ class Feed:
 
         if self.config_manager.get_boolean("feed.autoclean", False) and not rate_limited_urls and failed_urls:
             # Remove failed feeds from the configuration
-            self.rss_fetcher.remove_failed_feeds(self.config_manager, f'{category}_feed_urls', failed_urls)
+            rss_fetcher.remove_failed_feeds(self.config_manager, f'{category}_feed_urls', failed_urls)
 
-        fetch_duration = time.time() - start_time
-        print(f"Initialized feeds in {fetch_duration:.2f} seconds")
-        
         return True
 
+    async def ingest_push(self, url, body, headers=None):
+        """
+        Stores a WebSub delivery for `url` in the lowest numbered category that follows the feed.
+
+        Entries are unique by link across categories, so like a poll the delivery lands in one
+        category only.
+        """
+        pool = await self.db_manager.get_pool()
+        if self.registry and self.registry.loaded:
+            categories = self.registry.get_categories_of(url)
+        else:
+            async with pool.acquire() as conn:
+                categories = [row['category_id'] for row in await conn.fetch("SELECT DISTINCT category_id FROM feeds WHERE url = $1", url)]
+        if not categories:
+            return 0
+        new_entries = await self.get_rss_fetcher().ingest_push(pool, url, min(categories), body, headers)
+        print(f"WebSub delivery for {url}: {new_entries} new entries")
+        return new_entries
+
+    async def close(self):
+        if self.rss_fetcher:
+            await self.rss_fetcher.close()
+
+    async def get_sources(self, feed_items):
+        """Returns the source profile of every feed appearing in `feed_items`, keyed by feed url."""
+        if not feed_items:
+            return {}
+        rss_fetcher = self.get_rss_fetcher()
+        pool = await self.db_manager.get_pool()
+        return await rss_fetcher.sources.for_urls(pool, [item['url'] for item in feed_items])
+
     async def get_feed_items(self, category, limit, last_id=None, last_pd=None, search_query=None, force_init=False):
-        start_time = time.time()
         feed_items = []
 
-        if not self.rss_fetcher:
-            self.rss_fetcher = RSSFetcher(self.db_manager)
+        rss_fetcher = self.get_rss_fetcher()
 
         pool = await self.db_manager.get_pool()
         if force_init:
-            print(force_init, search_query)
             response = await self.init_fetch(pool, category)
             if not response:
                 return []
 
-        feed_items = await self.rss_fetcher.get_feed(pool, category, limit, last_id, last_pd, search_query)
-
-        fetch_duration = time.time() - start_time
-        print(f"Fetched in {fetch_duration:.2f} seconds")
-        
+        feed_items = await rss_fetcher.get_feed(pool, category, limit, last_id, last_pd, search_query)
         return feed_items
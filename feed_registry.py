@@ -0,0 +1,226 @@
+import json
+import asyncio
+import logging
+
+
+class FeedRegistry:
+    """
+    In-memory copy of the feeds and categories tables.
+
+    Feeds live in parallel lists indexed by slot, so a lookup by id, url or category
+    never touches the database. Freed slots are reused by the next inserted feed.
+    Other processes' changes arrive through the `feed_registry` NOTIFY channel.
+    """
+    CHANNEL = "feed_registry"
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self.ids = []
+        self.names = []
+        self.urls = []
+        self.category_ids = []
+        # Per-feed fetch state, kept next to the feed so the fetcher can skip feed_metadata reads
+        self.fetch_states = []
+        self.free_slots = []
+        self.slot_by_id = {}
+        self.slots_by_url = {}
+        self.slots_by_category = {}
+        self.categories = {}
+        self.loaded = False
+        self.listener_conn = None
+        self.pool = None
+
+    async def load(self, pool):
+        """Bulk loads every category, feed and its fetch state in three queries."""
+        async with pool.acquire() as conn:
+            categories = await conn.fetch("SELECT id, name FROM categories")
+            feeds = await conn.fetch("SELECT id, name, url, category_id FROM feeds")
+            metadata = await conn.fetch("SELECT url, etag, last_checked, expires FROM feed_metadata")
+
+        self.clear()
+        for category in categories:
+            self.upsert_category(dict(category))
+        for feed in feeds:
+            self.upsert_feed(dict(feed))
+        for state in metadata:
+            state = dict(state)
+            for slot in self.slots_by_url.get(state.pop("url"), ()):
+                self.fetch_states[slot].update(state)
+        self.loaded = True
+        print(f"Feed registry loaded {len(self.slot_by_id)} feeds in {len(self.categories)} categories")
+
+    def clear(self):
+        self.ids.clear()
+        self.names.clear()
+        self.urls.clear()
+        self.category_ids.clear()
+        self.fetch_states.clear()
+        self.free_slots.clear()
+        self.slot_by_id.clear()
+        self.slots_by_url.clear()
+        self.slots_by_category.clear()
+        self.categories.clear()
+
+    def upsert_category(self, row):
+        self.categories[row["id"]] = {"id": row["id"], "name": row.get("name")}
+        self.slots_by_category.setdefault(row["id"], set())
+
+    def remove_category(self, category_id):
+        self.categories.pop(category_id, None)
+        for slot in list(self.slots_by_category.get(category_id, ())):
+            self.remove_feed(self.ids[slot])
+        self.slots_by_category.pop(category_id, None)
+
+    def upsert_feed(self, row):
+        feed_id = row["id"]
+        slot = self.slot_by_id.get(feed_id)
+        if slot is None:
+            if self.free_slots:
+                slot = self.free_slots.pop()
+            else:
+                slot = len(self.ids)
+                self.ids.append(None)
+                self.names.append(None)
+                self.urls.append(None)
+                self.category_ids.append(None)
+                self.fetch_states.append(None)
+            self.ids[slot] = feed_id
+            self.fetch_states[slot] = {}
+            self.slot_by_id[feed_id] = slot
+        else:
+            self._unindex(slot)
+
+        self.names[slot] = row.get("name")
+        self.urls[slot] = row.get("url")
+        self.category_ids[slot] = row.get("category_id")
+        self.slots_by_url.setdefault(self.urls[slot], set()).add(slot)
+        self.slots_by_category.setdefault(self.category_ids[slot], set()).add(slot)
+
+    def remove_feed(self, feed_id):
+        slot = self.slot_by_id.pop(feed_id, None)
+        if slot is None:
+            return
+        self._unindex(slot)
+        self.ids[slot] = None
+        self.names[slot] = None
+        self.urls[slot] = None
+        self.category_ids[slot] = None
+        self.fetch_states[slot] = None
+        self.free_slots.append(slot)
+
+    def _unindex(self, slot):
+        url_slots = self.slots_by_url.get(self.urls[slot])
+        if url_slots is not None:
+            url_slots.discard(slot)
+            if not url_slots:
+                del self.slots_by_url[self.urls[slot]]
+        category_slots = self.slots_by_category.get(self.category_ids[slot])
+        if category_slots is not None:
+            category_slots.discard(slot)
+
+    def feed_at(self, slot):
+        return {
+            "id": self.ids[slot],
+            "name": self.names[slot],
+            "url": self.urls[slot],
+            "category_id": self.category_ids[slot]
+        }
+
+    def get_categories(self):
+        return sorted(self.categories.values(), key=lambda category: category["id"])
+
+    def has_category(self, category_id):
+        return category_id in self.categories
+
+    def get_feed(self, feed_id):
+        slot = self.slot_by_id.get(feed_id)
+        return self.feed_at(slot) if slot is not None else None
+
+    def get_feeds(self, category_id):
+        feeds = [self.feed_at(slot) for slot in self.slots_by_category.get(category_id, ())]
+        feeds.sort(key=lambda feed: feed["name"] or "")
+        return feeds
+
+    def get_urls(self, category_id):
+        return list({self.urls[slot] for slot in self.slots_by_category.get(category_id, ())})
+
+    def get_categories_of(self, url):
+        return list({self.category_ids[slot] for slot in self.slots_by_url.get(url, ())})
+
+    def get_fetch_state(self, url):
+        """Returns the last known fetch state of a feed url, or None if it isn't registered."""
+        slots = self.slots_by_url.get(url)
+        if not slots:
+            return None
+        return self.fetch_states[next(iter(slots))]
+
+    def update_fetch_state(self, url, **state):
+        for slot in self.slots_by_url.get(url, ()):
+            self.fetch_states[slot].update(state)
+
+    def apply_change(self, table, op, row):
+        if table == "categories":
+            if op == "DELETE":
+                self.remove_category(row["id"])
+            else:
+                self.upsert_category(row)
+        elif table == "feeds":
+            if op == "DELETE":
+                self.remove_feed(row["id"])
+            else:
+                self.upsert_feed(row)
+
+    async def refresh(self, pool):
+        """Reloads after bulk changes when no notifications will report them."""
+        if self.listener_conn is None:
+            await self.load(pool)
+
+    def on_notification(self, connection, pid, channel, payload):
+        try:
+            change = json.loads(payload)
+            self.apply_change(change["table"], change["op"], change["row"])
+        except (ValueError, KeyError) as e:
+            logging.error(f"Invalid feed registry notification {payload!r}: {e}")
+
+    def on_listener_closed(self, connection):
+        logging.warning("Feed registry listener connection lost, reconnecting")
+        self.listener_conn = None
+        asyncio.get_running_loop().create_task(self.listen(self.pool))
+
+    async def listen(self, pool, retry_delay=5):
+        """
+        Subscribes to change notifications, then reloads so no change made in between is missed.
+
+        :param retry_delay: Seconds to wait between attempts, or None to raise on the first failure.
+        """
+        self.pool = pool
+        if not self.db_manager.backend.supports_notify:
+            # Single process backends only change through this process, which updates the registry itself
+            await self.load(pool)
+            return
+        while self.listener_conn is None:
+            try:
+                await self.subscribe(pool)
+            except Exception as e:
+                if retry_delay is None:
+                    raise
+                logging.error(f"Feed registry could not listen for changes: {e}")
+                await asyncio.sleep(retry_delay)
+
+    async def subscribe(self, pool):
+        conn = await pool.acquire()
+        try:
+            await conn.add_listener(self.CHANNEL, self.on_notification)
+            conn.add_termination_listener(self.on_listener_closed)
+            await self.load(pool)
+        except Exception:
+            await pool.release(conn)
+            raise
+        self.listener_conn = conn
+
+    async def close(self):
+        if self.listener_conn is not None:
+            conn, self.listener_conn = self.listener_conn, None
+            conn.remove_termination_listener(self.on_listener_closed)
+            await conn.remove_listener(self.CHANNEL, self.on_notification)
+            await self.pool.release(conn)
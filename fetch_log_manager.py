@@ -0,0 +1,146 @@
+from datetime import datetime, timezone, timedelta
+
+REPORTS = {
+    # Average and worst download time of the feeds that answered with content
+    "slowest": """
+        SELECT url, count(*) AS fetches, CAST(round(avg(duration_ms)) AS INTEGER) AS avg_ms, max(duration_ms) AS max_ms
+        FROM feed_fetch_log
+        WHERE fetched_at >= $1 AND status = 200
+        GROUP BY url
+        ORDER BY avg_ms DESC
+        LIMIT $2
+    """,
+    "biggest": """
+        SELECT url, count(*) AS fetches, CAST(round(avg(bytes)) AS INTEGER) AS avg_bytes, sum(bytes) AS total_bytes
+        FROM feed_fetch_log
+        WHERE fetched_at >= $1 AND status = 200
+        GROUP BY url
+        ORDER BY total_bytes DESC
+        LIMIT $2
+    """,
+    # Feeds answering every poll without a single new entry, the candidates for longer poll intervals.
+    # Feeds that only fail are left to the failing report.
+    "idle": """
+        SELECT url, count(*) AS fetches, sum(bytes) AS total_bytes, max(fetched_at) AS last_fetched_at
+        FROM feed_fetch_log
+        WHERE fetched_at >= $1
+        GROUP BY url
+        HAVING sum(new_entries) = 0 AND sum(CASE WHEN status IN (200, 304) THEN 1 ELSE 0 END) > 0
+        ORDER BY fetches DESC, total_bytes DESC
+        LIMIT $2
+    """,
+    # Consecutive failures since each feed's last success, or over the whole window if it never succeeded
+    "failing": """
+        SELECT log.url, count(*) AS failures, min(log.fetched_at) AS failing_since,
+            max(log.fetched_at) AS last_failure_at, max(ok.last_ok) AS last_success_at
+        FROM feed_fetch_log log
+        LEFT JOIN (
+            SELECT url, max(fetched_at) AS last_ok
+            FROM feed_fetch_log
+            WHERE fetched_at >= $1 AND status IN (200, 304)
+            GROUP BY url
+        ) ok ON ok.url = log.url
+        WHERE log.fetched_at >= $1 AND (ok.last_ok IS NULL OR log.fetched_at > ok.last_ok)
+        GROUP BY log.url
+        ORDER BY failures DESC
+        LIMIT $2
+    """
+}
+
+
+def partition_name(month):
+    return f"feed_fetch_log_y{month:%Y}m{month:%m}"
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def as_datetime(value):
+    # SQLite returns aggregated timestamps as text
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+class FetchLog:
+    """
+    Append-only per-feed fetch history in feed_fetch_log, written once per fetch cycle.
+
+    On Postgres the table is partitioned by month: partitions are created before the
+    first write into a month and expire whole. SQLite keeps one table and deletes rows.
+    """
+
+    def __init__(self, db_manager, retention_days=90):
+        self.db_manager = db_manager
+        self.retention_days = retention_days
+        self.partitions = set()
+        self.pruned_at = None
+
+    @property
+    def partitioned(self):
+        return self.db_manager.backend.name == "postgres"
+
+    async def ensure_partitions(self, conn, timestamps):
+        for month in {month_start(timestamp) for timestamp in timestamps} - self.partitions:
+            await conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF feed_fetch_log "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+            )
+            self.partitions.add(month)
+
+    async def write(self, pool, rows):
+        """Appends the rows of one fetch cycle."""
+        if not rows:
+            return
+        if self.partitioned:
+            async with pool.acquire() as conn:
+                await self.ensure_partitions(conn, [row['fetched_at'] for row in rows])
+        await self.db_manager.insert_many(pool, "feed_fetch_log", rows)
+        # Expiry runs at most daily, piggybacking on the fetch cycles
+        now = datetime.now(timezone.utc)
+        if self.pruned_at is None or now - self.pruned_at > timedelta(days=1):
+            self.pruned_at = now
+            await self.prune(pool)
+
+    async def prune(self, pool):
+        """Drops history older than the retention period, returns how many partitions or rows went."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+        async with pool.acquire() as conn:
+            if not self.partitioned:
+                status = await conn.execute("DELETE FROM feed_fetch_log WHERE fetched_at < $1", cutoff)
+                return int(status.split()[-1])
+
+            rows = await conn.fetch("""
+                SELECT child.relname FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = 'feed_fetch_log'
+            """)
+            dropped = 0
+            for row in rows:
+                name = row['relname']
+                try:
+                    month = datetime.strptime(name, "feed_fetch_log_y%Ym%m").replace(tzinfo=timezone.utc)
+                except ValueError:
+                    continue
+                # A partition only goes once all of its month is past the cutoff
+                if next_month(month) <= cutoff:
+                    await conn.execute(f"DROP TABLE IF EXISTS {name}")
+                    self.partitions.discard(month)
+                    dropped += 1
+            return dropped
+
+    async def report(self, pool, name, days=7, limit=20):
+        """Returns the rows of one of REPORTS over the last `days` days."""
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(REPORTS[name], since, limit)
+        return [
+            {key: as_datetime(value) if key.endswith("_at") or key.endswith("_since") else value for key, value in dict(row).items()}
+            for row in rows
+        ]
@@ -0,0 +1,126 @@
+import re
+import json
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from pipeline import Pipeline
+from export_manager import expire_exports
+
+# Compile the regular expression for performance
+CLEAN_TEXT_PATTERN = re.compile(r'<[^<]+?>|http\S+|[^A-Za-z ]+')
+URL_PATTERN = re.compile(r'https?://\S+')
+NUMBER_PATTERN = re.compile(r'\d+')
+MAX_TEXT_LENGTH = 5000
+
+# Set once per worker process by init_worker, so extractors aren't rebuilt per entry
+extractor = None
+
+def clean_text(text):
+    """
+    Clean the input text by removing HTML tags, URLs, special characters, and numbers.
+
+    Args:
+    text (str): The text to be cleaned.
+
+    Returns:
+    str: The cleaned text.
+    """
+    return CLEAN_TEXT_PATTERN.sub('', text)
+
+def is_valid_tag(tag):
+    """
+    Check if the tag is valid by ensuring it's not a URL, not purely numerical, and within a certain length range.
+
+    Args:
+    tag (str): The tag to be validated.
+
+    Returns:
+    bool: True if the tag is valid, False otherwise.
+    """
+    return not (URL_PATTERN.match(tag) or NUMBER_PATTERN.fullmatch(tag) or len(tag) < 3 or len(tag) > 50)
+
+def init_worker(max_ngram_size, num_keywords, deduplication_threshold):
+    global extractor
+    import yake
+    extractor = yake.KeywordExtractor(n=max_ngram_size, dedupLim=deduplication_threshold, top=num_keywords, features=None)
+
+def extract_tags(texts):
+    """
+    Extract keywords for a batch of texts with the worker's extractor.
+
+    Args:
+    texts (list): Cleaned texts, one per entry.
+
+    Returns:
+    list: A list of tags per text, empty where extraction failed.
+    """
+    tags = []
+    for text in texts:
+        try:
+            tags.append([kw for kw, _ in extractor.extract_keywords(text) if is_valid_tag(kw)])
+        except Exception as e:
+            print("An error occurred in extract_tags:", e)
+            tags.append([])
+    return tags
+
+class KeywordTagger(Pipeline):
+    """
+    Adds YAKE keywords as tags to entries whose feed supplied none.
+
+    Entries are queued in batches of `chunk_size`, each handed to a worker process in
+    one call, and the tags are written back with one executemany per flush.
+    """
+    name = "keyword tagging"
+    UPDATE_QUERIES = {
+        "postgres": """
+            UPDATE feed_entries
+            SET additional_info = jsonb_set(coalesce(additional_info, '{}'::jsonb), '{tags}', $2::jsonb) || '{"auto_tagged": true}'::jsonb
+            WHERE id = $1 AND NOT coalesce(additional_info, '{}'::jsonb) ? 'auto_tagged'
+        """,
+        "sqlite": """
+            UPDATE feed_entries
+            SET additional_info = json_set(coalesce(additional_info, '{}'), '$.tags', json($2), '$.auto_tagged', json('true'))
+            WHERE id = $1 AND json_extract(coalesce(additional_info, '{}'), '$.auto_tagged') IS NULL
+        """
+    }
+
+    def __init__(self, db_manager, processes=2, chunk_size=32, max_ngram_size=3, num_keywords=5, deduplication_threshold=0.9, suggestions=None, **kwargs):
+        # One coroutine per process keeps every process busy without queueing inside the executor
+        super().__init__(workers=processes, **kwargs)
+        self.db_manager = db_manager
+        self.chunk_size = chunk_size
+        self.suggestions = suggestions
+        self.executor = ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=init_worker,
+            initargs=(max_ngram_size, num_keywords, deduplication_threshold)
+        )
+
+    def enqueue(self, entries):
+        untagged = [entry for entry in entries if not (entry['additional_info'] or {}).get('tags')]
+        chunks = [untagged[i:i + self.chunk_size] for i in range(0, len(untagged), self.chunk_size)]
+        return self.submit([
+            [(entry['id'], clean_text(f"{entry['title']} {entry['content']}")[:MAX_TEXT_LENGTH]) for entry in chunk]
+            for chunk in chunks
+        ])
+
+    async def process(self, chunk):
+        texts = [text for _, text in chunk]
+        tags = await asyncio.get_running_loop().run_in_executor(self.executor, extract_tags, texts)
+        return [(entry_id, entry_tags) for (entry_id, _), entry_tags in zip(chunk, tags) if entry_tags]
+
+    async def write(self, results):
+        rows = [(entry_id, json.dumps(tags)) for chunk in results for entry_id, tags in chunk]
+        if not rows:
+            return
+        pool = await self.db_manager.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                # Only the keys the tagger owns are set, and entries already tagged are left alone
+                await conn.executemany(self.UPDATE_QUERIES[self.db_manager.backend.name], rows)
+                await expire_exports(conn, [entry_id for entry_id, _ in rows])
+        if self.suggestions is not None:
+            self.suggestions.add_tags(tag for chunk in results for _, tags in chunk for tag in tags)
+
+    async def close(self):
+        await super().close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
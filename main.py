@@ -1,20 +1,42 @@
-from quart import Quart, render_template, jsonify, request
+import time
+# Taken before any other import so the startup report covers import time too
+BOOT_STARTED = time.perf_counter()
+
+from quart import Quart, Response, render_template, jsonify, request, redirect, send_file, g
 from functools import wraps
 from config_manager import ConfigManager
 from db_manager import DBManager
 from feed_manager import Feed
+from feed_registry import FeedRegistry
 from cache_manager import Cache
+from rate_limiter import RateLimiter
+from migration_manager import MigrationManager, SchemaOutdatedError
+from read_state_manager import ReadStateManager, DEFAULT_USER
+from opml_importer import OPMLImporter
+from export_manager import FeedExporter, FORMATS
+from fetch_log_manager import REPORTS as FETCH_LOG_REPORTS
+from websub_manager import WebSubManager
+from suggest_manager import SuggestionIndex
+from stats_manager import FeedStats
+import metrics
+from profiler import PROFILER
 import os
+import asyncio
 import xml.etree.ElementTree as ET
 import traceback
 from datetime import timedelta
 from aiohttp import ClientError, ServerTimeoutError
 from ngrok_manager import NgrokManager
-from reddit_fetcher import fetch_reddit_media
+from reddit_fetcher import RedditMediaResolver, REDDIT_API_BASE
+from thumbnail_manager import ThumbnailManager, DEFAULT_WIDTHS
+from og_image_fetcher import OGImageEnricher
+from keyword_tagger import KeywordTagger
+import hmac
 import base64
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 load_dotenv()
+IMPORTS_DONE = time.perf_counter()
 
 recent_requests = {}
 
@@ -23,30 +45,23 @@ config_manager = ConfigManager()
 cache = Cache(config_manager).get()
 app.feed = None
 app.db_manager = None
+app.thumbnails = None
+app.pipelines = []
+app.websub = None
+app.suggestions = None
+app.stats = None
+app.first_request_served = False
 
-# Dictionary to store request counts and timestamps
-clients = {}
-
-async def rate_limit(client_id, limit, time_window):
-    current_time = datetime.now()
-    request_info = clients.get(client_id, {"count": 0, "time": current_time})
-
-    # Reset count if time_window has passed
-    if current_time - request_info["time"] > timedelta(seconds=time_window):
-        request_info = {"count": 1, "time": current_time}
-    else:
-        request_info["count"] += 1
-
-    clients[client_id] = request_info
-    return request_info["count"] <= limit
+limiter = RateLimiter(config_manager)
 
 def rate_limiter(limit, time_window):
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
             client_id = request.remote_addr
-            if not await rate_limit(client_id, limit, time_window):
-                return jsonify({"error": "rate limit exceeded"}), 429
+            allowed, retry_after = await limiter.hit(func.__name__, client_id, limit, time_window)
+            if not allowed:
+                return jsonify({"error": "rate limit exceeded"}), 429, {"Retry-After": str(retry_after)}
             return await func(*args, **kwargs)
         return wrapper
     return decorator
@@ -84,8 +99,18 @@ async def paginate(category):
     force_init = request.args.get('force_init', False)
 
     limit = config_manager.get("app.feed.size", 20)
+    started = time.perf_counter()
     paginated_feeds = await app.feed.get_feed_items(category, limit, last_id, last_pd, search_query, force_init)
-    return jsonify(feed_items=paginated_feeds)
+    if app.thumbnails is not None:
+        for item in paginated_feeds or []:
+            if item.get('thumbnail'):
+                item['thumbnail_sig'] = app.thumbnails.sign(item['thumbnail'])
+    sources = await app.feed.get_sources(paginated_feeds)
+    fetched = time.perf_counter()
+    response = jsonify(feed_items=paginated_feeds, sources=sources)
+    # Lets load tests and browser devtools split database time from serialization time
+    response.headers['Server-Timing'] = f"db;dur={(fetched - started) * 1000:.1f}, serialize;dur={(time.perf_counter() - fetched) * 1000:.1f}"
+    return response
 
 @app.route('/refresh', methods=['GET'])
 @rate_limiter(limit=1, time_window=60)
@@ -100,8 +125,119 @@ def refresh_config():
 @app.route('/api/reddit/<string:uri>', methods=['GET'])
 async def reddit_media(uri):
     url = base64.b64decode(uri).decode()
-    media = fetch_reddit_media(url)
-    return jsonify({"media": media})
+    media = await app.reddit_resolver.resolve(url)
+    return jsonify({"media": media or None})
+
+@app.route('/api/thumbnail/<int:width>/<string:uri>', methods=['GET'])
+async def thumbnail(width, uri):
+    if app.thumbnails is None:
+        return jsonify({"error": "Thumbnails are disabled"}), 404
+    try:
+        url = base64.urlsafe_b64decode(uri + "=" * (-len(uri) % 4)).decode()
+    except ValueError:
+        return jsonify({"error": "Malformed thumbnail url"}), 400
+    # Only urls the feed API signed are fetched, anything else would make this an open proxy
+    if not app.thumbnails.verify(url, request.args.get('s')):
+        return jsonify({"error": "Invalid thumbnail signature"}), 403
+    result = await app.thumbnails.get(url, width)
+    if result is None:
+        # Let the browser try the original rather than showing a broken image
+        return redirect(url)
+
+    path, etag = result
+    if request.headers.get('If-None-Match') == etag:
+        response = await app.make_response(("", 304))
+    else:
+        response = await send_file(path, mimetype="image/webp")
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = "public, max-age=31536000, immutable"
+    return response
+
+def current_user():
+    return request.headers.get('X-NexaFeed-User', DEFAULT_USER)
+
+def is_admin():
+    # Internal endpoints stay closed unless NEXAFEED_ADMIN_TOKEN is set
+    token = os.environ.get('NEXAFEED_ADMIN_TOKEN')
+    return bool(token) and hmac.compare_digest(request.headers.get('X-NexaFeed-Admin', ''), token)
+
+@app.before_request
+async def start_profile():
+    if (request.args.get('profile') == '1' and is_admin()) or PROFILER.sampled("request"):
+        g.profile = PROFILER.start("request", f"{request.method} {request.full_path}")
+
+@app.after_request
+async def finish_profile(response):
+    capture = g.pop('profile', None)
+    if capture is not None:
+        response.headers['X-Profile'] = f"/api/profiles/{PROFILER.stop(capture)}"
+    return response
+
+@app.teardown_request
+async def abandon_profile(exception):
+    # Requests that raised never reach after_request
+    capture = g.pop('profile', None)
+    if capture is not None:
+        PROFILER.stop(capture)
+
+@app.route('/api/profiles')
+async def list_profiles():
+    if not is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify(profiles=[dict(profile, url=f"/api/profiles/{profile['id']}") for profile in PROFILER.list()])
+
+@app.route('/api/profiles/<string:profile_id>')
+async def download_profile(profile_id):
+    if not is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    if request.args.get('format') == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in ('cumulative', 'tottime', 'calls'):
+            return jsonify({"error": "Unsupported sort"}), 400
+        summary = PROFILER.summary(profile_id, sort)
+        if summary is None:
+            return jsonify({"error": "Profile not found"}), 404
+        return summary, 200, {"Content-Type": "text/plain; charset=utf-8"}
+
+    path = PROFILER.path(profile_id)
+    if path is None:
+        return jsonify({"error": "Profile not found"}), 404
+    # Open with `python -m pstats` or snakeviz
+    return await send_file(path, mimetype="application/octet-stream", as_attachment=True, attachment_filename=f"{profile_id}.pstats")
+
+@app.route('/api/unread')
+async def unread_counts():
+    pool = await app.db_manager.get_pool()
+    counts = await app.read_state.unread_counts(pool, current_user())
+    return jsonify(unread=counts)
+
+@app.route('/api/categories/<int:category_id>/read', methods=['POST'])
+async def mark_category_read(category_id):
+    data = await request.get_json(silent=True) or {}
+    if data.get('last_id') is None or not data.get('last_pd'):
+        return jsonify({"error": "last_id and last_pd of the newest loaded entry are required"}), 400
+    try:
+        last_id = int(data['last_id'])
+        last_pd = app.read_state.parse_cursor_date(data['last_pd'])
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({"error": "last_id must be an integer and last_pd a date"}), 400
+    pool = await app.db_manager.get_pool()
+    await app.read_state.mark_read_until(pool, category_id, last_id, last_pd, current_user())
+    return jsonify({"message": "Category marked as read"}), 200
+
+@app.route('/api/entries/read', methods=['POST'])
+async def mark_entries_read():
+    data = await request.get_json(silent=True) or {}
+    entry_ids = data.get('ids')
+    if not entry_ids or not isinstance(entry_ids, list):
+        return jsonify({"error": "Entry ids are required"}), 400
+    try:
+        entry_ids = [int(entry_id) for entry_id in entry_ids]
+    except (TypeError, ValueError):
+        return jsonify({"error": "Entry ids must be integers"}), 400
+    pool = await app.db_manager.get_pool()
+    await app.read_state.mark_entries_read(pool, entry_ids, current_user())
+    return jsonify({"message": "Entries marked as read"}), 200
 
 @app.route('/api/sidebar')
 async def render_sidebar():
@@ -128,8 +264,6 @@ async def add_category():
 
 @app.route('/api/categories/<int:category_id>', methods=['DELETE'])
 async def remove_category(category_id):
-    # First, remove all feeds associated with this category
-    await app.feed.remove_feeds_by_category(category_id)
     await app.feed.remove_category(category_id)
     return jsonify({"message": "Category removed successfully"}), 200
 
@@ -147,6 +281,17 @@ async def remove_feed(feed_id):
     await app.feed.remove_feed(feed_id)
     return jsonify({"message": "Feed removed successfully"}), 200
 
+@app.route('/api/bulk', methods=['POST'])
+async def bulk_changes():
+    data = await request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "A JSON object of changes is required"}), 400
+    try:
+        summary = await app.feed.apply_changes(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(summary), 200
+
 @app.route('/api/categories/<int:category_id>/import', methods=['POST'])
 async def import_opml(category_id):
     # Check if the post request has the file part
@@ -158,40 +303,109 @@ async def import_opml(category_id):
         return jsonify({'error': 'No selected file'}), 400
 
     try:
-        # Parse the OPML file
-        tree = ET.parse(file)
-        root = tree.getroot()
-
-        # Extract feeds from the OPML file
-        feeds = []
-        for outline in root.findall(".//outline[@type='rss']"):
-            feed = {
-                'name': outline.get('title', ''),
-                'url': outline.get('xmlUrl', ''),
-                'category_id': category_id
-            }
-            feeds.append(feed)
-
         pool = await app.db_manager.get_pool()
-        # Insert feeds into the database
-        await app.db_manager.insert_many(
-            pool=pool,  # Database connection pool
-            table_name='feeds',
-            data_list=feeds,
-            on_conflict_action="DO NOTHING"
-        )
-
-        return jsonify({'feeds': feeds}), 201
+        validate = request.args.get('validate', '').lower() in ('1', 'true', 'yes')
+        summary = await app.opml_importer.import_opml(pool, file.stream, category_id, validate=validate)
+        return jsonify(summary), 201
 
+    except ET.ParseError as e:
+        return jsonify({'error': f"Invalid OPML: {e}"}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/metrics')
+async def metrics_endpoint():
+    if not metrics.Metric.enabled:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+@app.route('/api/fetch-log/<string:report>')
+async def fetch_log_report(report):
+    if report not in FETCH_LOG_REPORTS:
+        return jsonify({"error": f"Unknown report, use one of {', '.join(FETCH_LOG_REPORTS)}"}), 404
+    days = request.args.get('days', 7, type=float)
+    limit = min(request.args.get('limit', 20, type=int), 500)
+    pool = await app.db_manager.get_pool()
+    rows = await app.feed.get_rss_fetcher().fetch_log.report(pool, report, days, limit)
+    return jsonify(report=report, days=days, feeds=rows)
+
+@app.route('/api/stats')
+async def feed_stats():
+    if app.stats is None:
+        return jsonify({"error": "Statistics are disabled"}), 404
+    pool = await app.db_manager.get_pool()
+    return jsonify(await app.stats.get(pool, request.args.get('category_id', type=int)))
+
+@app.route('/api/suggest')
+async def suggest():
+    query = request.args.get('q', '')
+    if app.suggestions is None:
+        return jsonify(q=query, suggestions=[])
+    limit = min(request.args.get('limit', app.suggestions.limit, type=int), 50)
+    return jsonify(q=query, suggestions=app.suggestions.lookup(query, limit))
+
+@app.route('/api/websub/<int:subscription_id>', methods=['GET'])
+async def websub_verify(subscription_id):
+    if app.websub is None:
+        return jsonify({"error": "WebSub is disabled"}), 404
+    pool = await app.db_manager.get_pool()
+    challenge = await app.websub.verify(pool, subscription_id, request.args)
+    if challenge is None:
+        return "", 404
+    return challenge, 200, {"Content-Type": "text/plain"}
+
+@app.route('/api/websub/<int:subscription_id>', methods=['POST'])
+async def websub_deliver(subscription_id):
+    if app.websub is None:
+        return jsonify({"error": "WebSub is disabled"}), 404
+    body = await request.get_data()
+    pool = await app.db_manager.get_pool()
+    url = await app.websub.receive(pool, subscription_id, body, request.headers.get('X-Hub-Signature'))
+    if url is None:
+        return "", 404
+    if url:
+        # Acknowledged right away, hubs retry deliveries that take too long to answer
+        app.add_background_task(app.feed.ingest_push, url, body, {key: value for key, value in request.headers.items()})
+    # Deliveries with a bad signature are acknowledged too, then dropped, as the spec asks
+    return "", 202
+
+@app.route('/api/export/opml')
+async def export_opml():
+    pool = await app.db_manager.get_pool()
+    return Response(
+        app.exporter.stream_opml(pool),
+        mimetype="text/x-opml",
+        headers={"Content-Disposition": 'attachment; filename="nexafeed.opml"'}
+    )
+
+@app.route('/api/categories/<int:category_id>/feed.<string:fmt>')
+async def export_category(category_id, fmt):
+    if fmt not in FORMATS:
+        return jsonify({"error": "Unsupported format"}), 404
+    pool = await app.db_manager.get_pool()
+    result = await app.exporter.render(pool, category_id, fmt, request.host_url)
+    if result is None:
+        return jsonify({"error": "Category not found"}), 404
+
+    body, etag = result
+    if request.headers.get('If-None-Match') == etag:
+        response = await app.make_response(("", 304))
+    else:
+        response = await app.make_response((body, 200, {"Content-Type": FORMATS[fmt]}))
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = f"public, max-age={config_manager.get('export.max_age', 300)}"
+    return response
+
 @app.before_serving
 async def startup():
     try:
-        await setup_postgresql()
+        await setup_database()
+    except SchemaOutdatedError as e:
+        # Serving from an outdated schema fails request by request, so startup stops here
+        print(f"Error during database startup: {e}")
+        raise
     except Exception as e:
-        print(f"Error during PostgreSQL startup: {e}")
+        print(f"Error during database startup: {e}")
     try:
         app_port = config_manager.get("app.port", 5000)
         ngrok_token = os.environ.get('NGROK_TOKEN')
@@ -203,62 +417,145 @@ async def startup():
 
         if public_url:
             print(' * Public URL:', public_url)
+            app.public_url = public_url
     except Exception as e:
         print(f"Error during ngrok startup: {e}")
     
     config_manager.reload_config()
-    app.feed = Feed(app.db_manager, config_manager)
+    metrics.configure(config_manager.get_boolean("metrics.enabled", False))
+    app.loop_monitor = metrics.EventLoopMonitor(config_manager.get("metrics.event_loop_interval", 0.5))
+    app.loop_monitor.start()
+    PROFILER.configure(
+        config_manager.get("profiling.directory", "cache/profiles"),
+        sample_rate=config_manager.get("profiling.sample_rate", 0),
+        fetch_sample_rate=config_manager.get("profiling.fetch_sample_rate", 0),
+        keep=config_manager.get("profiling.keep", 50)
+    )
+    limiter.configure(app.db_manager)
+    app.registry = FeedRegistry(app.db_manager)
+    try:
+        await app.registry.listen(await app.db_manager.get_pool(), retry_delay=None)
+    except Exception as e:
+        # Requests fall back to the database until the registry manages to load
+        print(f"Error during feed registry startup: {e}")
+        asyncio.get_running_loop().create_task(app.registry.listen(await app.db_manager.get_pool()))
+    app.reddit_resolver = RedditMediaResolver(
+        app.db_manager,
+        max_size=config_manager.get("reddit.cache_size", 1000),
+        ttl=config_manager.get("reddit.cache_ttl", 3600),
+        api_base=config_manager.get("reddit.api_base", REDDIT_API_BASE),
+        batch_size=config_manager.get("reddit.batch_size", 100)
+    )
+    if config_manager.get_boolean("thumbnails.enabled", True):
+        app.thumbnails = ThumbnailManager(
+            config_manager.get("thumbnails.cache_dir", "cache/thumbnails"),
+            widths=config_manager.get("thumbnails.widths", DEFAULT_WIDTHS),
+            max_bytes=config_manager.get("thumbnails.max_cache_mb", 256) * 1024 * 1024,
+            max_source_bytes=config_manager.get("thumbnails.max_source_mb", 10) * 1024 * 1024,
+            workers=config_manager.get("thumbnails.workers", 2),
+            prewarm_concurrency=config_manager.get("thumbnails.prewarm_concurrency", 4),
+            failure_ttl=config_manager.get("thumbnails.failure_ttl", 3600)
+        )
+        app.thumbnails.start()
+    if config_manager.get_boolean("suggest.enabled", True):
+        app.suggestions = SuggestionIndex(
+            app.db_manager,
+            limit=config_manager.get("suggest.limit", 8),
+            min_prefix=config_manager.get("suggest.min_prefix", 2),
+            max_entries=config_manager.get("suggest.max_entries", 50000),
+            rebuild_interval=config_manager.get("suggest.rebuild_interval", 3600)
+        )
+        app.suggestions.start(await app.db_manager.get_pool())
+    if config_manager.get_boolean("stats.enabled", True):
+        app.stats = FeedStats(app.db_manager, refresh_interval=config_manager.get("stats.refresh_interval", 900))
+        app.stats.start(await app.db_manager.get_pool())
+    app.pipelines = []
+    if config_manager.get_boolean("enrichment.enabled", True):
+        app.pipelines.append(OGImageEnricher(
+            app.db_manager,
+            app.thumbnails,
+            max_head_bytes=config_manager.get("enrichment.max_head_kb", 32) * 1024,
+            domain_rate=config_manager.get("enrichment.domain_rate", 1.0),
+            domain_burst=config_manager.get("enrichment.domain_burst", 2),
+            workers=config_manager.get("enrichment.workers", 8),
+            queue_size=config_manager.get("enrichment.queue_size", 2000),
+            batch_size=config_manager.get("enrichment.batch_size", 50),
+            flush_interval=config_manager.get("enrichment.flush_interval", 2.0)
+        ))
+    if config_manager.get_boolean("tagging.enabled", True):
+        app.pipelines.append(KeywordTagger(
+            app.db_manager,
+            processes=config_manager.get("tagging.processes", 2),
+            chunk_size=config_manager.get("tagging.chunk_size", 32),
+            max_ngram_size=config_manager.get("tagging.max_ngram_size", 3),
+            num_keywords=config_manager.get("tagging.num_keywords", 5),
+            deduplication_threshold=config_manager.get("tagging.deduplication_threshold", 0.9),
+            suggestions=app.suggestions,
+            queue_size=config_manager.get("tagging.queue_size", 200),
+            batch_size=config_manager.get("tagging.batch_size", 4),
+            flush_interval=config_manager.get("tagging.flush_interval", 5.0)
+        ))
+    for pipeline in app.pipelines:
+        pipeline.start()
+    # Hubs need a public callback, either configured or the ngrok tunnel
+    websub_callback = config_manager.get("websub.callback_base", None) or getattr(app, 'public_url', None)
+    if config_manager.get_boolean("websub.enabled", False) and websub_callback:
+        app.websub = WebSubManager(
+            app.db_manager,
+            websub_callback,
+            lease_seconds=config_manager.get("websub.lease_seconds", 864000),
+            renew_before=config_manager.get("websub.renew_before", 86400),
+            poll_interval=config_manager.get("websub.poll_interval", 21600),
+            retry_interval=config_manager.get("websub.retry_interval", 3600),
+            check_interval=config_manager.get("websub.check_interval", 600)
+        )
+        app.websub.start(await app.db_manager.get_pool())
+    app.feed = Feed(app.db_manager, config_manager, app.registry, app.reddit_resolver, app.thumbnails, app.pipelines, app.websub, app.suggestions, app.stats)
+    app.read_state = ReadStateManager(app.db_manager)
+    app.opml_importer = OPMLImporter(app.db_manager, app.registry, app.feed.get_rss_fetcher())
+    app.exporter = FeedExporter(
+        app.db_manager,
+        entries=config_manager.get("export.entries", 50),
+        cache_size=config_manager.get("export.cache_size", 256)
+    )
+    print(f"Startup finished {time.perf_counter() - BOOT_STARTED:.2f}s after launch (imports took {IMPORTS_DONE - BOOT_STARTED:.2f}s)")
+
+@app.after_request
+async def report_first_request(response):
+    if not app.first_request_served:
+        app.first_request_served = True
+        print(f"First request served {time.perf_counter() - BOOT_STARTED:.2f}s after launch")
+    return response
 
 @app.after_serving
 async def cleanup():
+    await app.loop_monitor.close()
+    await limiter.close()
+    await app.registry.close()
+    await app.reddit_resolver.close()
+    for pipeline in app.pipelines:
+        await pipeline.close()
+    await app.feed.close()
+    if app.websub is not None:
+        await app.websub.close()
+    if app.suggestions is not None:
+        await app.suggestions.close()
+    if app.stats is not None:
+        await app.stats.close()
+    if app.thumbnails is not None:
+        await app.thumbnails.close()
     pool = await app.db_manager.get_pool()
     await pool.close()
 
     if hasattr(app, 'ngrok_manager'):
         app.ngrok_manager.terminate_ngrok()
 
-async def setup_postgresql():
-    DB_USER = os.getenv("DB_USER")
-    DB_PASS = os.getenv("DB_PASS")
-    DB_HOST = os.getenv("DB_HOST")
-    DB_PORT = os.getenv("DB_PORT")
-    DB_NAME = os.getenv("DB_NAME")
-
-    app.db_manager = DBManager(f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
-    try:
-        pool = await app.db_manager.get_pool()
-        async with pool.acquire() as conn:
-            # Check if the user exists
-            user_exists = await conn.fetchrow(f"SELECT 1 FROM pg_roles WHERE rolname='{DB_USER}'")
-            
-            # Create the user if it doesn't exist
-            if not user_exists:
-                await conn.execute(f"CREATE USER {DB_USER} WITH PASSWORD '{DB_PASS}'")
-                print(f"User '{DB_USER}' created.")
-
-            # Check if the database exists
-            db_exists = await conn.fetchrow(f"SELECT 1 FROM pg_database WHERE datname='{DB_NAME}'")
-            
-            # Create the database if it doesn't exist
-            if not db_exists:
-                await conn.execute(f"CREATE DATABASE {DB_NAME} OWNER {DB_USER}")
-                print(f"Database '{DB_NAME}' created.")
-
-        #await app.db_manager.drop_table(pool)
-        #await app.db_manager.drop_table(pool, "feed_metadata")
-        #await app.db_manager.drop_table(pool, "feed_entries")
-        #await app.db_manager.drop_table(pool, "categories")
-        await app.db_manager.create_tables(pool)
-        #await app.db_manager.drop_columns_from_table(pool, "feed_entries", ['etag'])
-
-        async with pool.acquire() as conn:
-            await conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_feed_metadata_url ON feed_metadata (url);")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_feed_entries_combined ON feed_entries(category_id, published_date DESC, id DESC);")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_feed_entries_creator ON feed_entries USING gin ((additional_info ->> 'tags') gin_trgm_ops);")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_feed_entries_creator ON feed_entries USING gin ((additional_info ->> 'creator') gin_trgm_ops);")
-    except app.db_manager.exceptions.PostgresError as e:
-        print(f"PostgreSQL connection failed: {e}")
+async def setup_database():
+    app.db_manager = DBManager(DBManager.dsn_from_env())
+    pool = await app.db_manager.get_pool()
+    # Schema changes are applied with `python migration_manager.py migrate`, startup only checks the version
+    version = await MigrationManager(app.db_manager).verify(pool)
+    print(f"Database schema version {version}")
 
 if __name__ == "__main__":
     app.run(
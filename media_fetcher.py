@@ -33,7 +33,6 @@ def fetch_media(entry):
     tree = html.fromstring(content) if content else None
 
     additional_info = {
-        'web_name': [],
         'tags': [tag['term'] for tag in entry.get('tags', [])],
         'creator': entry.get('author', '')
     }
@@ -0,0 +1,171 @@
+import time
+import asyncio
+from bisect import bisect_left
+from contextlib import nullcontext
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+
+# Reused by every disabled timer, so disabled timing allocates nothing
+NULL_TIMER = nullcontext()
+
+
+class Metric:
+    """
+    Base of the in-process metrics, exposed in the Prometheus text format.
+
+    Every update first checks `Metric.enabled`, so instrumented code costs one attribute
+    lookup while metrics are disabled. Label values are passed positionally, in the order
+    of `labels`.
+    """
+    enabled = False
+    registry = []
+    kind = None
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.values = {}
+        Metric.registry.append(self)
+
+    def label_text(self, values, extra=()):
+        pairs = list(zip(self.labels, values)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        for values, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{self.label_text(values)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        if not self.enabled:
+            return
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        if not self.enabled:
+            return
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = buckets
+
+    def observe(self, value, *labels):
+        if not self.enabled:
+            return
+        state = self.values.get(labels)
+        if state is None:
+            # Per-bucket counts (made cumulative when rendered), then sum and count
+            state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def time(self, *labels):
+        """Returns a context manager observing the seconds spent in its block."""
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self, labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        for values, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{self.label_text(values, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self.label_text(values)} {total}")
+            lines.append(f"{self.name}_count{self.label_text(values)} {count}")
+        return lines
+
+
+class Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        return False
+
+
+def configure(enabled):
+    Metric.enabled = enabled
+
+
+def render():
+    """Returns every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in Metric.registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class EventLoopMonitor:
+    """Measures how late the event loop wakes a sleeping task, which is how long callbacks wait to run."""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.task = None
+
+    def start(self):
+        if Metric.enabled and self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            EVENT_LOOP_LAG.set(lag)
+            EVENT_LOOP_LAG_SECONDS.observe(lag)
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+
+FEED_FETCH_SECONDS = Histogram("nexafeed_feed_fetch_seconds", "Time to download one feed, from request to last byte")
+FEED_BYTES = Counter("nexafeed_feed_bytes_total", "Feed bytes downloaded")
+FEED_BYTES_IN_FLIGHT = Gauge("nexafeed_feed_bytes_in_flight", "Feed body bytes held in memory by running downloads")
+FEED_FETCHES = Counter("nexafeed_feed_fetches_total", "Feed fetches by feed and result (200, 304 or error)", ("feed", "result"))
+FEED_ENTRIES = Counter("nexafeed_feed_entries_total", "Entries found in fetched feeds")
+FEED_PARSE_SECONDS = Histogram("nexafeed_feed_parse_seconds", "Time feedparser spends parsing one feed")
+ENTRY_PROCESS_SECONDS = Histogram("nexafeed_entry_process_seconds", "Time process_entry spends on one entry")
+CATEGORY_FETCH_SECONDS = Histogram("nexafeed_category_fetch_seconds", "Time to fetch and store every feed of a category")
+INSERT_BATCH_ROWS = Histogram("nexafeed_insert_batch_rows", "Rows per insert_many batch", ("table",), buckets=SIZE_BUCKETS)
+INSERT_BATCH_SECONDS = Histogram("nexafeed_insert_batch_seconds", "Time to write one insert_many batch", ("table",))
+PAGE_QUERY_SECONDS = Histogram("nexafeed_page_query_seconds", "Time to query one page of entries", ("kind",))
+CACHE_REQUESTS = Counter("nexafeed_cache_requests_total", "Cache lookups by cache and result (hit or miss)", ("cache", "result"))
+EVENT_LOOP_LAG = Gauge("nexafeed_event_loop_lag_seconds", "Latest measured event loop lag")
+EVENT_LOOP_LAG_SECONDS = Histogram("nexafeed_event_loop_lag_distribution_seconds", "Event loop lag measurements",
+                                   buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+WEBSUB_NOTIFICATIONS = Counter("nexafeed_websub_notifications_total", "WebSub deliveries by result (accepted, bad_signature or unknown)", ("result",))
+POLLS_SKIPPED = Counter("nexafeed_polls_skipped_total", "Polls skipped because the feed's WebSub hub pushes its entries")
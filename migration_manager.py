@@ -0,0 +1,198 @@
+import os
+import re
+import sys
+import time
+import asyncio
+import argparse
+from dotenv import load_dotenv
+from db_manager import DBManager
+
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d+)_([\w-]+)\.sql$")
+NO_TRANSACTION_MARKER = "-- no-transaction"
+
+
+class SchemaOutdatedError(Exception):
+    pass
+
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+
+    def read(self):
+        with open(self.path, "r") as file:
+            return file.read()
+
+    def statements(self, sql):
+        """Splits a script into single statements, needed when running outside a transaction."""
+        statements = []
+        current = []
+        in_trigger = False
+        for line in sql.splitlines():
+            if line.strip().startswith("--") and not current:
+                continue
+            current.append(line)
+            # Trigger bodies hold statements of their own and only end at END;
+            in_trigger = in_trigger or line.lstrip().upper().startswith("CREATE TRIGGER")
+            if line.rstrip().endswith(";") and (not in_trigger or line.strip().upper() == "END;"):
+                statements.append("\n".join(current).strip())
+                current = []
+                in_trigger = False
+        if "".join(current).strip():
+            statements.append("\n".join(current).strip())
+        return statements
+
+
+class MigrationManager:
+    def __init__(self, db_manager, migrations_dir=None):
+        self.db_manager = db_manager
+        # Each storage backend keeps its own migration files
+        self.migrations_dir = migrations_dir or db_manager.backend.migrations_dir
+
+    def load_migrations(self):
+        """Returns the migration files ordered by their version prefix."""
+        migrations = []
+        for filename in os.listdir(self.migrations_dir):
+            match = MIGRATION_FILE_PATTERN.match(filename)
+            if match:
+                path = os.path.join(self.migrations_dir, filename)
+                migrations.append(Migration(int(match.group(1)), match.group(2), path))
+        migrations.sort(key=lambda migration: migration.version)
+
+        versions = [migration.version for migration in migrations]
+        if len(versions) != len(set(versions)):
+            raise ValueError(f"Duplicate migration versions in {self.migrations_dir}")
+        return migrations
+
+    def latest_version(self):
+        migrations = self.load_migrations()
+        return migrations[-1].version if migrations else 0
+
+    async def current_version(self, conn):
+        if not await self.db_manager.backend.table_exists(conn, "schema_version"):
+            return 0
+        return await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+
+    async def verify(self, pool):
+        """Checks the database is at the latest schema version without running any DDL."""
+        async with pool.acquire() as conn:
+            current = await self.current_version(conn)
+        latest = self.latest_version()
+        if current < latest:
+            raise SchemaOutdatedError(
+                f"Database schema is at version {current} but {latest} is required. "
+                f"Run `python migration_manager.py migrate` first."
+            )
+        return current
+
+    async def migrate(self, pool, target=None):
+        """Applies every pending migration up to `target` (default: latest) in order."""
+        applied = []
+        async with pool.acquire() as conn:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    duration_ms INTEGER
+                )
+            """)
+            current = await self.current_version(conn)
+
+            for migration in self.load_migrations():
+                if migration.version <= current:
+                    continue
+                if target is not None and migration.version > target:
+                    break
+
+                start_time = time.time()
+                sql = migration.read()
+                if sql.lstrip().startswith(NO_TRANSACTION_MARKER):
+                    # CREATE INDEX CONCURRENTLY can't run in a transaction block, so each
+                    # statement is sent on its own and the version is recorded afterwards.
+                    for statement in migration.statements(sql):
+                        await conn.execute(statement)
+                    await self.record(conn, migration, start_time)
+                else:
+                    async with conn.transaction():
+                        await conn.execute(sql)
+                        await self.record(conn, migration, start_time)
+
+                print(f"Applied migration {migration.version:04d}_{migration.name} in {time.time() - start_time:.2f} seconds")
+                applied.append(migration)
+        return applied
+
+    async def record(self, conn, migration, start_time):
+        await conn.execute(
+            "INSERT INTO schema_version (version, name, duration_ms) VALUES ($1, $2, $3)",
+            migration.version, migration.name, int((time.time() - start_time) * 1000)
+        )
+
+    async def status(self, pool):
+        async with pool.acquire() as conn:
+            current = await self.current_version(conn)
+        return [(migration, migration.version <= current) for migration in self.load_migrations()]
+
+
+async def bootstrap():
+    """Creates the application role and database from the `postgres` maintenance database."""
+    import asyncpg
+
+    db_user = os.getenv("DB_USER")
+    db_pass = os.getenv("DB_PASS")
+    db_name = os.getenv("DB_NAME")
+    admin_dsn = os.getenv("DB_ADMIN_DSN") or DBManager.dsn_from_env(database="postgres")
+
+    conn = await asyncpg.connect(admin_dsn)
+    try:
+        if not await conn.fetchval("SELECT 1 FROM pg_roles WHERE rolname = $1", db_user):
+            password = await conn.fetchval("SELECT quote_literal($1)", db_pass)
+            await conn.execute(f"CREATE USER {quote_ident(db_user)} WITH PASSWORD {password}")
+            print(f"User '{db_user}' created.")
+
+        if not await conn.fetchval("SELECT 1 FROM pg_database WHERE datname = $1", db_name):
+            await conn.execute(f"CREATE DATABASE {quote_ident(db_name)} OWNER {quote_ident(db_user)}")
+            print(f"Database '{db_name}' created.")
+    finally:
+        await conn.close()
+
+
+def quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+async def run(command, target=None):
+    db_manager = DBManager(DBManager.dsn_from_env())
+    if command == "bootstrap":
+        if db_manager.backend.name == "postgres":
+            await bootstrap()
+        return
+
+    migration_manager = MigrationManager(db_manager)
+    pool = await db_manager.get_pool()
+    try:
+        if command == "migrate":
+            applied = await migration_manager.migrate(pool, target)
+            if not applied:
+                print("Schema is up to date.")
+        elif command == "status":
+            for migration, applied in await migration_manager.status(pool):
+                state = "applied" if applied else "pending"
+                print(f"{migration.version:04d}_{migration.name}: {state}")
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Manage the NexaFeed database schema.")
+    parser.add_argument("command", choices=["bootstrap", "migrate", "status"])
+    parser.add_argument("--target", type=int, default=None, help="Stop after this migration version")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args.command, args.target))
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,43 @@
+-- Base schema. Uses IF NOT EXISTS so databases created before migrations
+-- existed are adopted without changes.
+CREATE TABLE IF NOT EXISTS categories (
+    id SERIAL PRIMARY KEY,
+    name TEXT
+);
+
+CREATE TABLE IF NOT EXISTS feeds (
+    id SERIAL PRIMARY KEY,
+    name TEXT,
+    description TEXT,
+    url TEXT,
+    category_id INTEGER REFERENCES categories(id)
+);
+
+CREATE TABLE IF NOT EXISTS feed_metadata (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    content_length BIGINT,
+    last_modified TIMESTAMP WITH TIME ZONE,
+    expires TIMESTAMP WITH TIME ZONE,
+    last_checked TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    latest_title TEXT
+);
+
+CREATE TABLE IF NOT EXISTS feed_entries (
+    id BIGSERIAL PRIMARY KEY,
+    original_link TEXT UNIQUE,
+    category_id INTEGER REFERENCES categories(id),
+    title TEXT,
+    content TEXT,
+    thumbnail TEXT,
+    video_id TEXT,
+    additional_info JSONB,
+    published_date TIMESTAMP WITH TIME ZONE,
+    url TEXT
+);
+
+CREATE UNLOGGED TABLE IF NOT EXISTS rate_limits (
+    key TEXT PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
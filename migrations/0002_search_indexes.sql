@@ -0,0 +1,9 @@
+-- no-transaction
+-- Indexes are built concurrently so they never block writes to feed_entries.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_feed_metadata_url ON feed_metadata (url);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_feed_entries_combined ON feed_entries (category_id, published_date DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_feed_entries_tags ON feed_entries USING gin ((additional_info ->> 'tags') gin_trgm_ops);
+-- Databases set up before migrations have idx_feed_entries_creator on the tags instead, tags have their own index now
+DROP INDEX CONCURRENTLY IF EXISTS idx_feed_entries_creator;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_feed_entries_creator ON feed_entries USING gin ((additional_info ->> 'creator') gin_trgm_ops);
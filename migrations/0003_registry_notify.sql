@@ -0,0 +1,30 @@
+-- Publishes changes to feeds and categories so every process can keep its
+-- in-memory feed registry coherent without polling.
+CREATE OR REPLACE FUNCTION notify_registry_change() RETURNS trigger AS $$
+DECLARE
+    changed RECORD;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+    -- Descriptions are left out to stay well below the 8000 byte payload limit
+    PERFORM pg_notify('feed_registry', json_build_object(
+        'table', TG_TABLE_NAME,
+        'op', TG_OP,
+        'row', to_jsonb(changed) - 'description'
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS feeds_registry_notify ON feeds;
+CREATE TRIGGER feeds_registry_notify
+    AFTER INSERT OR UPDATE OR DELETE ON feeds
+    FOR EACH ROW EXECUTE FUNCTION notify_registry_change();
+
+DROP TRIGGER IF EXISTS categories_registry_notify ON categories;
+CREATE TRIGGER categories_registry_notify
+    AFTER INSERT OR UPDATE OR DELETE ON categories
+    FOR EACH ROW EXECUTE FUNCTION notify_registry_change();
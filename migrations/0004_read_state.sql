@@ -0,0 +1,20 @@
+-- Read state: everything at or below a category's high-water mark is read,
+-- entries above it that were read individually are kept as exceptions.
+CREATE TABLE IF NOT EXISTS read_marks (
+    user_id TEXT NOT NULL DEFAULT 'default',
+    category_id INTEGER NOT NULL REFERENCES categories(id) ON DELETE CASCADE,
+    read_until_pd TIMESTAMP WITH TIME ZONE NOT NULL,
+    read_until_id BIGINT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_id, category_id)
+);
+
+CREATE TABLE IF NOT EXISTS read_exceptions (
+    user_id TEXT NOT NULL DEFAULT 'default',
+    entry_id BIGINT NOT NULL REFERENCES feed_entries(id) ON DELETE CASCADE,
+    category_id INTEGER NOT NULL,
+    published_date TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (user_id, entry_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_read_exceptions_category ON read_exceptions (user_id, category_id, published_date, entry_id);
@@ -0,0 +1,2 @@
+-- Resolved media (e.g. Reddit video) URL, '' when the post turned out to have none.
+ALTER TABLE feed_entries ADD COLUMN IF NOT EXISTS media_url TEXT;
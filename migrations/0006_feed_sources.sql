@@ -0,0 +1,12 @@
+-- Per-feed profile derived from the feed itself, keyed by feed url like feed_entries.url.
+-- Entries no longer copy web_name into additional_info; the API serves it once per feed.
+CREATE TABLE IF NOT EXISTS feed_sources (
+    url TEXT PRIMARY KEY,
+    feed_title TEXT,
+    site_name TEXT,
+    web_name JSONB,
+    favicon TEXT,
+    date_attribute TEXT,
+    media_strategy TEXT,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
@@ -0,0 +1,9 @@
+-- Bumped whenever new entries are ingested into a category, so rendered
+-- exports of the category can be cached until it changes.
+ALTER TABLE categories ADD COLUMN IF NOT EXISTS ingest_version BIGINT NOT NULL DEFAULT 0;
+
+-- Version bumps aren't registry changes, only renames are worth a notification
+DROP TRIGGER IF EXISTS categories_registry_notify ON categories;
+CREATE TRIGGER categories_registry_notify
+    AFTER INSERT OR DELETE OR UPDATE OF name ON categories
+    FOR EACH ROW EXECUTE FUNCTION notify_registry_change();
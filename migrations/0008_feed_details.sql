@@ -0,0 +1,4 @@
+-- Details filled in by tools/opml_finalize.py: the site the feed belongs to and
+-- how often it publishes, as the median gap between entries in seconds.
+ALTER TABLE feeds ADD COLUMN IF NOT EXISTS site_url TEXT;
+ALTER TABLE feeds ADD COLUMN IF NOT EXISTS update_interval INTEGER;
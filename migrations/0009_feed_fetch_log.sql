@@ -0,0 +1,32 @@
+-- Append-only history of every feed fetch, one row per feed per fetch cycle.
+-- Partitioned by month so old history is dropped a partition at a time;
+-- FetchLog creates the partitions it writes to and drops expired ones.
+CREATE TABLE IF NOT EXISTS feed_fetch_log (
+    fetched_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    url TEXT NOT NULL,
+    status SMALLINT NOT NULL,
+    duration_ms INTEGER NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    entries INTEGER NOT NULL DEFAULT 0,
+    new_entries INTEGER NOT NULL DEFAULT 0
+) PARTITION BY RANGE (fetched_at);
+
+CREATE INDEX IF NOT EXISTS idx_feed_fetch_log_url ON feed_fetch_log (url, fetched_at DESC);
+
+DO $$
+DECLARE
+    month DATE;
+BEGIN
+    FOREACH month IN ARRAY ARRAY[date_trunc('month', now())::date, (date_trunc('month', now()) + interval '1 month')::date] LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF feed_fetch_log FOR VALUES FROM (%L) TO (%L)',
+            'feed_fetch_log_y' || to_char(month, 'YYYY') || 'm' || to_char(month, 'MM'),
+            month,
+            (month + interval '1 month')::date
+        );
+    END LOOP;
+END
+$$;
+
+-- content_length held the entry count of the last fetch; it now holds the payload size in bytes
+UPDATE feed_metadata SET content_length = NULL;
@@ -0,0 +1,15 @@
+-- WebSub subscriptions, one per feed url. The id is part of the callback url the
+-- hub verifies and delivers to, the secret signs every delivery.
+CREATE TABLE IF NOT EXISTS websub_subscriptions (
+    id SERIAL PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    hub TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    secret TEXT NOT NULL,
+    -- pending until the hub verifies it, then active; failed, denied or unsubscribing otherwise
+    state TEXT NOT NULL DEFAULT 'pending',
+    requested_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    verified_at TIMESTAMP WITH TIME ZONE,
+    expires_at TIMESTAMP WITH TIME ZONE,
+    last_push_at TIMESTAMP WITH TIME ZONE
+);
@@ -0,0 +1,13 @@
+-- no-transaction
+-- Deleting a category now takes its feeds and entries with it. The constraints are
+-- swapped in as NOT VALID, which only holds a brief lock, and then validated while
+-- reads and writes carry on.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_feeds_category ON feeds (category_id);
+
+ALTER TABLE feeds DROP CONSTRAINT IF EXISTS feeds_category_id_fkey,
+    ADD CONSTRAINT feeds_category_id_fkey FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE NOT VALID;
+ALTER TABLE feeds VALIDATE CONSTRAINT feeds_category_id_fkey;
+
+ALTER TABLE feed_entries DROP CONSTRAINT IF EXISTS feed_entries_category_id_fkey,
+    ADD CONSTRAINT feed_entries_category_id_fkey FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE NOT VALID;
+ALTER TABLE feed_entries VALIDATE CONSTRAINT feed_entries_category_id_fkey;
@@ -0,0 +1,14 @@
+-- Entry counts, freshness and posting rates per feed and category, so the sidebar and
+-- /api/stats don't scan feed_entries. FeedStats bumps the rows as entries are stored
+-- and recomputes the whole table on a schedule, which also ages the 7 and 30 day windows.
+CREATE TABLE IF NOT EXISTS feed_stats (
+    category_id INTEGER NOT NULL REFERENCES categories(id) ON DELETE CASCADE,
+    url TEXT NOT NULL,
+    entries INTEGER NOT NULL DEFAULT 0,
+    entries_7d INTEGER NOT NULL DEFAULT 0,
+    entries_30d INTEGER NOT NULL DEFAULT 0,
+    oldest_at TIMESTAMP WITH TIME ZONE,
+    newest_at TIMESTAMP WITH TIME ZONE,
+    refreshed_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (category_id, url)
+);
@@ -0,0 +1,37 @@
+-- Base schema for the embedded SQLite backend, mirrors migrations/0001_initial.sql.
+-- Timestamps are stored as UTC ISO-8601 text and JSONB columns as JSON text.
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT
+);
+
+CREATE TABLE IF NOT EXISTS feeds (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    description TEXT,
+    url TEXT,
+    category_id INTEGER REFERENCES categories(id)
+);
+
+CREATE TABLE IF NOT EXISTS feed_metadata (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    content_length BIGINT,
+    last_modified TIMESTAMPTZ,
+    expires TIMESTAMPTZ,
+    last_checked TIMESTAMPTZ,
+    latest_title TEXT
+);
+
+CREATE TABLE IF NOT EXISTS feed_entries (
+    id INTEGER PRIMARY KEY,
+    original_link TEXT UNIQUE,
+    category_id INTEGER REFERENCES categories(id),
+    title TEXT,
+    content TEXT,
+    thumbnail TEXT,
+    video_id TEXT,
+    additional_info JSONB,
+    published_date TIMESTAMPTZ,
+    url TEXT
+);
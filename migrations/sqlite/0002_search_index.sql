@@ -0,0 +1,41 @@
+-- Keyset pagination index and an FTS5 index standing in for pg_trgm search.
+CREATE INDEX IF NOT EXISTS idx_feed_entries_combined ON feed_entries (category_id, published_date DESC, id DESC);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS feed_entries_fts USING fts5(
+    title, creator, tags, content='', tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS feed_entries_fts_insert AFTER INSERT ON feed_entries BEGIN
+    INSERT INTO feed_entries_fts (rowid, title, creator, tags) VALUES (
+        new.id,
+        new.title,
+        json_extract(new.additional_info, '$.creator'),
+        (SELECT group_concat(value, ' ') FROM json_each(new.additional_info, '$.tags'))
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS feed_entries_fts_delete AFTER DELETE ON feed_entries BEGIN
+    INSERT INTO feed_entries_fts (feed_entries_fts, rowid, title, creator, tags) VALUES (
+        'delete',
+        old.id,
+        old.title,
+        json_extract(old.additional_info, '$.creator'),
+        (SELECT group_concat(value, ' ') FROM json_each(old.additional_info, '$.tags'))
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS feed_entries_fts_update AFTER UPDATE OF title, additional_info ON feed_entries BEGIN
+    INSERT INTO feed_entries_fts (feed_entries_fts, rowid, title, creator, tags) VALUES (
+        'delete',
+        old.id,
+        old.title,
+        json_extract(old.additional_info, '$.creator'),
+        (SELECT group_concat(value, ' ') FROM json_each(old.additional_info, '$.tags'))
+    );
+    INSERT INTO feed_entries_fts (rowid, title, creator, tags) VALUES (
+        new.id,
+        new.title,
+        json_extract(new.additional_info, '$.creator'),
+        (SELECT group_concat(value, ' ') FROM json_each(new.additional_info, '$.tags'))
+    );
+END;
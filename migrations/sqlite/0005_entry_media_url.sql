@@ -0,0 +1,2 @@
+-- Mirrors migrations/0005_entry_media_url.sql.
+ALTER TABLE feed_entries ADD COLUMN media_url TEXT;
@@ -0,0 +1,11 @@
+-- Mirrors migrations/0006_feed_sources.sql.
+CREATE TABLE IF NOT EXISTS feed_sources (
+    url TEXT PRIMARY KEY,
+    feed_title TEXT,
+    site_name TEXT,
+    web_name JSONB,
+    favicon TEXT,
+    date_attribute TEXT,
+    media_strategy TEXT,
+    updated_at TIMESTAMPTZ
+);
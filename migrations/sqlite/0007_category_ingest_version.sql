@@ -0,0 +1,2 @@
+-- Mirrors migrations/0007_category_ingest_version.sql.
+ALTER TABLE categories ADD COLUMN ingest_version INTEGER NOT NULL DEFAULT 0;
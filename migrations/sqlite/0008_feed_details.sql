@@ -0,0 +1,3 @@
+-- Mirrors migrations/0008_feed_details.sql.
+ALTER TABLE feeds ADD COLUMN site_url TEXT;
+ALTER TABLE feeds ADD COLUMN update_interval INTEGER;
@@ -0,0 +1,16 @@
+-- Mirrors migrations/0009_feed_fetch_log.sql, without partitions; FetchLog
+-- expires old rows with a DELETE instead.
+CREATE TABLE IF NOT EXISTS feed_fetch_log (
+    fetched_at TIMESTAMPTZ NOT NULL,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    duration_ms INTEGER NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    entries INTEGER NOT NULL DEFAULT 0,
+    new_entries INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_feed_fetch_log_url ON feed_fetch_log (url, fetched_at DESC);
+CREATE INDEX IF NOT EXISTS idx_feed_fetch_log_fetched_at ON feed_fetch_log (fetched_at);
+
+UPDATE feed_metadata SET content_length = NULL;
@@ -0,0 +1,13 @@
+-- Mirrors migrations/0010_websub_subscriptions.sql.
+CREATE TABLE IF NOT EXISTS websub_subscriptions (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    hub TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    secret TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    requested_at TIMESTAMPTZ NOT NULL,
+    verified_at TIMESTAMPTZ,
+    expires_at TIMESTAMPTZ,
+    last_push_at TIMESTAMPTZ
+);
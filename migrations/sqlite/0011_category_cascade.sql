@@ -0,0 +1,81 @@
+-- no-transaction
+-- Mirrors migrations/0011_category_cascade.sql. SQLite can't alter a foreign key, so
+-- feeds and feed_entries are rebuilt as https://www.sqlite.org/lang_altertable.html#otheralter
+-- describes. Foreign keys are off meanwhile, or dropping the old feed_entries would
+-- cascade into read_exceptions.
+PRAGMA foreign_keys=OFF;
+BEGIN;
+
+CREATE TABLE feeds_new (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    description TEXT,
+    url TEXT,
+    category_id INTEGER REFERENCES categories(id) ON DELETE CASCADE,
+    site_url TEXT,
+    update_interval INTEGER
+);
+INSERT INTO feeds_new (id, name, description, url, category_id, site_url, update_interval)
+    SELECT id, name, description, url, category_id, site_url, update_interval FROM feeds;
+DROP TABLE feeds;
+ALTER TABLE feeds_new RENAME TO feeds;
+CREATE INDEX idx_feeds_category ON feeds (category_id);
+
+CREATE TABLE feed_entries_new (
+    id INTEGER PRIMARY KEY,
+    original_link TEXT UNIQUE,
+    category_id INTEGER REFERENCES categories(id) ON DELETE CASCADE,
+    title TEXT,
+    content TEXT,
+    thumbnail TEXT,
+    video_id TEXT,
+    additional_info JSONB,
+    published_date TIMESTAMPTZ,
+    url TEXT,
+    media_url TEXT
+);
+-- Ids are kept, so the contentless FTS index stays valid
+INSERT INTO feed_entries_new (id, original_link, category_id, title, content, thumbnail, video_id, additional_info, published_date, url, media_url)
+    SELECT id, original_link, category_id, title, content, thumbnail, video_id, additional_info, published_date, url, media_url FROM feed_entries;
+DROP TABLE feed_entries;
+ALTER TABLE feed_entries_new RENAME TO feed_entries;
+CREATE INDEX idx_feed_entries_combined ON feed_entries (category_id, published_date DESC, id DESC);
+
+-- Dropped along with the old table, as in migrations/sqlite/0002_search_index.sql
+CREATE TRIGGER feed_entries_fts_insert AFTER INSERT ON feed_entries BEGIN
+    INSERT INTO feed_entries_fts (rowid, title, creator, tags) VALUES (
+        new.id,
+        new.title,
+        json_extract(new.additional_info, '$.creator'),
+        (SELECT group_concat(value, ' ') FROM json_each(new.additional_info, '$.tags'))
+    );
+END;
+
+CREATE TRIGGER feed_entries_fts_delete AFTER DELETE ON feed_entries BEGIN
+    INSERT INTO feed_entries_fts (feed_entries_fts, rowid, title, creator, tags) VALUES (
+        'delete',
+        old.id,
+        old.title,
+        json_extract(old.additional_info, '$.creator'),
+        (SELECT group_concat(value, ' ') FROM json_each(old.additional_info, '$.tags'))
+    );
+END;
+
+CREATE TRIGGER feed_entries_fts_update AFTER UPDATE OF title, additional_info ON feed_entries BEGIN
+    INSERT INTO feed_entries_fts (feed_entries_fts, rowid, title, creator, tags) VALUES (
+        'delete',
+        old.id,
+        old.title,
+        json_extract(old.additional_info, '$.creator'),
+        (SELECT group_concat(value, ' ') FROM json_each(old.additional_info, '$.tags'))
+    );
+    INSERT INTO feed_entries_fts (rowid, title, creator, tags) VALUES (
+        new.id,
+        new.title,
+        json_extract(new.additional_info, '$.creator'),
+        (SELECT group_concat(value, ' ') FROM json_each(new.additional_info, '$.tags'))
+    );
+END;
+
+COMMIT;
+PRAGMA foreign_keys=ON;
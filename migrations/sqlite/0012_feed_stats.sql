@@ -0,0 +1,12 @@
+-- Mirrors migrations/0012_feed_stats.sql.
+CREATE TABLE IF NOT EXISTS feed_stats (
+    category_id INTEGER NOT NULL REFERENCES categories(id) ON DELETE CASCADE,
+    url TEXT NOT NULL,
+    entries INTEGER NOT NULL DEFAULT 0,
+    entries_7d INTEGER NOT NULL DEFAULT 0,
+    entries_30d INTEGER NOT NULL DEFAULT 0,
+    oldest_at TIMESTAMPTZ,
+    newest_at TIMESTAMPTZ,
+    refreshed_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (category_id, url)
+);
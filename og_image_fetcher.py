@@ -0,0 +1,130 @@
+import time
+import aiohttp
+from lxml import etree, html
+from urllib.parse import urljoin, urlsplit
+from pipeline import Pipeline
+from export_manager import expire_exports
+from rate_limiter import MemoryBackend
+
+IMAGE_META_KEYS = ('og:image', 'og:image:url', 'og:image:secure_url', 'twitter:image', 'twitter:image:src')
+# Unreachable pages are tried this many times in all, RETRY_DELAY seconds apart
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 300
+
+def find_head_image(head_html, base_url):
+    """
+    Find the preview image announced in the <head> of a page.
+
+    :param head_html: The start of the page, possibly cut off mid-document.
+    :param base_url: The page URL, used to resolve relative image URLs.
+    :return: The absolute image URL, or None if the page announces none.
+    """
+    if not head_html.strip():
+        return None
+    try:
+        tree = html.fromstring(head_html)
+    except (ValueError, etree.ParserError):
+        return None
+
+    found = {}
+    for meta in tree.iter('meta'):
+        key = (meta.get('property') or meta.get('name') or '').strip().lower()
+        content = (meta.get('content') or '').strip()
+        if key in IMAGE_META_KEYS and content and key not in found:
+            found[key] = content
+    image = next((found[key] for key in IMAGE_META_KEYS if key in found), None)
+    return urljoin(base_url, image) if image else None
+
+class OGImageEnricher(Pipeline):
+    """
+    Fills in thumbnails of entries that came without one, from og:image/twitter:image tags.
+
+    Only the start of each article is read, and requests to the same domain go
+    through a token bucket so a large feed can't hammer one site. Items over their
+    domain's rate are requeued for when a token frees up.
+    """
+    name = "og:image enrichment"
+
+    def __init__(self, db_manager, thumbnails=None, max_head_bytes=32 * 1024, domain_rate=1.0, domain_burst=2, **kwargs):
+        super().__init__(**kwargs)
+        self.db_manager = db_manager
+        self.thumbnails = thumbnails
+        self.max_head_bytes = max_head_bytes
+        self.domain_rate = domain_rate
+        self.domain_burst = domain_burst
+        self.buckets = MemoryBackend(max_clients=10000)
+        # Monotonic time of the next free retry slot per domain, so items turned away together don't retry together
+        self.retry_slots = {}
+        self.session = None
+
+    def get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        return self.session
+
+    def retry_slot(self, domain, wait):
+        """Returns the delay until the domain's next free slot, at least `wait` seconds, and takes it."""
+        now = time.monotonic()
+        if len(self.retry_slots) > 10000:
+            self.retry_slots = {key: slot for key, slot in self.retry_slots.items() if slot > now}
+        slot = max(self.retry_slots.get(domain, 0), now + wait)
+        self.retry_slots[domain] = slot + 1 / self.domain_rate
+        return slot - now
+
+    async def process(self, item):
+        entry_id, url, attempt = item
+        if not url or not url.startswith(('http://', 'https://')):
+            return entry_id, ''
+        # A domain out of tokens sends the item back to the queue instead of stalling the worker
+        domain = urlsplit(url).netloc.lower()
+        tokens = await self.buckets.consume(domain, self.domain_burst, self.domain_rate)
+        if tokens < 0:
+            self.retry_later(item, self.retry_slot(domain, -tokens / self.domain_rate))
+            return None
+        head = await self.read_head(url)
+        if head is None:
+            if attempt + 1 < MAX_ATTEMPTS:
+                self.retry_later((entry_id, url, attempt + 1), RETRY_DELAY)
+            return None
+        # '' marks the entry as checked, pages are only queued when their entry is first stored
+        return entry_id, find_head_image(head, url) or ''
+
+    async def read_head(self, url):
+        """Streams the page until </head> or the byte cap, whichever comes first."""
+        try:
+            from user_agent import generate_user_agent
+            async with self.get_session().get(url, headers={'User-Agent': generate_user_agent()}) as response:
+                if response.status == 429 or response.status >= 500:
+                    return None
+                if response.status != 200 or 'html' not in response.headers.get('Content-Type', 'text/html'):
+                    return ''
+                data = b''
+                async for chunk in response.content.iter_chunked(4096):
+                    data += chunk
+                    if b'</head>' in data.lower() or len(data) >= self.max_head_bytes:
+                        break
+                return data[:self.max_head_bytes].decode(response.charset or 'utf-8', errors='replace')
+        except Exception as e:
+            print(f"Failed to read the head of {url}: {e}")
+            return None
+
+    async def write(self, results):
+        pool = await self.db_manager.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.executemany(
+                    "UPDATE feed_entries SET thumbnail = $2 WHERE id = $1 AND thumbnail IS NULL",
+                    [(entry_id, image) for entry_id, image in results]
+                )
+                await expire_exports(conn, [entry_id for entry_id, _ in results])
+        if self.thumbnails:
+            self.thumbnails.prewarm([image for _, image in results])
+
+    def enqueue(self, entries):
+        return self.submit([(entry['id'], entry['original_link'], 0) for entry in entries if not entry['thumbnail']])
+
+    async def close(self):
+        await super().close()
+        await self.buckets.close()
+        if self.session is not None:
+            await self.session.close()
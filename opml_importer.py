@@ -1,38 +1,174 @@
 import os
+import asyncio
+import argparse
 from xml.etree import ElementTree as ET
-from config_manager import ConfigManager
+
+FOLDER_SEPARATOR = " / "
+
+
+def iter_opml(source):
+    """
+    Streams the feeds out of an OPML document without building the whole tree.
+
+    Outlines without an xmlUrl are folders. Nested folders are joined into one
+    path such as "News / Tech".
+
+    :param source: A path or a binary file object.
+    :return: An iterator of (folder path or None, title, xml url, description).
+    """
+    folders = []
+    # Only outlines are kept open, everything already handled is cleared to keep memory flat
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if elem.tag != "outline":
+            if event == "end" and elem.tag != "body":
+                elem.clear()
+            continue
+
+        xml_url = (elem.get("xmlUrl") or "").strip()
+        if event == "start":
+            if not xml_url:
+                folders.append((elem.get("title") or elem.get("text") or "").strip())
+            continue
+
+        if xml_url:
+            named = [folder for folder in folders if folder]
+            title = (elem.get("title") or elem.get("text") or "").strip()
+            yield FOLDER_SEPARATOR.join(named) or None, title, xml_url, elem.get("description")
+        elif folders:
+            folders.pop()
+        elem.clear()
+
 
 class OPMLImporter:
-    def __init__(self, folder_path="opml", config_manager=None):
-        self.folder_path = folder_path
-        self.config_manager = config_manager or ConfigManager()
-
-    def load(self):
-        try:
-            # Load the entire configuration
-            self.config_manager.config_data = self.config_manager.load_config()
-
-            # Extract existing feed URLs or set to empty if not present
-            category = "main_feed_urls"
-            new_feed_urls = set()
-
-            for filename in os.listdir(self.folder_path):
-                if filename.endswith('.opml') and not filename.endswith('_processed.opml'):
-                    full_path = os.path.join(self.folder_path, filename)
-                    tree = ET.parse(full_path)
-                    root = tree.getroot()
-
-                    for elem in root.iterfind('.//outline'):
-                        xml_url = elem.attrib.get('xmlUrl')
-                        if xml_url:
-                            new_feed_urls.add(xml_url)
-                    
-                    # Rename processed files to avoid reprocessing
-                    new_filename = filename.replace('.opml', '_processed.opml')
-                    os.rename(full_path, os.path.join(self.folder_path, new_filename))
-
-            # Update and save the config using the new method
-            self.config_manager.update_category_data(category, list(new_feed_urls))
-
-        except Exception as e:
-            print("Failed to import OPML: " + str(e))
+    """
+    Imports OPML subscriptions straight into the feeds and categories tables.
+
+    Feeds outside any folder go to the target category. Each folder maps to the category
+    of the same name, which is created when missing. Feeds whose url is already
+    subscribed, or that appear twice in the file, are skipped. Everything is written in
+    one transaction.
+    """
+
+    def __init__(self, db_manager, registry=None, fetcher=None):
+        self.db_manager = db_manager
+        self.registry = registry
+        # Optional RSSFetcher, used to validate feeds over its shared connection pool
+        self.fetcher = fetcher
+
+    def parse(self, source, category_id):
+        """Returns the unique feeds of the document, keyed by url, plus how many repeats were dropped."""
+        feeds = {}
+        repeated = 0
+        for folder, title, url, description in iter_opml(source):
+            if url in feeds:
+                repeated += 1
+                continue
+            feeds[url] = {"folder": folder, "name": title or url, "url": url, "description": description, "category_id": category_id}
+        return feeds, repeated
+
+    async def import_opml(self, pool, source, category_id, validate=False, concurrency=20):
+        """
+        Imports one OPML document.
+
+        :param validate: Fetch every new feed first and skip the ones that don't answer with a feed.
+        :return: A summary with the imported feeds and what was skipped.
+        """
+        # Parsing is synchronous, so a large upload is parsed off the event loop
+        feeds, repeated = await asyncio.to_thread(self.parse, source, category_id)
+
+        async with pool.acquire() as conn:
+            existing = await conn.fetch("SELECT url FROM feeds WHERE url = ANY($1::text[])", list(feeds))
+        for row in existing:
+            feeds.pop(row["url"], None)
+
+        invalid = []
+        if validate and feeds and self.fetcher:
+            valid = await self.fetcher.validate_feeds(list(feeds), concurrency)
+            invalid = [url for url in feeds if url not in valid]
+            for url in invalid:
+                feeds.pop(url)
+
+        categories = await self.write(pool, list(feeds.values()), category_id)
+        if self.registry:
+            await self.registry.refresh(pool)
+
+        return {
+            "feeds": [{"name": feed["name"], "url": feed["url"], "category_id": feed["category_id"]} for feed in feeds.values()],
+            "categories": categories,
+            "skipped_existing": len(existing),
+            "skipped_repeated": repeated,
+            "invalid": invalid
+        }
+
+    async def write(self, pool, feeds, category_id):
+        """Creates missing folder categories and bulk inserts the feeds, all in one transaction."""
+        folders = {feed["folder"] for feed in feeds if feed["folder"]}
+        created = {}
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                category_ids = {}
+                if folders:
+                    rows = await conn.fetch("SELECT id, name FROM categories WHERE name = ANY($1::text[])", list(folders))
+                    category_ids = {row["name"]: row["id"] for row in rows}
+                for folder in sorted(folders - category_ids.keys()):
+                    category_ids[folder] = created[folder] = await conn.fetchval(
+                        "INSERT INTO categories (name) VALUES ($1) RETURNING id", folder
+                    )
+
+                await conn.executemany(
+                    "INSERT INTO feeds (name, url, description, category_id) VALUES ($1, $2, $3, $4)",
+                    [
+                        (feed["name"], feed["url"], feed["description"], category_ids.get(feed["folder"], category_id))
+                        for feed in feeds
+                    ]
+                )
+
+        for feed in feeds:
+            feed["category_id"] = category_ids.get(feed["folder"], category_id)
+        return created
+
+    async def import_path(self, pool, path, category_id, validate=False):
+        """Imports a file, or every unprocessed .opml file of a folder, renaming each once imported."""
+        if not os.path.isdir(path):
+            with open(path, "rb") as file:
+                return [await self.import_opml(pool, file, category_id, validate)]
+
+        summaries = []
+        for filename in sorted(os.listdir(path)):
+            if filename.endswith('.opml') and not filename.endswith('_processed.opml'):
+                full_path = os.path.join(path, filename)
+                with open(full_path, "rb") as file:
+                    summaries.append(await self.import_opml(pool, file, category_id, validate))
+                # Rename processed files to avoid reprocessing
+                os.rename(full_path, os.path.join(path, filename.replace('.opml', '_processed.opml')))
+        return summaries
+
+
+async def run(paths, category_id, validate):
+    from db_manager import DBManager
+    from rss_fetcher import RSSFetcher
+
+    db_manager = DBManager(DBManager.dsn_from_env())
+    importer = OPMLImporter(db_manager, fetcher=RSSFetcher(db_manager))
+    pool = await db_manager.get_pool()
+    try:
+        for path in paths:
+            for summary in await importer.import_path(pool, path, category_id, validate):
+                print(
+                    f"{path}: imported {len(summary['feeds'])} feeds, created {len(summary['categories'])} categories, "
+                    f"skipped {summary['skipped_existing']} existing, {summary['skipped_repeated']} repeated "
+                    f"and {len(summary['invalid'])} invalid feeds"
+                )
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Import OPML subscriptions into the NexaFeed database.")
+    parser.add_argument("paths", nargs="+", help="OPML files, or folders of .opml files")
+    parser.add_argument("--category", type=int, required=True, help="Category for feeds outside any folder")
+    parser.add_argument("--validate", action="store_true", help="Skip feeds that don't answer with a feed")
+    args = parser.parse_args()
+    asyncio.run(run(args.paths, args.category, args.validate))
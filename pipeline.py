@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import traceback
+
+
+class Pipeline:
+    """
+    Background processing stage fed from the ingest path.
+
+    Items go into a bounded queue drained by a fixed number of workers, and
+    results are written back in batches, either once `batch_size` results are
+    waiting or every `flush_interval` seconds. When the queue is full new items
+    are dropped rather than slowing ingest down.
+    Subclasses implement `enqueue(entries)`, `process(item)` and `write(results)`.
+    """
+    name = "pipeline"
+
+    def __init__(self, workers=4, queue_size=1000, batch_size=50, flush_interval=2.0):
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.results = []
+        self.tasks = []
+        self.delayed = set()
+        self.dropped = 0
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self.tasks = [loop.create_task(self.worker()) for _ in range(self.workers)]
+        self.tasks.append(loop.create_task(self.flusher()))
+
+    def enqueue(self, entries):
+        """Queues the entries of a freshly inserted batch that this stage handles, each carrying its `id`."""
+        raise NotImplementedError
+
+    def submit(self, items):
+        """Queues items without waiting, returns how many were accepted."""
+        accepted = 0
+        for item in items:
+            try:
+                self.queue.put_nowait(item)
+                accepted += 1
+            except asyncio.QueueFull:
+                self.dropped += 1
+        if accepted < len(items):
+            print(f"{self.name} queue full, dropped {len(items) - accepted} items ({self.dropped} in total)")
+        return accepted
+
+    def retry_later(self, item, delay):
+        """Queues an item again after `delay` seconds, without holding a worker meanwhile."""
+        def requeue():
+            self.delayed.discard(handle)
+            self.submit([item])
+        handle = asyncio.get_running_loop().call_later(delay, requeue)
+        self.delayed.add(handle)
+
+    async def worker(self):
+        while True:
+            item = await self.queue.get()
+            try:
+                result = await self.process(item)
+                if result is not None:
+                    self.results.append(result)
+                    if len(self.results) >= self.batch_size:
+                        await self.flush()
+            except Exception as e:
+                logging.error(f"{self.name} failed on {item!r}: {e}\n{traceback.format_exc()}")
+            finally:
+                self.queue.task_done()
+
+    async def flusher(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        batch, self.results = self.results, []
+        if not batch:
+            return
+        try:
+            await self.write(batch)
+        except Exception as e:
+            logging.error(f"{self.name} failed to write {len(batch)} results: {e}")
+
+    async def join(self):
+        """Waits until every queued item is processed and written."""
+        await self.queue.join()
+        await self.flush()
+
+    async def close(self):
+        for handle in self.delayed:
+            handle.cancel()
+        self.delayed.clear()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        await self.flush()
+
+    async def process(self, item):
+        raise NotImplementedError
+
+    async def write(self, results):
+        raise NotImplementedError
@@ -0,0 +1,129 @@
+import io
+import os
+import re
+import json
+import time
+import pstats
+import cProfile
+from contextlib import asynccontextmanager
+
+PROFILE_ID_PATTERN = re.compile(r'^[0-9]+-[a-z]+$')
+
+
+class Profiler:
+    """
+    Opt-in cProfile captures of single requests and fetch cycles, kept as pstats files.
+
+    cProfile hooks the whole thread, so a capture also includes whatever other tasks ran on
+    the event loop meanwhile. Only one capture runs at a time; requests arriving during a
+    capture are served unprofiled. The newest `keep` captures are kept, each as a .pstats
+    file with a .json description next to it.
+    """
+
+    def __init__(self):
+        self.directory = None
+        self.sample_rate = 0
+        self.fetch_sample_rate = 0
+        self.keep = 50
+        self.active = None
+        self.counters = {"request": 0, "fetch": 0}
+
+    def configure(self, directory, sample_rate=0, fetch_sample_rate=0, keep=50):
+        """
+        :param sample_rate: Profile 1 in N requests, 0 to only profile when asked.
+        :param fetch_sample_rate: Profile 1 in N fetch cycles, 0 to only profile when asked.
+        """
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.fetch_sample_rate = fetch_sample_rate
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+    def sampled(self, kind):
+        """Counts one request or fetch cycle, returns True for every Nth one."""
+        rate = self.sample_rate if kind == "request" else self.fetch_sample_rate
+        if not rate:
+            return False
+        self.counters[kind] += 1
+        return self.counters[kind] % rate == 0
+
+    def start(self, kind, target):
+        """Starts a capture, or returns None when profiling isn't configured or another capture runs."""
+        if self.directory is None or self.active is not None:
+            return None
+        profile = cProfile.Profile()
+        self.active = {"kind": kind, "target": target, "profile": profile, "started": time.perf_counter(), "created": time.time()}
+        profile.enable()
+        return self.active
+
+    def stop(self, capture):
+        """Stops the capture and stores it, returns its id."""
+        capture["profile"].disable()
+        duration = time.perf_counter() - capture["started"]
+        self.active = None
+
+        profile_id = f"{int(capture['created'] * 1000)}-{capture['kind']}"
+        capture["profile"].dump_stats(os.path.join(self.directory, f"{profile_id}.pstats"))
+        with open(os.path.join(self.directory, f"{profile_id}.json"), "w") as file:
+            json.dump({
+                "id": profile_id,
+                "kind": capture["kind"],
+                "target": capture["target"],
+                "duration_ms": round(duration * 1000, 1),
+                "created": capture["created"]
+            }, file)
+        self.prune()
+        return profile_id
+
+    @asynccontextmanager
+    async def fetch_cycle(self, target, force=False):
+        """Profiles the enclosed fetch cycle when forced or sampled."""
+        capture = self.start("fetch", target) if force or self.sampled("fetch") else None
+        try:
+            yield capture
+        finally:
+            if capture is not None:
+                self.stop(capture)
+
+    def prune(self):
+        for profile in self.list()[self.keep:]:
+            for extension in (".pstats", ".json"):
+                try:
+                    os.remove(os.path.join(self.directory, profile["id"] + extension))
+                except FileNotFoundError:
+                    pass
+
+    def list(self):
+        """Returns the stored captures, newest first."""
+        if self.directory is None:
+            return []
+        profiles = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".json"):
+                try:
+                    with open(os.path.join(self.directory, filename)) as file:
+                        profiles.append(json.load(file))
+                except (OSError, ValueError):
+                    continue
+        profiles.sort(key=lambda profile: profile["created"], reverse=True)
+        return profiles
+
+    def path(self, profile_id):
+        """Returns the pstats file of a capture, or None for unknown or malformed ids."""
+        if self.directory is None or not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.pstats")
+        return path if os.path.exists(path) else None
+
+    def summary(self, profile_id, sort="cumulative", limit=40):
+        """Returns the top functions of a capture as text, like `python -m pstats`."""
+        path = self.path(profile_id)
+        if path is None:
+            return None
+        output = io.StringIO()
+        stats = pstats.Stats(path, stream=output)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+
+PROFILER = Profiler()
@@ -0,0 +1,133 @@
+import math
+import time
+import threading
+import zlib
+from collections import OrderedDict
+
+
+class MemoryBackend:
+    """In-process token buckets kept in sharded, size-bounded LRU maps."""
+
+    def __init__(self, max_clients=10000, shards=16):
+        self.shards = [OrderedDict() for _ in range(shards)]
+        self.locks = [threading.Lock() for _ in range(shards)]
+        self.max_per_shard = max(1, max_clients // shards)
+
+    def _shard(self, key):
+        index = zlib.crc32(key.encode()) % len(self.shards)
+        return self.shards[index], self.locks[index]
+
+    async def consume(self, key, capacity, rate):
+        """Takes one token from the bucket, returns the tokens left (negative when denied)."""
+        now = time.monotonic()
+        buckets, lock = self._shard(key)
+        with lock:
+            tokens, updated = buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            buckets[key] = (tokens, now)
+
+            # Evict the least recently seen clients once the shard is full
+            while len(buckets) > self.max_per_shard:
+                buckets.popitem(last=False)
+
+        return tokens if allowed else tokens - 1
+
+    async def close(self):
+        for buckets in self.shards:
+            buckets.clear()
+
+
+class PostgresBackend:
+    """Token buckets stored in the rate_limits table so every worker shares them."""
+
+    CONSUME_QUERY = """
+        WITH bucket AS (
+            SELECT LEAST($2::float8, COALESCE(
+                (SELECT tokens + EXTRACT(EPOCH FROM (clock_timestamp() - updated_at)) * $3::float8
+                 FROM rate_limits WHERE key = $1 FOR UPDATE),
+                $2::float8)) AS tokens
+        )
+        INSERT INTO rate_limits (key, tokens, updated_at)
+        SELECT $1, CASE WHEN tokens >= 1 THEN tokens - 1 ELSE tokens END, clock_timestamp() FROM bucket
+        ON CONFLICT (key) DO UPDATE SET tokens = EXCLUDED.tokens, updated_at = EXCLUDED.updated_at
+        RETURNING (SELECT tokens FROM bucket) AS available
+    """
+
+    def __init__(self, db_manager, ttl=600, cleanup_every=1000):
+        self.db_manager = db_manager
+        self.ttl = ttl
+        self.cleanup_every = cleanup_every
+        self.calls = 0
+
+    async def consume(self, key, capacity, rate):
+        pool = await self.db_manager.get_pool()
+        async with pool.acquire() as conn:
+            available = await conn.fetchval(self.CONSUME_QUERY, key, float(capacity), float(rate))
+
+            self.calls += 1
+            if self.calls % self.cleanup_every == 0:
+                await conn.execute(
+                    "DELETE FROM rate_limits WHERE updated_at < now() - make_interval(secs => $1)",
+                    float(self.ttl)
+                )
+
+        return available - 1
+
+    async def close(self):
+        pass
+
+
+class RateLimiter:
+    BACKENDS = ("memory", "postgres")
+
+    def __init__(self, config_manager):
+        self.config_manager = config_manager
+        self.backend = None
+
+    def configure(self, db_manager=None):
+        """Creates the backend selected by `rate_limit.backend` in the configuration."""
+        name = self.config_manager.get("rate_limit.backend", "memory")
+        ttl = self.config_manager.get("rate_limit.ttl", 600)
+        if name not in self.BACKENDS:
+            print(f"Unknown rate limit backend '{name}', falling back to memory")
+            name = "memory"
+
+        if name == "postgres" and db_manager is not None and db_manager.backend.name == "postgres":
+            self.backend = PostgresBackend(db_manager, ttl=ttl)
+        else:
+            self.backend = MemoryBackend(
+                max_clients=self.config_manager.get("rate_limit.max_clients", 10000),
+                shards=self.config_manager.get("rate_limit.shards", 16)
+            )
+        return self.backend
+
+    def route_limits(self, route, limit, time_window):
+        """Returns the (limit, time_window) for a route, allowing config overrides."""
+        route_config = self.config_manager.get(f"rate_limit.routes.{route}", {}) or {}
+        return route_config.get("limit", limit), route_config.get("time_window", time_window)
+
+    async def hit(self, route, client_id, limit, time_window):
+        """
+        Registers a request for the client on the given route.
+
+        :return: A tuple (allowed, retry_after) where retry_after is in whole seconds.
+        """
+        if self.backend is None:
+            self.configure()
+
+        limit, time_window = self.route_limits(route, limit, time_window)
+        rate = limit / time_window
+        tokens = await self.backend.consume(f"{route}:{client_id}", limit, rate)
+        if tokens >= 0:
+            return True, 0
+
+        # The bucket was short by -tokens, which refill at `rate` tokens per second
+        return False, max(1, math.ceil(-tokens / rate))
+
+    async def close(self):
+        if self.backend is not None:
+            await self.backend.close()
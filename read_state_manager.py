@@ -0,0 +1,84 @@
+from datetime import datetime, timezone
+from dateutil.parser import parse
+
+DEFAULT_USER = "default"
+
+
+class ReadStateManager:
+    """
+    Tracks what a user has read with one high-water mark per category.
+
+    Entries at or below the mark, ordered like the feed by (published_date, id), are read.
+    Entries above it that were opened one by one are stored as read exceptions, which
+    are dropped again as soon as the mark moves past them.
+    """
+
+    UNREAD_COUNTS_QUERY = """
+        SELECT c.id AS category_id,
+            (SELECT COUNT(*) FROM feed_entries e
+                WHERE e.category_id = c.id
+                AND (m.read_until_pd IS NULL OR (e.published_date, e.id) > (m.read_until_pd, m.read_until_id)))
+            - (SELECT COUNT(*) FROM read_exceptions x
+                WHERE x.user_id = $1 AND x.category_id = c.id) AS unread
+        FROM categories c
+        LEFT JOIN read_marks m ON m.category_id = c.id AND m.user_id = $1
+    """
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    def parse_cursor_date(self, value):
+        if isinstance(value, datetime):
+            dt = value
+        else:
+            dt = parse(str(value))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt
+
+    async def unread_counts(self, pool, user_id=DEFAULT_USER):
+        """Returns {category_id: unread count} for every category in a single query."""
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(self.UNREAD_COUNTS_QUERY, user_id)
+        return {row['category_id']: max(0, row['unread']) for row in rows}
+
+    async def mark_read_until(self, pool, category_id, last_id, last_pd, user_id=DEFAULT_USER):
+        """
+        Marks every entry of the category up to and including the cursor as read.
+
+        The cursor is the newest entry the user has loaded, so entries that arrived since stay
+        unread. The mark only ever moves forward.
+        """
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                last_id = int(last_id)
+                last_pd = self.parse_cursor_date(last_pd)
+                await conn.execute("""
+                    INSERT INTO read_marks (user_id, category_id, read_until_pd, read_until_id, updated_at)
+                    VALUES ($1, $2, $3, $4, now())
+                    ON CONFLICT (user_id, category_id) DO UPDATE
+                    SET read_until_pd = EXCLUDED.read_until_pd, read_until_id = EXCLUDED.read_until_id, updated_at = EXCLUDED.updated_at
+                    WHERE (read_marks.read_until_pd, read_marks.read_until_id) < (EXCLUDED.read_until_pd, EXCLUDED.read_until_id)
+                """, user_id, category_id, last_pd, last_id)
+                await conn.execute("""
+                    DELETE FROM read_exceptions
+                    WHERE user_id = $1 AND category_id = $2 AND (published_date, entry_id) <= ($3, $4)
+                """, user_id, category_id, last_pd, last_id)
+        return True
+
+    async def mark_entries_read(self, pool, entry_ids, user_id=DEFAULT_USER):
+        """Records single entries as read, skipping those already covered by their category's mark."""
+        if not entry_ids:
+            return
+        async with pool.acquire() as conn:
+            await conn.execute("""
+                INSERT INTO read_exceptions (user_id, entry_id, category_id, published_date)
+                SELECT $1, e.id, e.category_id, e.published_date FROM feed_entries e
+                WHERE e.id = ANY($2::bigint[]) AND e.category_id IS NOT NULL
+                AND NOT EXISTS (
+                    SELECT 1 FROM read_marks m
+                    WHERE m.user_id = $1 AND m.category_id = e.category_id
+                    AND (e.published_date, e.id) <= (m.read_until_pd, m.read_until_id)
+                )
+                ON CONFLICT DO NOTHING
+            """, user_id, [int(entry_id) for entry_id in entry_ids])
@@ -1,37 +1,184 @@
-from functools import lru_cache
+import re
+import asyncio
 import aiohttp
-from user_agent import generate_user_agent
+from cachetools import TTLCache
 from urllib.parse import urlsplit, urlunsplit
+from metrics import CACHE_REQUESTS
 
-@lru_cache(maxsize=1000)
-async def fetch_reddit_media(url):
-    video = None
-
-    if "reddit.com" in url:
-        # Convert Reddit URL to JSON endpoint
-        parts = urlsplit(url)
-        new_path = f"{parts.path.rstrip('/')}.json"
-        json_url = urlunsplit((parts.scheme, parts.netloc, new_path, parts.query, parts.fragment))
-        
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(json_url, headers={'User-agent': generate_user_agent()}) as response:
-                    if response.status == 200:
-                        reddit_json = await response.json()
-                        submission_data = reddit_json[0]['data']['children'][0]['data']
-                        
-                        media_data = submission_data.get('media')
-                        if media_data:
-                            video = media_data.get('reddit_video', {}).get('fallback_url')
-                        else:
-                            preview_data = submission_data.get('preview', {}).get('images', [{}])[0].get('source', {}).get('url')
-                            if preview_data:
-                                video = preview_data
-                        
-                        print(video)
-                    else:
-                        print(f"Failed to fetch Reddit data with status code: {response.status}")
-            except Exception as e:
-                print(f"Failed to fetch Reddit data: {e}")
-
-    return video
\ No newline at end of file
+REDDIT_API_BASE = "https://www.reddit.com"
+# The info listing accepts at most 100 fullnames per request
+INFO_BATCH_SIZE = 100
+post_id_regex = re.compile(r'/comments/([a-z0-9]+)', re.IGNORECASE)
+
+def extract_post_id(url):
+    """
+    Get the base36 post id out of a Reddit permalink.
+
+    :return: The post id, or None if the url isn't a Reddit post.
+    """
+    if "reddit.com" not in url and "redd.it" not in url:
+        return None
+    match = post_id_regex.search(url)
+    return match.group(1).lower() if match else None
+
+def extract_media(submission_data):
+    """
+    Pick the playable media out of a Reddit submission.
+
+    :return: The media URL, or '' if the submission has none.
+    """
+    media_data = submission_data.get('media')
+    if media_data:
+        return (media_data.get('reddit_video') or {}).get('fallback_url') or ''
+
+    preview_data = (submission_data.get('preview', {}).get('images') or [{}])[0].get('source', {}).get('url')
+    return preview_data or ''
+
+async def fetch_reddit_media(url, session):
+    """
+    Resolve the media of a single Reddit post through its .json endpoint.
+
+    :return: The media URL, '' if the post has none, or None if Reddit couldn't be reached.
+    """
+    if "reddit.com" not in url:
+        return ''
+
+    # Convert Reddit URL to JSON endpoint
+    parts = urlsplit(url)
+    new_path = f"{parts.path.rstrip('/')}.json"
+    json_url = urlunsplit((parts.scheme, parts.netloc, new_path, parts.query, parts.fragment))
+
+    from user_agent import generate_user_agent
+    try:
+        async with session.get(json_url, headers={'User-agent': generate_user_agent()}) as response:
+            if response.status != 200:
+                print(f"Failed to fetch Reddit data with status code: {response.status}")
+                return None
+            reddit_json = await response.json()
+            return extract_media(reddit_json[0]['data']['children'][0]['data'])
+    except Exception as e:
+        print(f"Failed to fetch Reddit data: {e}")
+        return None
+
+async def fetch_reddit_media_batch(post_ids, session, api_base=REDDIT_API_BASE):
+    """
+    Resolve the media of up to INFO_BATCH_SIZE posts with one request to the info listing.
+
+    :return: A dict of post id to media URL ('' if the post has none), or None if Reddit couldn't be reached.
+    """
+    fullnames = ','.join(f"t3_{post_id}" for post_id in post_ids)
+    info_url = f"{api_base.rstrip('/')}/api/info.json"
+
+    from user_agent import generate_user_agent
+    try:
+        async with session.get(info_url, params={'id': fullnames, 'raw_json': '1'}, headers={'User-agent': generate_user_agent()}) as response:
+            if response.status != 200:
+                print(f"Failed to fetch Reddit info with status code: {response.status}")
+                return None
+            listing = await response.json()
+    except Exception as e:
+        print(f"Failed to fetch Reddit info: {e}")
+        return None
+
+    media = {}
+    for child in listing.get('data', {}).get('children', []):
+        data = child.get('data', {})
+        if data.get('id'):
+            media[data['id'].lower()] = extract_media(data)
+    # Posts missing from the listing were removed, so they have no media either
+    return {post_id: media.get(post_id, '') for post_id in post_ids}
+
+class RedditMediaResolver:
+    """
+    Resolves Reddit media at most once per post.
+
+    Results are kept in a TTL/LRU cache and persisted on the feed_entries row, and
+    concurrent requests for the same post share a single upstream call.
+    """
+
+    def __init__(self, db_manager=None, max_size=1000, ttl=3600, api_base=REDDIT_API_BASE, batch_size=INFO_BATCH_SIZE):
+        self.db_manager = db_manager
+        self.api_base = api_base
+        self.batch_size = min(batch_size, INFO_BATCH_SIZE)
+        self.cache = TTLCache(maxsize=max_size, ttl=ttl)
+        self.inflight = {}
+        self.session = None
+
+    def get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+        return self.session
+
+    async def resolve(self, url):
+        if url in self.cache:
+            CACHE_REQUESTS.inc("reddit", "hit")
+            return self.cache[url]
+        CACHE_REQUESTS.inc("reddit", "miss")
+
+        task = self.inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._resolve(url))
+            self.inflight[url] = task
+            task.add_done_callback(lambda _: self.inflight.pop(url, None))
+        # Shielded so one client disconnecting doesn't cancel the lookup the others wait on
+        return await asyncio.shield(task)
+
+    async def _resolve(self, url):
+        media = await self.load_persisted(url)
+        if media is None:
+            media = await fetch_reddit_media(url, self.get_session())
+            if media is None:
+                # Upstream failures aren't cached so the next request retries
+                return None
+            await self.persist(url, media)
+
+        self.cache[url] = media
+        return media
+
+    async def prefetch(self, urls):
+        """
+        Resolve many posts at once through the info listing, used while ingesting feeds.
+
+        Results are only cached; the caller stores them with the entries it inserts.
+
+        :return: A dict of url to media URL for every post that could be resolved.
+        """
+        resolved = {}
+        ids_by_url = {}
+        for url in urls:
+            if url in self.cache:
+                resolved[url] = self.cache[url]
+                continue
+            post_id = extract_post_id(url)
+            if post_id:
+                ids_by_url[url] = post_id
+
+        post_ids = list(dict.fromkeys(ids_by_url.values()))
+        batches = [post_ids[i:i + self.batch_size] for i in range(0, len(post_ids), self.batch_size)]
+        results = await asyncio.gather(*(fetch_reddit_media_batch(batch, self.get_session(), self.api_base) for batch in batches))
+
+        media_by_id = {}
+        for result in results:
+            media_by_id.update(result or {})
+        for url, post_id in ids_by_url.items():
+            if post_id in media_by_id:
+                resolved[url] = self.cache[url] = media_by_id[post_id]
+        return resolved
+
+    async def load_persisted(self, url):
+        if self.db_manager is None:
+            return None
+        pool = await self.db_manager.get_pool()
+        async with pool.acquire() as conn:
+            return await conn.fetchval("SELECT media_url FROM feed_entries WHERE original_link = $1", url)
+
+    async def persist(self, url, media):
+        if self.db_manager is None:
+            return
+        pool = await self.db_manager.get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute("UPDATE feed_entries SET media_url = $2 WHERE original_link = $1", url, media)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
@@ -1,120 +1,117 @@
+import time
 import asyncio
-import re
-import pytz
-import tldextract
 import traceback
-from rapidfuzz import fuzz
-from aiohttp import ClientSession, TCPConnector
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+from collections import Counter
 from datetime import datetime, timezone, timedelta
 from dateutil.parser import parse
-import feedparser
-from user_agent import generate_user_agent
 from media_fetcher import fetch_media
 from db_manager import QueryBuilder
+from source_manager import SourceProfiles, DATE_ATTRIBUTES, detect_date_attribute
+from fetch_log_manager import FetchLog
+from websub_manager import discover_hub
+from metrics import FEED_FETCH_SECONDS, FEED_BYTES, FEED_BYTES_IN_FLIGHT, FEED_FETCHES, FEED_ENTRIES, FEED_PARSE_SECONDS, ENTRY_PROCESS_SECONDS, PAGE_QUERY_SECONDS, POLLS_SKIPPED
 import logging
-import yake
 from lxml import etree
 from io import BytesIO
 
 logging.basicConfig(level=logging.INFO)
 
-def get_website_name(url):
+# aiohttp only decodes brotli when one of these is installed, so br is only advertised then
+try:
+    import brotli
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
     try:
-        # Extract the registered domain (sld + tld) using tldextract
-        extracted = tldextract.extract(url)
-        # The website name is usually the second-level domain (sld)
-        website_name = extracted.domain
-        # Capitalize the first letter of the website name
-        return website_name.capitalize()
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return None
-    
-
-def select_title(feed_title, creator, website_name):
-    # If feed title and creator are the same, discard the feed title.
-    if feed_title == creator:
-        feed_title = None
-    
-    # Prepare a list to hold the titles
-    titles = []
-
-    # If the website name is valid, add it first
-    if website_name:
-        titles.append(website_name)
-
-    # Check if feed title and website name are similar
-    if feed_title:
-        if not is_close(feed_title, website_name):
-            # If not similar, add feed_title after website_name
-            titles.append(feed_title)
-    
-    return titles
-
-def is_close(str1, str2, threshold=80):  # Note: threshold is 0-100
-    return fuzz.ratio(str1.lower(), str2.lower()) > threshold
-
-# Compile the regular expression for performance
-CLEAN_TEXT_PATTERN = re.compile(r'<[^<]+?>|http\S+|[^A-Za-z ]+')
-def clean_text(text):
-    """
-    Clean the input text by removing HTML tags, URLs, special characters, and numbers.
+        import brotlicffi
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
 
-    Args:
-    text (str): The text to be cleaned.
+READ_CHUNK_BYTES = 64 * 1024
+# Budget taken by a download that doesn't announce its length, grown as the body arrives
+DEFAULT_RESERVATION = 256 * 1024
 
-    Returns:
-    str: The cleaned text.
-    """
-    return CLEAN_TEXT_PATTERN.sub('', text)
 
-def is_valid_tag(tag):
+class ByteBudget:
     """
-    Check if the tag is valid by ensuring it's not a URL, not purely numerical, and within a certain length range.
-
-    Args:
-    tag (str): The tag to be validated.
+    Caps the feed bodies held in memory at once, across every download.
 
-    Returns:
-    bool: True if the tag is valid, False otherwise.
+    Downloads wait for room before they start reading and then grow their share without
+    waiting, so two half-read bodies never wait on each other. The limit can therefore
+    be overshot, by at most the downloads already running, each capped at max_body_bytes.
     """
-    return not (re.match(r'https?://\S+', tag) or re.fullmatch(r'\d+', tag) or len(tag) < 3 or len(tag) > 50)
-
-def extract_tags_from_entry(text, max_ngram_size=3, numOfKeywords=5, deduplication_threshold=0.9):
-    try:
-        yake_extractor = yake.KeywordExtractor(n=max_ngram_size, dedupLim=deduplication_threshold, top=numOfKeywords, features=None)
-        yake_keywords = [kw for kw, _ in yake_extractor.extract_keywords(text)]
 
-        # Optionally, apply additional filtering for tags
-        tags = [tag for tag in yake_keywords if is_valid_tag(tag)]
-
-        return tags
-    except Exception as e:
-        print("An error occurred in extract_tags_from_entry:", e)
-        return []
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.waiters = []
+
+    async def admit(self, size):
+        while self.used and self.used + size > self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            await waiter
+        self.grow(size)
+
+    def grow(self, size):
+        self.used += size
+        FEED_BYTES_IN_FLIGHT.set(self.used)
+
+    def release(self, size):
+        self.grow(-size)
+        waiters, self.waiters = self.waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
 
 class RSSFetcher:
     BASE_QUERY = "SELECT * FROM feed_entries"
     ORDER_AND_LIMIT = "ORDER BY published_date DESC, id DESC LIMIT $1::bigint"
 
-    def __init__(self, db_manager, max_workers=50):
+    def __init__(self, db_manager, max_workers=50, registry=None, reddit_resolver=None, thumbnails=None, pipelines=(), fetch_log_retention_days=90, websub=None,
+                 suggestions=None, stats=None, max_body_bytes=20 * 1024 * 1024, header_timeout=15, body_timeout=60, memory_budget_bytes=256 * 1024 * 1024):
         self.feed_metadata = {}
         self.db_manager = db_manager
+        self.registry = registry
+        self.reddit_resolver = reddit_resolver
+        self.thumbnails = thumbnails
+        self.pipelines = pipelines
+        self.websub = websub
+        self.suggestions = suggestions
+        self.stats = stats
         self.max_workers = max_workers
+        self.max_body_bytes = max_body_bytes
+        self.header_timeout = header_timeout
+        self.body_timeout = body_timeout
+        self.budget = ByteBudget(memory_budget_bytes)
+        self.connector = None
         self.namespaces = {
             'dc': 'http://purl.org/dc/elements/1.1/'
         }
-        self.date_attributes = ['pubDate', 'published', 'dc:date', 'date', 'published_date']
+        self.date_attributes = DATE_ATTRIBUTES
+        self.sources = SourceProfiles(db_manager)
+        self.fetch_log = FetchLog(db_manager, fetch_log_retention_days)
+        # (bytes, seconds) of each download, taken by fetch_feeds for the fetch log
+        self.downloads = {}
+        # (hub, topic) of the fetched feeds advertising a WebSub hub, taken by fetch_feeds
+        self.hubs = {}
+
+    def remove_old_entries(self, feed_xml, last_updated_date, url="", charset=None):
+        """
+        Drops the items published before `last_updated_date` from a raw feed body.
 
-    def remove_old_entries(self, feed_xml, last_updated_date, url=""):
+        :param charset: The charset of the Content-Type header, which overrides the XML declaration.
+        :return: The trimmed body, re-encoded in the same charset, and whether any item is left.
+        """
         if not last_updated_date or not isinstance(last_updated_date, datetime):
             print("Invalid last_updated_date")
             return feed_xml, False
 
         try:
-            feed_xml_bytes = feed_xml.encode('utf-8')
-            with BytesIO(feed_xml_bytes) as feed_xml_io:
-                tree = etree.parse(feed_xml_io)
+            parser = etree.XMLParser(encoding=charset) if charset else None
+            with BytesIO(feed_xml) as feed_xml_io:
+                tree = etree.parse(feed_xml_io, parser)
                 root = tree.getroot()
                 root_of_interest = root[0] if len(root) > 0 else None
 
@@ -127,10 +124,11 @@ class RSSFetcher:
                 for item in items_to_remove:
                     root_of_interest.remove(item)
 
-                xml_string = etree.tostring(root_of_interest, pretty_print=True, encoding='unicode')
-                return xml_string, new_entries_found
+                # Encoded like the original, so the charset the parser is told still applies
+                xml_bytes = etree.tostring(root_of_interest, encoding=charset or 'utf-8', xml_declaration=True)
+                return xml_bytes, new_entries_found
 
-        except etree.XMLSyntaxError as e:
+        except (etree.XMLSyntaxError, LookupError) as e:
             print(f"XML parsing error for {url}: {e}")
             return feed_xml, False
 
@@ -175,7 +173,6 @@ class RSSFetcher:
             return None
     
     async def get_feed(self, pool, category, limit=50, last_id=None, last_pd=None, search_query=None, threshold=0.25):
-        print(f"Fetching feed with limit {limit}")
         query_builder = QueryBuilder()
         query_builder.where("category_id = %s", int(category))
 
@@ -191,21 +188,26 @@ class RSSFetcher:
             # Validate and sanitize search_query here to avoid sql injection or other exploits
             # ...
 
-            search_condition = "((similarity(title, %s) > %s OR EXISTS (SELECT 1 FROM jsonb_array_elements_text(additional_info->'tags') AS tag WHERE similarity(tag, %s) > %s ) OR similarity(additional_info->>'creator', %s) > %s) OR title ILIKE %s OR additional_info->>'creator' ILIKE %s OR url ILIKE %s)"
-            query_builder.where(search_condition, search_query, threshold, search_query, threshold, search_query, threshold, f"%{search_query}%", f"%{search_query}%", f"%{search_query}%")
+            search_condition, search_params = self.db_manager.backend.search_condition(search_query, threshold)
+            query_builder.where(search_condition, *search_params)
 
         query_builder.orderBy("published_date DESC, id DESC").limit(int(limit))
         query, params = query_builder.build()
 
-        feeds = await self.db_manager.select_data(pool, "feed_entries", query, params)
+        with PAGE_QUERY_SECONDS.time("search" if search_query else "page"):
+            feeds = await self.db_manager.select_data(pool, "feed_entries", query, params)
         return feeds
     
-    async def process_entry(self, category, entry, url, feed_title_raw=None):
+    async def process_entry(self, category, entry, url, profile=None):
+        with ENTRY_PROCESS_SECONDS.time():
+            return self.build_entry(category, entry, url, profile)
+
+    def build_entry(self, category, entry, url, profile=None):
         # Directly use dict.get for attributes that are dicts
         original_link = entry.get('link', '')
 
         # Initialize published_date
-        published_date = self.get_published_date(entry, url)
+        published_date = self.get_published_date(entry, url, profile and profile['date_attribute'])
 
         # If there is no valid published date, log a warning and skip processing this entry
         if not published_date:
@@ -220,15 +222,6 @@ class RSSFetcher:
         summary = tree.text_content() if tree is not None else summary
         content = str(entry.get('content', [{}])[0].get('value', summary))
 
-        creator = additional_info.get('creator', '')
-        website_name = get_website_name(url)
-
-        additional_info['web_name'] = select_title(feed_title_raw, creator, website_name)
-
-        #tags = extract_tags_from_entry(clean_text(title + ' ' + content))
-        #if tags:
-        #    additional_info['tags'] = additional_info.get('tags', []) + tags
-
         # Build the processed entry dict
         processed_entry = {
             'url': url,
@@ -237,6 +230,7 @@ class RSSFetcher:
             'content': content,
             'thumbnail': thumbnail,
             'video_id': video_id,
+            'media_url': None,
             'additional_info': additional_info,
             'published_date': published_date,
             'original_link': original_link
@@ -244,8 +238,12 @@ class RSSFetcher:
 
         return processed_entry, published_date
 
-    def get_published_date(self, entry, url):
-        for attr in self.date_attributes:
+    def get_published_date(self, entry, url, preferred_attribute=None):
+        # The attribute the feed is known to use goes first, the rest are fallbacks
+        attributes = self.date_attributes
+        if preferred_attribute:
+            attributes = [preferred_attribute] + [attr for attr in attributes if attr != preferred_attribute]
+        for attr in attributes:
             date_str = getattr(entry, attr, None)
             if date_str:
                 published_date = self.parse_date(date_str)
@@ -266,26 +264,46 @@ class RSSFetcher:
             fm_last_checked = fm_latest_entry.get("last_checked")
             fm_latest_title = fm_latest_entry.get("latest_title")
 
-        headers = {'User-Agent': generate_user_agent()}
+        # Imported here like feedparser, it pulls in pytz, which the web app doesn't need
+        from user_agent import generate_user_agent
+        headers = {'User-Agent': generate_user_agent(), 'Accept-Encoding': ACCEPT_ENCODING}
         if fm_latest_etag:
             headers["If-None-Match"] = fm_latest_etag
         if fm_last_checked:
             headers["If-Modified-Since"] = fm_last_checked.strftime("%a, %d %b %Y %H:%M:%S GMT")
             fm_last_checked = self.parse_date(fm_last_checked)
     
-        async with ClientSession(connector=connector, headers=headers) as fetch_session:
+        # A stalled read fails even within body_timeout, so one silent server can't hold a worker for long
+        timeout = ClientTimeout(total=None, sock_connect=self.header_timeout, sock_read=self.header_timeout)
+        async with ClientSession(connector=connector, connector_owner=False, headers=headers, timeout=timeout) as fetch_session:
+            body = None
             try:
-                async with fetch_session.get(url) as response:
+                started = time.perf_counter()
+                # Awaiting the request returns as soon as the status line and headers are in
+                response = await asyncio.wait_for(fetch_session.get(url), self.header_timeout)
+                async with response:
                     # Check for Internal Server Error
                     if response.status != 200:
                         return [], [], response.status
-                    text = await response.text()
+                    body = await asyncio.wait_for(self.read_body(response, url), self.body_timeout)
+                    if body is None:
+                        return [], [], 413
+                    self.downloads[url] = (len(body), time.perf_counter() - started)
+                    FEED_FETCH_SECONDS.observe(self.downloads[url][1])
+                    FEED_BYTES.inc(amount=len(body))
+                    # The body stays bytes: lxml and feedparser work out the charset themselves
+                    content = body
                     should_parse = True
                     if fm_last_checked:
-                        text, should_parse = self.remove_old_entries(text, fm_last_checked, url)
+                        content, should_parse = self.remove_old_entries(body, fm_last_checked, url, response.charset)
+                    # The feed answered in full with nothing new, which is logged as the 200 it was
                     if not should_parse:
-                        return [], [], 304
-                    feed = feedparser.parse(text, etag=fm_latest_etag, modified=headers.get("If-Modified-Since"), request_headers=headers, response_headers=response.headers)
+                        return [], [], 200
+                    # Imported here so the web app doesn't pay for it until the first fetch
+                    import feedparser
+                    with FEED_PARSE_SECONDS.time():
+                        feed = feedparser.parse(content, etag=fm_latest_etag, modified=headers.get("If-Modified-Since"), request_headers=headers, response_headers=response.headers)
+                    del content
 
                     feed_status_code = getattr(feed, 'status', None)
                     if feed_status_code and feed_status_code != 200:
@@ -294,40 +312,93 @@ class RSSFetcher:
                     entries = feed.entries
                     len_entries = len(entries)
                     if not entries or len_entries == 0:
-                        return [], [], 304
-                    
-                    print(len_entries)
-                    feed_title_raw = feed.feed.get('title', None)
+                        return [], [], 200
+
+                    FEED_ENTRIES.inc(amount=len_entries)
+                    if self.websub:
+                        hub, topic = discover_hub(feed, response.headers)
+                        if hub:
+                            self.hubs[url] = (hub, topic or url)
                     # Store the new ETag from the response for next request
                     new_etag = response.headers.get("ETag")
 
-                    # Process entries and collect published dates concurrently
-                    processed_entries_and_dates = await asyncio.gather(
-                        *(self.process_entry(category, entry, url, feed_title_raw) for entry in entries)
-                    )
-
-                    processed_entries = []
-                    if processed_entries_and_dates:
-                        # Separate the processed entries from their published dates
-                        processed_entries, published_dates = zip(*processed_entries_and_dates)
-
-                        # Filter out None values if any entry failed to process
-                        processed_entries = [entry for entry in processed_entries if entry is not None]
+                    processed_entries = await self.process_feed(category, url, feed)
                 
                     metadata_update = {
                         'url': url,
                         'etag': new_etag or fm_latest_etag,
-                        'content_length': len_entries,
+                        'content_length': len(body),
                         'expires': self.parse_date(response.headers.get('Expires')) or self.date_now,
                         'last_checked': self.date_now,
                         'latest_title': ""
                     }
                 
                 return processed_entries, metadata_update, 200
+            except asyncio.TimeoutError:
+                logging.warning(f"Timed out fetching {url}")
+                return [], [], 408
             except Exception as e:
                 logging.error(f"An error occurred while fetching {url}: {e}\n{traceback.format_exc()}")
                 return [], [], 443
+            finally:
+                if body is not None:
+                    self.budget.release(len(body))
+
+    async def read_body(self, response, url):
+        """
+        Streams a response body into memory, within max_body_bytes and the shared byte budget.
+
+        Sizes are of the decompressed body, so compression bombs are cut off like any
+        oversized feed.
+
+        :return: The body, or None if it's larger than max_body_bytes. It holds len(body)
+            of the budget until the caller releases it.
+        """
+        declared = response.content_length
+        if declared is not None and declared > self.max_body_bytes:
+            logging.warning(f"{url} announces {declared} bytes, more than the {self.max_body_bytes} allowed")
+            return None
+        # Content-Length counts compressed bytes, so it's only a first guess
+        reserved = min(declared or DEFAULT_RESERVATION, self.max_body_bytes)
+        await self.budget.admit(reserved)
+        chunks = []
+        size = 0
+        try:
+            async for chunk in response.content.iter_chunked(READ_CHUNK_BYTES):
+                size += len(chunk)
+                if size > self.max_body_bytes:
+                    logging.warning(f"{url} is larger than the {self.max_body_bytes} bytes allowed")
+                    self.budget.release(reserved)
+                    return None
+                if size > reserved:
+                    self.budget.grow(size - reserved)
+                    reserved = size
+                chunks.append(chunk)
+        except BaseException:
+            self.budget.release(reserved)
+            raise
+        # From here on the body holds exactly its own size
+        self.budget.release(reserved - size)
+        return b"".join(chunks)
     
+    async def process_feed(self, category, url, feed):
+        """Turns the entries of a parsed feed into feed_entries rows."""
+        profile = self.sources.refresh(url, feed)
+
+        # Process entries and collect published dates concurrently
+        processed_entries_and_dates = await asyncio.gather(
+            *(self.process_entry(category, entry, url, profile) for entry in feed.entries)
+        )
+
+        processed_entries = []
+        if processed_entries_and_dates:
+            # Separate the processed entries from their published dates
+            processed_entries, published_dates = zip(*processed_entries_and_dates)
+
+            # Filter out None values if any entry failed to process
+            processed_entries = [entry for entry in processed_entries if entry is not None]
+        return processed_entries
+
     async def fetch_feeds(self, category, urls, pool):
         if not urls:
             logging.warning("The 'urls' parameter is empty.")
@@ -338,13 +409,26 @@ class RSSFetcher:
         updated_urls = []
         all_processed_entries = []  # Collect all processed entries here
         metadata_updates = []  # Collect metadata updates here
-        self.date_now = self.parse_date(datetime.now(pytz.utc))
+        log_rows = []
+        self.date_now = self.parse_date(datetime.now(timezone.utc))
         semaphore = asyncio.Semaphore(self.max_workers)
 
         async def fetch_and_process(url):
             async with semaphore:
-                connector = TCPConnector(limit=self.max_workers*2, ssl=False)
-                processed_entries, metadata_update, code = await self.fetch_single_feed(connector, category, url)
+                fetched_at = datetime.now(timezone.utc)
+                started = time.perf_counter()
+                processed_entries, metadata_update, code = await self.fetch_single_feed(self.get_connector(), category, url)
+                FEED_FETCHES.inc(url, str(code) if code in (200, 304) else "error")
+                size, duration = self.downloads.pop(url, (0, time.perf_counter() - started))
+                log_rows.append({
+                    'fetched_at': fetched_at,
+                    'url': url,
+                    'status': code,
+                    'duration_ms': round(duration * 1000),
+                    'bytes': size,
+                    'entries': len(processed_entries),
+                    'new_entries': 0
+                })
                 if code != 200:
                     failed_urls.add(url)
                 else:
@@ -352,13 +436,24 @@ class RSSFetcher:
                     all_processed_entries.extend(processed_entries)
                     if metadata_update:
                         metadata_updates.append(metadata_update)
-                
-                await connector.close()
 
-        async with pool.acquire() as connection:
-            query = "SELECT * FROM feed_metadata WHERE url = ANY($1)"
-            feed_metadata_entries = await connection.fetch(query, urls)
-            self.feed_metadata = {entry['url']: entry for entry in feed_metadata_entries}
+        if self.registry and self.registry.loaded:
+            self.feed_metadata = {url: self.registry.get_fetch_state(url) or {} for url in urls}
+        else:
+            async with pool.acquire() as connection:
+                query = "SELECT * FROM feed_metadata WHERE url = ANY($1)"
+                feed_metadata_entries = await connection.fetch(query, urls)
+                self.feed_metadata = {entry['url']: dict(entry) for entry in feed_metadata_entries}
+
+        if self.websub:
+            # Feeds their hub pushes to are only polled as a safety net
+            polled = [url for url in urls if self.websub.poll_due(url, self.parse_date((self.feed_metadata.get(url) or {}).get('last_checked')))]
+            POLLS_SKIPPED.inc(amount=len(urls) - len(polled))
+            urls = polled
+            if not urls:
+                return set(), []
+
+        await self.sources.load(pool, urls)
 
         for url in urls:
             task = asyncio.create_task(fetch_and_process(url))
@@ -366,15 +461,178 @@ class RSSFetcher:
 
         await asyncio.gather(*tasks)
 
-        # Now use insert_many for all processed entries
         if all_processed_entries:
-            await self.db_manager.insert_many(pool, "feed_entries", all_processed_entries)
+            new_entries = await self.store_entries(pool, category, all_processed_entries)
+            for row in log_rows:
+                row['new_entries'] = new_entries[row['url']]
+        await self.sources.save(pool)
         # And for all metadata updates
         if metadata_updates:
+            if self.registry:
+                for update in metadata_updates:
+                    self.registry.update_fetch_state(update['url'], etag=update['etag'], last_checked=update['last_checked'], expires=update['expires'])
             await self.db_manager.insert_many(pool, "feed_metadata", metadata_updates, "DO UPDATE")
+        await self.fetch_log.write(pool, log_rows)
+
+        hubs = {url: self.hubs.pop(url) for url in urls if url in self.hubs}
+        if hubs:
+            await self.websub.subscribe_discovered(pool, hubs)
 
         return failed_urls, []
+
+    async def store_entries(self, pool, category, entries):
+        """Inserts processed entries and hands them on to the background stages, returns the new ones per feed url."""
+        fresh = await self.find_new_entries(pool, entries)
+        # Stored entries keep the media_url they were inserted with, the insert skips them
+        if self.reddit_resolver:
+            await self.prefetch_reddit_media(fresh)
+
+        new_entries = Counter(entry['url'] for entry in fresh)
+        await self.db_manager.insert_many(pool, "feed_entries", entries)
+        if new_entries:
+            # Invalidates the category's cached Atom and JSON Feed exports
+            async with pool.acquire() as connection:
+                await connection.execute("UPDATE categories SET ingest_version = ingest_version + 1 WHERE id = $1", int(category))
+        if self.stats is not None and fresh:
+            await self.stats.record(pool, category, fresh)
+        if self.suggestions is not None and fresh:
+            profiles = {url: self.sources.get(url) for url in new_entries}
+            self.suggestions.add_entries(fresh, {url: profile['feed_title'] for url, profile in profiles.items() if profile})
+        if self.thumbnails:
+            self.thumbnails.prewarm([entry['thumbnail'] for entry in fresh])
+        if self.pipelines and fresh:
+            await self.hand_off(pool, fresh)
+        return new_entries
+
+    async def ingest_push(self, pool, url, category, body, headers=None):
+        """
+        Stores the entries of a feed body a WebSub hub delivered, the same way as a polled one.
+
+        :return: The number of new entries.
+        """
+        import feedparser
+        with FEED_PARSE_SECONDS.time():
+            feed = feedparser.parse(body, response_headers=headers)
+        if not feed.entries:
+            return 0
+        FEED_ENTRIES.inc(amount=len(feed.entries))
+
+        await self.sources.load(pool, [url])
+        new_entries = 0
+        entries = await self.process_feed(category, url, feed)
+        if entries:
+            new_entries = (await self.store_entries(pool, category, entries))[url]
+        await self.sources.save(pool)
+        return new_entries
+
+    async def find_new_entries(self, pool, entries):
+        """Returns the entries that aren't stored yet."""
+        async with pool.acquire() as connection:
+            rows = await connection.fetch(
+                "SELECT original_link FROM feed_entries WHERE original_link = ANY($1::text[])",
+                [entry['original_link'] for entry in entries]
+            )
+        seen = {row['original_link'] for row in rows}
+        new_entries = []
+        for entry in entries:
+            if entry['original_link'] not in seen:
+                seen.add(entry['original_link'])
+                new_entries.append(entry)
+        return new_entries
     
+    def get_connector(self):
+        """Returns the connection pool shared by every feed request, so connections are reused across fetches."""
+        if self.connector is None or self.connector.closed:
+            self.connector = TCPConnector(limit=self.max_workers*2, ssl=False)
+        return self.connector
+
+    async def validate_feeds(self, urls, concurrency=20):
+        """Returns the urls that answer with something that looks like a feed."""
+        semaphore = asyncio.Semaphore(concurrency)
+        valid = set()
+
+        async def validate(url, session):
+            async with semaphore:
+                try:
+                    async with session.get(url, timeout=ClientTimeout(total=15)) as response:
+                        if response.status != 200:
+                            return
+                        start = (await response.content.read(4096)).lower()
+                        if b'<rss' in start or b'<feed' in start or b'<rdf' in start:
+                            valid.add(url)
+                except Exception as e:
+                    logging.info(f"Feed validation failed for {url}: {e}")
+
+        from user_agent import generate_user_agent
+        async with ClientSession(connector=self.get_connector(), connector_owner=False, headers={'User-Agent': generate_user_agent()}) as session:
+            await asyncio.gather(*(validate(url, session) for url in urls))
+        return valid
+
+    async def describe_feed(self, session, url, timeout=20):
+        """
+        Fetches a feed and returns what it says about itself.
+
+        The body is read like in fetch_single_feed, within max_body_bytes and the byte
+        budget, waiting at most `timeout` seconds for the headers and again for the body.
+
+        :return: A dict with title, description, site_url and update_interval, the median
+            number of seconds between its entries, or None if it isn't a readable feed.
+        """
+        header_timeout = min(self.header_timeout, timeout)
+        request_timeout = ClientTimeout(total=None, sock_connect=header_timeout, sock_read=header_timeout)
+        response = await asyncio.wait_for(session.get(url, timeout=request_timeout), header_timeout)
+        async with response:
+            if response.status != 200:
+                return None
+            body = await asyncio.wait_for(self.read_body(response, url), min(self.body_timeout, timeout))
+        if body is None:
+            return None
+        import feedparser
+        try:
+            feed = await asyncio.to_thread(feedparser.parse, body, response_headers=response.headers)
+        finally:
+            self.budget.release(len(body))
+        if not feed.entries and not feed.feed.get('title'):
+            return None
+
+        preferred_attribute = detect_date_attribute(feed.entries)
+        dates = sorted(
+            date for date in (self.get_published_date(entry, url, preferred_attribute) for entry in feed.entries)
+            if date.year > 1
+        )
+        gaps = sorted((later - earlier).total_seconds() for earlier, later in zip(dates, dates[1:]))
+        return {
+            'title': feed.feed.get('title'),
+            'description': feed.feed.get('subtitle') or feed.feed.get('description'),
+            'site_url': feed.feed.get('link'),
+            'update_interval': int(gaps[len(gaps) // 2]) if gaps else None
+        }
+
+    async def close(self):
+        if self.connector is not None:
+            await self.connector.close()
+
+    async def hand_off(self, pool, entries):
+        """Passes newly inserted entries, with their ids, to the background pipeline stages."""
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT id, original_link FROM feed_entries WHERE original_link = ANY($1::text[])",
+                [entry['original_link'] for entry in entries]
+            )
+        ids = {row['original_link']: row['id'] for row in rows}
+        inserted = [dict(entry, id=ids[entry['original_link']]) for entry in entries if entry['original_link'] in ids]
+        for pipeline in self.pipelines:
+            pipeline.enqueue(inserted)
+
+    async def prefetch_reddit_media(self, entries):
+        """Resolves the media of every Reddit entry in a few batched requests, so pages need no extra calls."""
+        reddit_entries = [entry for entry in entries if entry['video_id'] == "reddit"]
+        if not reddit_entries:
+            return
+        media = await self.reddit_resolver.prefetch([entry['original_link'] for entry in reddit_entries])
+        for entry in reddit_entries:
+            entry['media_url'] = media.get(entry['original_link'])
+
     def remove_failed_feeds(self, config_manager, category, failed_urls):
         if config_manager and category and failed_urls:
             existing_feeds = set(config_manager.config_data.get(category, []))
@@ -255,6 +255,9 @@ if [ ! -f "$HOME/run_rss.sh" ]; then
 fi
 
 if [ "$DRYRUN" != "true" ]; then
+  # Bring the database schema up to date before starting the app
+  python3 migration_manager.py migrate || exit 1
+
   # Run the application based on the arguments
   if [ "$HEADLESS" = true ]; then
     if [ "$USE_SSL" = "true" ]; then
@@ -0,0 +1,156 @@
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from db_manager import QueryBuilder
+
+DATE_ATTRIBUTES = ['pubDate', 'published', 'dc:date', 'date', 'published_date']
+
+# Built on first use, tldextract and its requests dependency are slow to import
+tld_extractor = None
+
+def get_tld_extractor():
+    """
+    Returns a tldextract instance backed only by the public suffix snapshot bundled with the package.
+
+    The default instance downloads the list on first use, which hangs on offline or firewalled hosts.
+    """
+    global tld_extractor
+    if tld_extractor is None:
+        import tldextract
+        tld_extractor = tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None)
+    return tld_extractor
+
+
+def get_website_name(url):
+    try:
+        # Extract the registered domain (sld + tld) using tldextract
+        extracted = get_tld_extractor()(url)
+        # The website name is usually the second-level domain (sld)
+        website_name = extracted.domain
+        # Capitalize the first letter of the website name
+        return website_name.capitalize()
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
+
+
+def select_title(feed_title, creator, website_name):
+    # If feed title and creator are the same, discard the feed title.
+    if feed_title == creator:
+        feed_title = None
+
+    # Prepare a list to hold the titles
+    titles = []
+
+    # If the website name is valid, add it first
+    if website_name:
+        titles.append(website_name)
+
+    # Check if feed title and website name are similar
+    if feed_title:
+        if not website_name or not is_close(feed_title, website_name):
+            # If not similar, add feed_title after website_name
+            titles.append(feed_title)
+
+    return titles
+
+
+def is_close(str1, str2, threshold=80):  # Note: threshold is 0-100
+    from rapidfuzz import fuzz
+    return fuzz.ratio(str1.lower(), str2.lower()) > threshold
+
+
+def detect_media_strategy(url, entries):
+    """Guesses where a feed's entries carry their media, from the first entry."""
+    if "youtube.com" in url or "youtu.be" in url:
+        return "youtube"
+    if "reddit.com" in url:
+        return "reddit"
+    entry = entries[0] if entries else {}
+    if entry.get('media_thumbnail'):
+        return "media_thumbnail"
+    return "summary_image"
+
+
+def detect_date_attribute(entries):
+    """Returns the first date attribute the feed's entries actually use."""
+    entry = entries[0] if entries else {}
+    return next((attr for attr in DATE_ATTRIBUTES if getattr(entry, attr, None) or entry.get(attr)), None)
+
+
+class SourceProfiles:
+    """
+    Per-feed facts derived from the feed rather than from each entry.
+
+    A profile holds the display names, favicon, date attribute and media strategy of
+    one feed url. It is computed once, rebuilt only when the feed title changes, and
+    kept both in memory and in the feed_sources table.
+    """
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self.profiles = {}
+        self.missing = set()
+        self.changed = set()
+
+    def get(self, url):
+        return self.profiles.get(url)
+
+    async def load(self, pool, urls):
+        """Loads the profiles of `urls` that aren't in memory yet, in one query."""
+        urls = [url for url in set(urls) if url not in self.profiles and url not in self.missing]
+        if not urls:
+            return
+        query_builder = QueryBuilder()
+        query_builder.where("url = ANY(%s)", urls)
+        query, params = query_builder.build()
+        for profile in await self.db_manager.select_data(pool, "feed_sources", query, params) or []:
+            self.profiles[profile['url']] = profile
+        self.missing.update(url for url in urls if url not in self.profiles)
+
+    def refresh(self, url, feed):
+        """Returns the feed's profile, rebuilding it if the feed is new or its title changed."""
+        feed_title = feed.feed.get('title')
+        profile = self.profiles.get(url)
+        if profile is not None and profile['feed_title'] == feed_title:
+            return profile
+
+        website_name = get_website_name(url)
+        link = feed.feed.get('link') or url
+        parts = urlsplit(link)
+        favicon = (feed.feed.get('icon') or (feed.feed.get('image') or {}).get('href')
+                   or (f"{parts.scheme}://{parts.netloc}/favicon.ico" if parts.netloc else None))
+        profile = {
+            'url': url,
+            'feed_title': feed_title,
+            'site_name': website_name,
+            'web_name': select_title(feed_title, feed.feed.get('author'), website_name),
+            'favicon': favicon,
+            'date_attribute': detect_date_attribute(feed.entries),
+            'media_strategy': detect_media_strategy(url, feed.entries),
+            'updated_at': datetime.now(timezone.utc)
+        }
+        self.profiles[url] = profile
+        self.missing.discard(url)
+        self.changed.add(url)
+        return profile
+
+    async def save(self, pool):
+        """Writes the profiles built since the last save."""
+        if not self.changed:
+            return
+        profiles = [self.profiles[url] for url in self.changed]
+        self.changed = set()
+        await self.db_manager.insert_many(pool, "feed_sources", profiles, "DO UPDATE")
+
+    async def for_urls(self, pool, urls):
+        """Returns {url: profile} for the API, without the internal bookkeeping fields."""
+        await self.load(pool, urls)
+        return {
+            url: {
+                'site_name': profile['site_name'],
+                'web_name': profile['web_name'],
+                'favicon': profile['favicon'],
+                'media_strategy': profile['media_strategy']
+            }
+            for url in set(urls) if (profile := self.profiles.get(url)) is not None
+        }
@@ -0,0 +1,284 @@
+import os
+import re
+import json
+import uuid
+import sqlite3
+import asyncio
+from functools import lru_cache
+from collections import deque
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations", "sqlite")
+
+# Rewrites for the few Postgres idioms used in hand written queries
+PLACEHOLDER_PATTERN = re.compile(r"\$(\d+)")
+CAST_PATTERN = re.compile(r"::\w+(?:\[\])?")
+ANY_PATTERN = re.compile(r"=\s*ANY\(\s*\?(\d+)\s*\)", re.IGNORECASE)
+ILIKE_PATTERN = re.compile(r"\bILIKE\b", re.IGNORECASE)
+
+
+def adapt_datetime(value):
+    # Stored as UTC ISO strings with a fixed layout so text comparison orders them correctly
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def convert_datetime(value):
+    dt = datetime.fromisoformat(value.decode())
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def convert_json(value):
+    return json.loads(value)
+
+
+sqlite3.register_adapter(datetime, adapt_datetime)
+sqlite3.register_converter("TIMESTAMP", convert_datetime)
+sqlite3.register_converter("TIMESTAMPTZ", convert_datetime)
+sqlite3.register_converter("JSONB", convert_json)
+sqlite3.register_converter("JSON", convert_json)
+
+
+@lru_cache(maxsize=512)
+def translate(sql):
+    """Turns asyncpg style SQL ($n placeholders, casts, ANY, ILIKE) into SQLite SQL."""
+    sql = PLACEHOLDER_PATTERN.sub(r"?\1", sql)
+    sql = CAST_PATTERN.sub("", sql)
+    sql = ANY_PATTERN.sub(r"IN (SELECT value FROM json_each(?\1))", sql)
+    return ILIKE_PATTERN.sub("LIKE", sql)
+
+
+def adapt_params(params):
+    return [json.dumps(p) if isinstance(p, (list, tuple, dict)) else p for p in params]
+
+
+def split_statements(script):
+    """Splits a script on statement boundaries, keeping trigger bodies intact."""
+    statements = []
+    current = ""
+    for line in script.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current.strip())
+            current = ""
+    if current.strip() and not all(l.strip().startswith("--") for l in current.strip().splitlines()):
+        statements.append(current.strip())
+    return statements
+
+
+def now():
+    return adapt_datetime(datetime.now(timezone.utc))
+
+
+class SQLiteTransaction:
+    def __init__(self, connection):
+        self.connection = connection
+        self.savepoint = None
+
+    async def __aenter__(self):
+        if self.connection.depth == 0:
+            await self.connection._run(self.connection.raw.execute, "BEGIN IMMEDIATE")
+        else:
+            self.savepoint = f"sp_{uuid.uuid4().hex}"
+            await self.connection._run(self.connection.raw.execute, f"SAVEPOINT {self.savepoint}")
+        self.connection.depth += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.connection.depth -= 1
+        raw = self.connection.raw
+        if self.savepoint:
+            if exc_type is not None:
+                await self.connection._run(raw.execute, f"ROLLBACK TO {self.savepoint}")
+            await self.connection._run(raw.execute, f"RELEASE {self.savepoint}")
+        elif exc_type is not None:
+            await self.connection._run(raw.execute, "ROLLBACK")
+        else:
+            await self.connection._run(raw.execute, "COMMIT")
+        return False
+
+
+class SQLiteConnection:
+    """Exposes the subset of the asyncpg connection API used by the app on top of sqlite3."""
+
+    def __init__(self, path):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self.path = path
+        self.raw = None
+        self.depth = 0
+
+    async def connect(self):
+        self.raw = await self._run(self._open)
+        return self
+
+    def _open(self):
+        raw = sqlite3.connect(
+            self.path,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        raw.row_factory = sqlite3.Row
+        raw.execute("PRAGMA journal_mode=WAL")
+        raw.execute("PRAGMA synchronous=NORMAL")
+        raw.execute("PRAGMA foreign_keys=ON")
+        raw.execute("PRAGMA busy_timeout=5000")
+        raw.create_function("now", 0, now)
+        raw.create_function("greatest", -1, lambda *args: max(a for a in args if a is not None), deterministic=True)
+        raw.create_function("least", -1, lambda *args: min(a for a in args if a is not None), deterministic=True)
+        return raw
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def transaction(self):
+        return SQLiteTransaction(self)
+
+    async def execute(self, sql, *params):
+        if not params:
+            # Parameterless calls may carry whole scripts, such as migrations
+            cursor = None
+            for statement in split_statements(translate(sql)):
+                cursor = await self._run(self.raw.execute, statement)
+        else:
+            cursor = await self._run(self.raw.execute, translate(sql), adapt_params(params))
+        verb = sql.split(None, 1)[0].upper() if sql.strip() else ""
+        return f"{verb} {cursor.rowcount if cursor else 0}"
+
+    async def executemany(self, sql, rows):
+        await self._run(self.raw.executemany, translate(sql), [adapt_params(row) for row in rows])
+
+    async def fetch(self, sql, *params):
+        def run():
+            return self.raw.execute(translate(sql), adapt_params(params)).fetchall()
+        return await self._run(run)
+
+    async def fetchrow(self, sql, *params):
+        def run():
+            return self.raw.execute(translate(sql), adapt_params(params)).fetchone()
+        return await self._run(run)
+
+    async def fetchval(self, sql, *params):
+        row = await self.fetchrow(sql, *params)
+        return row[0] if row is not None else None
+
+    def cursor(self, sql, *params, prefetch=100):
+        return SQLiteCursor(self, sql, params, prefetch)
+
+    async def close(self):
+        if self.raw is not None:
+            await self._run(self.raw.close)
+            self.raw = None
+        self.executor.shutdown(wait=False)
+
+
+class SQLiteCursor:
+    """Iterates a query in chunks of `prefetch` rows, like `async for row in conn.cursor(...)` on asyncpg."""
+
+    def __init__(self, connection, sql, params, prefetch):
+        self.connection = connection
+        self.sql = sql
+        self.params = params
+        self.prefetch = prefetch
+        self.raw_cursor = None
+        self.buffer = deque()
+        self.exhausted = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.buffer:
+            if self.exhausted:
+                raise StopAsyncIteration
+            if self.raw_cursor is None:
+                self.raw_cursor = await self.connection._run(self.connection.raw.execute, translate(self.sql), adapt_params(self.params))
+            rows = await self.connection._run(self.raw_cursor.fetchmany, self.prefetch)
+            if len(rows) < self.prefetch:
+                self.exhausted = True
+            if not rows:
+                raise StopAsyncIteration
+            self.buffer.extend(rows)
+        return self.buffer.popleft()
+
+
+class SQLitePool:
+    def __init__(self, path, size=4):
+        self.path = path
+        self.size = size
+        self.connections = []
+        self.idle = asyncio.Queue()
+
+    async def open(self):
+        for _ in range(self.size):
+            conn = await SQLiteConnection(self.path).connect()
+            self.connections.append(conn)
+            self.idle.put_nowait(conn)
+        return self
+
+    def acquire(self):
+        return PoolAcquireContext(self)
+
+    async def release(self, conn):
+        if conn.depth:
+            await conn._run(conn.raw.execute, "ROLLBACK")
+            conn.depth = 0
+        self.idle.put_nowait(conn)
+
+    async def close(self):
+        for conn in self.connections:
+            await conn.close()
+        self.connections.clear()
+
+
+class PoolAcquireContext:
+    def __init__(self, pool):
+        self.pool = pool
+        self.conn = None
+
+    def __await__(self):
+        return self.pool.idle.get().__await__()
+
+    async def __aenter__(self):
+        self.conn = await self.pool.idle.get()
+        return self.conn
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.pool.release(self.conn)
+        return False
+
+
+class SQLiteBackend:
+    name = "sqlite"
+    supports_notify = False
+    migrations_dir = MIGRATIONS_DIR
+    exceptions = sqlite3
+
+    async def create_pool(self, dsn):
+        path = dsn.split("://", 1)[1] if "://" in dsn else dsn
+        # sqlite:///relative.db and sqlite:////absolute/path.db, like SQLAlchemy
+        path = path[1:] if path.startswith("/") else path
+        if path == ":memory:":
+            # Every connection would get its own private in-memory database
+            return await SQLitePool(path, size=1).open()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        return await SQLitePool(path).open()
+
+    async def table_exists(self, conn, table_name):
+        return bool(await conn.fetchval("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = $1", table_name))
+
+    async def select_rows(self, conn, sql, params):
+        rows = await conn.fetch(sql, *params)
+        return [{key: (value.isoformat() if isinstance(value, datetime) else value) for key, value in dict(row).items()} for row in rows]
+
+    def search_condition(self, search_query, threshold):
+        # Every word is matched as a quoted prefix so user input can't inject FTS5 syntax
+        terms = " ".join('"' + term.replace('"', '""') + '"*' for term in search_query.split())
+        pattern = f"%{search_query}%"
+        condition = "(id IN (SELECT rowid FROM feed_entries_fts WHERE feed_entries_fts MATCH %s) OR title LIKE %s OR url LIKE %s)"
+        return condition, [terms or '""', pattern, pattern]
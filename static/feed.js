@@ -13,6 +13,8 @@ document.addEventListener("alpine:init", () => {
         loading: false,
         searchQuery: "",
         lastSearch: "",
+        suggestions: [],
+        suggestedFor: "",
 
         paginateFetchedFeed: async function (category, isInit = false, feed = null) {
             if (this.fetching || this.loading)
@@ -58,6 +60,7 @@ document.addEventListener("alpine:init", () => {
                         if (data && data.feed_items) {
                             feed = data.feed_items
                         }
+                        Alpine.store("sharedState").addSources(data && data.sources);
                     } else {
                         console.error("Response is not JSON:", response.data);
                     }
@@ -97,6 +100,13 @@ document.addEventListener("alpine:init", () => {
             Alpine.store("sharedState").feed_items = this.feedCache[category];
         },
 
+        newestLoadedEntry: function (category) {
+            // Search results aren't the category's newest entries
+            if (this.searchQuery.length > 0) return null;
+            const items = this.feedCache[category] || [];
+            return items.length > 0 ? items[0] : null;
+        },
+
         updateLastEntry: function (newLastId, newLastPd) {
             this.lastId = newLastId;
             this.lastPd = newLastPd;
@@ -144,6 +154,8 @@ document.addEventListener("alpine:init", () => {
                 console.log("Data:", data);
                 console.log("Feed Items:", data.feed_items);
 
+                Alpine.store("sharedState").addSources(data && data.sources);
+
                 if (data && data.feed_items) {
                     const newContentExists = this.checkForNewContent(data.feed_items);
 
@@ -176,6 +188,24 @@ document.addEventListener("alpine:init", () => {
             this.paginateFetchedFeed(categoryValue, false);
         },
 
+        suggest: async function () {
+            const prefix = this.$refs.searchBox.value.trim();
+            if (prefix === this.suggestedFor) return;
+            this.suggestedFor = prefix;
+            if (prefix.length < 2) {
+                this.suggestions = [];
+                return;
+            }
+            try {
+                const response = await fetch(`/api/suggest?q=${encodeURIComponent(prefix)}`);
+                const data = await response.json();
+                // Answers to earlier keystrokes can arrive after later ones
+                if (prefix === this.suggestedFor) this.suggestions = data.suggestions || [];
+            } catch (error) {
+                console.error("Error while fetching suggestions:", error);
+            }
+        },
+
         goBack: function (category_id = null) {
             this.searchQuery = "";
             this.$refs.searchBox.value = this.searchQuery;
@@ -192,6 +222,8 @@ document.addEventListener("alpine:init", () => {
                 let timer = this.fetching || this.loading ? 60000 : 300000;
 
                 await this.initFetch(Alpine.store("sharedState").getCurrentCategory());
+                Alpine.store("sharedState").fetchUnread();
+                Alpine.store("sharedState").fetchStats();
 
                 setTimeout(checkForUpdates, timer);
             };
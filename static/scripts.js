@@ -1,6 +1,7 @@
 function openModal(item) {
   item.open = true;
   this.toggleScroll(false);
+  Alpine.store("sharedState").markEntryRead(item);
   if (!item.contentFormatted) {
       item.formattedContent = formatContent(item);
       item.contentFormatted = true;
@@ -43,39 +44,22 @@ function formatContent(item) {
       if (originalLink.includes("youtube")) {
         content = `${initializePipedPlayer(videoId, originalLink)}${content}`;
       } else if (originalLink.includes("reddit")) {
-        handleRedditMedia(originalLink)
-          .then((redditMedia) => {
-            if (redditMedia) {
-              // Reddit video
-              if (
-                redditMedia.includes(".png") ||
-                redditMedia.includes(".gif")
-              ) {
-                const img = document.createElement("img");
-                img.src = redditMedia;
-                img.setAttribute("loading", "lazy");
-                content = `${img.outerHTML}${content}`;
-              } else if (redditMedia["reddit_video"]) {
-                const video = document.createElement("video");
-                video.src = redditMedia["reddit_video"]["fallback_url"];
-                video.controls = true;
-                video.setAttribute("loading", "lazy");
-                content = `${video.outerHTML}${content}`;
-              } else if (redditMedia["oembed"]) {
-                const redditHTML = redditMedia["oembed"]["html"];
-                content = `${redditHTML}${content}`;
-              } else {
-                const video = document.createElement("video");
-                video.src = redditMedia;
-                video.controls = true;
-                video.setAttribute("loading", "lazy");
-                content = `${video.outerHTML}${content}`;
+        if (item.media_url) {
+          // Resolved while ingesting, no extra request needed
+          content = `${redditMediaHTML(item.media_url)}${content}`;
+        } else if (item.media_url === null) {
+          // Not resolved yet (e.g. Reddit was unreachable), ask the server
+          handleRedditMedia(originalLink)
+            .then((redditMedia) => {
+              if (redditMedia) {
+                item.media_url = redditMedia;
+                item.formattedContent = `${redditMediaHTML(redditMedia)}${item.formattedContent}`;
               }
-            }
-          })
-          .catch((err) => {
-            console.error("Error:", err);
-          });
+            })
+            .catch((err) => {
+              console.error("Error:", err);
+            });
+        }
       }
     }
 
@@ -137,6 +121,44 @@ function createDivWithClass(className) {
   return div;
 }
 
+const THUMBNAIL_WIDTHS = [160, 320, 640];
+
+function thumbnailSrc(url, width, signature) {
+  if (!url) {
+    return "";
+  }
+  // Unsigned urls aren't served by /api/thumbnail, e.g. while thumbnails are disabled
+  if (!signature) {
+    return url;
+  }
+  // URL-safe base64 so the encoded url never contains a path separator
+  const encoded = btoa(unescape(encodeURIComponent(url)))
+    .replace(/\+/g, "-")
+    .replace(/\//g, "_")
+    .replace(/=+$/, "");
+  return `/api/thumbnail/${width}/${encoded}?s=${signature}`;
+}
+
+function thumbnailSrcset(url, signature) {
+  if (!url || !signature) {
+    return "";
+  }
+  return THUMBNAIL_WIDTHS.map((width) => `${thumbnailSrc(url, width, signature)} ${width}w`).join(", ");
+}
+
+function redditMediaHTML(media) {
+  let element;
+  if (/\.(png|gif|jpe?g|webp)(\?|$)/i.test(media)) {
+    element = document.createElement("img");
+  } else {
+    element = document.createElement("video");
+    element.controls = true;
+  }
+  element.src = media;
+  element.setAttribute("loading", "lazy");
+  return element.outerHTML;
+}
+
 function handleRedditMedia(originalLink) {
   const apiUrl = `/api/reddit/${btoa(originalLink)}`;
   return fetch(apiUrl)
@@ -3,12 +3,82 @@ document.addEventListener("alpine:init", () => {
         categories: [],
         feed_items: [],
         currentCategory: null,
+        unread: {},
+        // Entry counts and freshness from /api/stats, keyed by category and feed id
+        categoryStats: {},
+        feedStats: {},
+        // Source profiles keyed by feed url, sent once per feed rather than per entry
+        sources: {},
         initCategories() {
             this.fetchCategories().then(() => {
                 if (this.categories.length > 0) {
                     this.setCurrentCategory(this.categories[0].id);
                 }
             });
+            this.fetchUnread();
+            this.fetchStats();
+        },
+        addSources(sources) {
+            if (sources) {
+                this.sources = { ...this.sources, ...sources };
+            }
+        },
+        sourceNames(item) {
+            const source = this.sources[item.url];
+            // Entries stored before feed_sources existed still carry their own web_name
+            return (source && source.web_name) || item.additional_info.web_name || [];
+        },
+        async fetchUnread() {
+            try {
+                const response = await fetch("/api/unread");
+                const data = await response.json();
+                this.unread = data.unread || {};
+            } catch (error) {
+                console.error("Error fetching unread counts:", error);
+            }
+        },
+        async fetchStats() {
+            try {
+                const response = await fetch("/api/stats");
+                if (!response.ok) return;
+                const data = await response.json();
+                this.categoryStats = Object.fromEntries(data.categories.map(category => [category.id, category]));
+                this.feedStats = Object.fromEntries(data.feeds.map(feed => [feed.id, feed]));
+            } catch (error) {
+                console.error("Error fetching stats:", error);
+            }
+        },
+        statsTitle(stats) {
+            if (!stats) return "";
+            const newest = stats.newest_at ? new Date(stats.newest_at).toLocaleString() : "never";
+            return `${stats.entries} entries, ${stats.per_day_7d} a day this week, newest ${newest}`;
+        },
+        async markCategoryRead(categoryId, newestEntry) {
+            // Only what was loaded is marked, entries that arrived since stay unread
+            if (!newestEntry) {
+                alert("Open the category first, only loaded entries can be marked as read.");
+                return;
+            }
+            await fetch(`/api/categories/${categoryId}/read`, {
+                method: "POST",
+                headers: {
+                    "Content-Type": "application/json",
+                },
+                body: JSON.stringify({ last_id: newestEntry.id, last_pd: newestEntry.published_date }),
+            });
+            this.fetchUnread();
+        },
+        async markEntryRead(item) {
+            if (item.read) return;
+            item.read = true;
+            await fetch("/api/entries/read", {
+                method: "POST",
+                headers: {
+                    "Content-Type": "application/json",
+                },
+                body: JSON.stringify({ ids: [item.id] }),
+            });
+            this.fetchUnread();
         },
         async fetchCategories() {
             try {
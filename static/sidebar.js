@@ -108,6 +108,11 @@ document.addEventListener('alpine:init', () => {
                             body: formData,
                         }
                     );
+                    const summary = await response.json();
+                    // Folders in the file become categories of their own
+                    if (summary.categories && Object.keys(summary.categories).length > 0) {
+                        await Alpine.store("sharedState").fetchCategories();
+                    }
                     this.fetchFeeds(category);
                 } catch (error) {
                     console.error("Error importing OPML file:", error);
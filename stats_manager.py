@@ -0,0 +1,155 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+from fetch_log_manager import as_datetime
+
+# Entries without a date of their own are stored as published at datetime.min,
+# they count as entries but not towards oldest_at and newest_at
+UNDATED = datetime(1970, 1, 1, tzinfo=timezone.utc)
+WINDOWS = {"entries_7d": 7, "entries_30d": 30}
+
+REFRESH = """
+    INSERT INTO feed_stats (category_id, url, entries, entries_7d, entries_30d, oldest_at, newest_at, refreshed_at)
+    SELECT category_id, url, count(*),
+        sum(CASE WHEN published_date >= $1 THEN 1 ELSE 0 END),
+        sum(CASE WHEN published_date >= $2 THEN 1 ELSE 0 END),
+        min(CASE WHEN published_date > $3 THEN published_date END),
+        max(CASE WHEN published_date > $3 THEN published_date END),
+        $4::timestamptz
+    FROM feed_entries
+    WHERE url IS NOT NULL
+    GROUP BY category_id, url
+    ON CONFLICT (category_id, url) DO UPDATE SET entries = EXCLUDED.entries, entries_7d = EXCLUDED.entries_7d,
+        entries_30d = EXCLUDED.entries_30d, oldest_at = EXCLUDED.oldest_at, newest_at = EXCLUDED.newest_at,
+        refreshed_at = EXCLUDED.refreshed_at
+"""
+
+RECORD = """
+    INSERT INTO feed_stats (category_id, url, entries, entries_7d, entries_30d, oldest_at, newest_at, refreshed_at)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+    ON CONFLICT (category_id, url) DO UPDATE SET
+        entries = feed_stats.entries + EXCLUDED.entries,
+        entries_7d = feed_stats.entries_7d + EXCLUDED.entries_7d,
+        entries_30d = feed_stats.entries_30d + EXCLUDED.entries_30d,
+        oldest_at = CASE WHEN feed_stats.oldest_at IS NULL OR EXCLUDED.oldest_at < feed_stats.oldest_at
+            THEN EXCLUDED.oldest_at ELSE feed_stats.oldest_at END,
+        newest_at = CASE WHEN feed_stats.newest_at IS NULL OR EXCLUDED.newest_at > feed_stats.newest_at
+            THEN EXCLUDED.newest_at ELSE feed_stats.newest_at END
+"""
+
+# Feeds without stored entries yet show up with zeros. Stats of removed feeds stay in
+# feed_stats until the next refresh, joining through feeds keeps them out meanwhile.
+FEEDS = """
+    SELECT f.id, f.name, f.url, f.category_id, coalesce(s.entries, 0) AS entries,
+        coalesce(s.entries_7d, 0) AS entries_7d, coalesce(s.entries_30d, 0) AS entries_30d,
+        s.oldest_at, s.newest_at
+    FROM feeds f
+    LEFT JOIN feed_stats s ON s.category_id = f.category_id AND s.url = f.url
+"""
+
+CATEGORIES = """
+    SELECT c.id, c.name, count(f.id) AS feeds, coalesce(sum(s.entries), 0) AS entries,
+        coalesce(sum(s.entries_7d), 0) AS entries_7d, coalesce(sum(s.entries_30d), 0) AS entries_30d,
+        max(s.newest_at) AS newest_at
+    FROM categories c
+    LEFT JOIN feeds f ON f.category_id = c.id
+    LEFT JOIN feed_stats s ON s.category_id = f.category_id AND s.url = f.url
+"""
+
+
+def posting_rates(row):
+    """Adds the average entries per day over the 7 and 30 day windows."""
+    row = {key: as_datetime(value) if key.endswith("_at") else value for key, value in dict(row).items()}
+    for column, days in WINDOWS.items():
+        row[f"per_day_{days}d"] = round(row[column] / days, 2)
+    return row
+
+
+class FeedStats:
+    """
+    Per-feed entry counts, freshness and posting rates, kept in the feed_stats table.
+
+    Stored entries bump their feed's row as part of ingest, and the whole table is
+    recomputed from feed_entries every `refresh_interval` seconds, which ages the 7 and
+    30 day windows and corrects the rows of moved, trimmed or removed entries. The
+    refresh is a single upsert, readers keep seeing the previous numbers while it runs.
+    Category totals are summed from the feed rows when read.
+    """
+
+    def __init__(self, db_manager, refresh_interval=900):
+        self.db_manager = db_manager
+        self.refresh_interval = refresh_interval
+        self.refreshed_at = None
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+    async def record(self, pool, category, entries):
+        """Counts newly stored entries towards their feeds' stats."""
+        now = datetime.now(timezone.utc)
+        cutoffs = {column: now - timedelta(days=days) for column, days in WINDOWS.items()}
+        feeds = {}
+        for entry in entries:
+            published = entry['published_date']
+            stats = feeds.setdefault(entry['url'], {"entries": 0, "entries_7d": 0, "entries_30d": 0, "oldest_at": None, "newest_at": None})
+            stats["entries"] += 1
+            for column, cutoff in cutoffs.items():
+                if published >= cutoff:
+                    stats[column] += 1
+            if published > UNDATED:
+                stats["oldest_at"] = min(stats["oldest_at"] or published, published)
+                stats["newest_at"] = max(stats["newest_at"] or published, published)
+        if not feeds:
+            return
+        async with pool.acquire() as conn:
+            await conn.executemany(RECORD, [
+                (int(category), url, stats["entries"], stats["entries_7d"], stats["entries_30d"], stats["oldest_at"], stats["newest_at"], now)
+                for url, stats in feeds.items()
+            ])
+
+    async def refresh(self, pool):
+        """Recomputes every row from feed_entries, returns how many stale rows went."""
+        now = datetime.now(timezone.utc)
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(REFRESH, now - timedelta(days=7), now - timedelta(days=30), UNDATED, now)
+                # Rows the aggregate didn't touch belong to feeds without entries left
+                status = await conn.execute("DELETE FROM feed_stats WHERE refreshed_at < $1", now)
+        self.refreshed_at = now
+        return int(status.split()[-1])
+
+    def invalidate(self):
+        """Asks for a refresh soon, for changes the incremental updates don't follow."""
+        self.wakeup.set()
+
+    async def get(self, pool, category_id=None):
+        """Returns the stats of every category and feed, or of one category and its feeds."""
+        condition, params = ("", []) if category_id is None else (" WHERE {} = $1", [category_id])
+        async with pool.acquire() as conn:
+            categories = await conn.fetch(CATEGORIES + condition.format("c.id") + " GROUP BY c.id, c.name ORDER BY c.id", *params)
+            feeds = await conn.fetch(FEEDS + condition.format("f.category_id") + " ORDER BY f.category_id, f.id", *params)
+        return {
+            "refreshed_at": self.refreshed_at,
+            "categories": [posting_rates(row) for row in categories],
+            "feeds": [posting_rates(row) for row in feeds]
+        }
+
+    def start(self, pool):
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self.run(pool))
+
+    async def run(self, pool):
+        while True:
+            self.wakeup.clear()
+            try:
+                await self.refresh(pool)
+            except Exception as e:
+                print(f"Feed stats refresh failed: {e}")
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.refresh_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
@@ -0,0 +1,190 @@
+import re
+import heapq
+import asyncio
+from bisect import bisect_left, insort
+from collections import Counter
+from export_manager import load_json
+
+WORD_PATTERN = re.compile(r"[^\W\d_][\w'-]*[^\W_]", re.UNICODE)
+STOPWORDS = frozenset("""
+    about after again against all also and any are because been before being between both but can could did
+    does doing down during each few for from further had has have having her here hers herself him himself his
+    how into its itself just more most much new not now off once only other our ours out over own same she
+    should some such than that the their theirs them then there these they this those through too under until
+    very was were what when where which while who whom why will with would you your yours
+""".split())
+MAX_TERM_LENGTH = 80
+# Fewer new keys than this are inserted one by one, more are merged with a sort
+INSERT_THRESHOLD = 256
+# Weight multiplier per kind, so a feed or tag outranks a title word seen as often
+KIND_WEIGHTS = {"feed": 4, "tag": 3, "creator": 2, "term": 1}
+
+
+def word_starts(text):
+    """Returns the offsets of the words in `text` after the first one."""
+    return [match.start() for match in re.finditer(r"\s\S", text)]
+
+
+class SuggestionIndex:
+    """
+    In-memory prefix index of search completions: tags, creators, feed names and title words.
+
+    Completions live in a sorted list of (key, kind, folded text) tuples. Every completion is
+    keyed by its casefolded text and by each of its later words, so "learn" also completes
+    "Machine learning". A lookup is one bisect and a scan over the matching keys, cached per
+    prefix until the index changes. Ingest adds terms as it goes, new keys being merged into
+    the sorted list, and a periodic rebuild drops the terms of deleted entries.
+    """
+
+    def __init__(self, db_manager, limit=8, min_prefix=2, max_entries=50000, rebuild_interval=3600):
+        self.db_manager = db_manager
+        self.limit = limit
+        self.min_prefix = min_prefix
+        self.max_entries = max_entries
+        self.rebuild_interval = rebuild_interval
+        # (kind, folded text) -> occurrences, and the text shown for it
+        self.weights = Counter()
+        self.texts = {}
+        self.keys = []
+        self.pending = []
+        self.cache = {}
+        # Additions made while a rebuild runs, replayed into the rebuilt index
+        self.replay = None
+        self.task = None
+
+    def add(self, kind, text, count=1):
+        text = " ".join(str(text or "").split())
+        if len(text) < self.min_prefix or len(text) > MAX_TERM_LENGTH or "://" in text:
+            return
+        if self.replay is not None:
+            self.replay.append((kind, text, count))
+        folded = text.casefold()
+        ident = (kind, folded)
+        if ident not in self.weights:
+            self.texts[ident] = text
+            self.pending.append((folded, kind, folded))
+            self.pending.extend((folded[start + 1:], kind, folded) for start in word_starts(folded))
+        self.weights[ident] += count
+
+    def add_entry(self, entry, feed_title=None):
+        info = load_json(entry['additional_info']) or {}
+        for tag in info.get('tags') or []:
+            self.add("tag", tag)
+        if info.get('creator'):
+            self.add("creator", info['creator'])
+        if feed_title:
+            self.add("feed", feed_title)
+        for word in WORD_PATTERN.findall(entry['title'] or ""):
+            word = word.casefold()
+            if len(word) > 2 and word not in STOPWORDS:
+                self.add("term", word)
+
+    def add_entries(self, entries, feed_titles=None):
+        """Adds the terms of newly ingested entries, `feed_titles` maps their feed urls to titles."""
+        feed_titles = feed_titles or {}
+        for entry in entries:
+            self.add_entry(entry, feed_titles.get(entry['url']))
+        self.merge()
+
+    def add_tags(self, tags):
+        for tag in tags:
+            self.add("tag", tag)
+        self.merge()
+
+    def merge(self):
+        if not self.pending:
+            return
+        if len(self.pending) < INSERT_THRESHOLD:
+            for key in self.pending:
+                insort(self.keys, key)
+        else:
+            # Two sorted runs, which the sort merges in linear time
+            self.keys.extend(sorted(self.pending))
+            self.keys.sort()
+        self.pending = []
+        self.cache = {}
+
+    def lookup(self, prefix, limit=None):
+        """Returns the best completions of `prefix`, as dicts of text, kind and count."""
+        prefix = " ".join(prefix.split()).casefold()
+        limit = limit or self.limit
+        if len(prefix) < self.min_prefix:
+            return []
+        cached = self.cache.get((prefix, limit))
+        if cached is not None:
+            return cached
+
+        keys = self.keys
+        best = {}
+        index = bisect_left(keys, (prefix,))
+        while index < len(keys) and keys[index][0].startswith(prefix):
+            _, kind, folded = keys[index]
+            score = self.weights[(kind, folded)] * KIND_WEIGHTS[kind]
+            # The same text as a tag and as a title word is suggested once, as its best kind
+            if score > best.get(folded, (0,))[0]:
+                best[folded] = (score, kind)
+            index += 1
+
+        top = heapq.nlargest(limit, best.items(), key=lambda item: item[1][0])
+        suggestions = [
+            {"text": self.texts[(kind, folded)], "kind": kind, "count": self.weights[(kind, folded)]}
+            for folded, (_, kind) in top
+        ]
+        if len(self.cache) > 10000:
+            self.cache = {}
+        self.cache[(prefix, limit)] = suggestions
+        return suggestions
+
+    async def rebuild(self, pool):
+        """Rebuilds the index from the latest `max_entries` entries and every feed."""
+        fresh = SuggestionIndex(self.db_manager, self.limit, self.min_prefix, self.max_entries, self.rebuild_interval)
+        self.replay = []
+        try:
+            async with pool.acquire() as conn:
+                entries = await conn.fetch(
+                    "SELECT e.title, e.additional_info, s.feed_title FROM "
+                    "(SELECT title, additional_info, url FROM feed_entries ORDER BY id DESC LIMIT $1) e "
+                    "LEFT JOIN feed_sources s ON s.url = e.url",
+                    self.max_entries
+                )
+                feeds = await conn.fetch(
+                    "SELECT f.name, s.feed_title FROM feeds f LEFT JOIN feed_sources s ON s.url = f.url"
+                )
+
+            # Built aside in a thread and swapped in, lookups keep using the old index meanwhile
+            def build():
+                for row in entries:
+                    fresh.add_entry(row, row['feed_title'])
+                for row in feeds:
+                    # Feeds without a title of their own are named after their url, which `add` skips
+                    fresh.add("feed", row['feed_title'] or row['name'])
+                fresh.merge()
+
+            await asyncio.to_thread(build)
+        finally:
+            replay, self.replay = self.replay, None
+        # Ingest kept adding to the old index meanwhile. Terms of entries the snapshot
+        # already held count twice until the next rebuild, which beats losing them.
+        for kind, text, count in replay:
+            fresh.add(kind, text, count)
+        fresh.merge()
+        self.weights, self.texts, self.keys, self.pending, self.cache = fresh.weights, fresh.texts, fresh.keys, [], {}
+        print(f"Suggestion index built with {len(self.weights)} completions from {len(entries)} entries")
+
+    def start(self, pool):
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self.run(pool))
+
+    async def run(self, pool):
+        while True:
+            try:
+                await self.rebuild(pool)
+            except Exception as e:
+                print(f"Suggestion index rebuild failed: {e}")
+            await asyncio.sleep(self.rebuild_interval)
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
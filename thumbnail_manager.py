@@ -0,0 +1,367 @@
+import io
+import os
+import time
+import hmac
+import socket
+import asyncio
+import hashlib
+import secrets
+import ipaddress
+import aiohttp
+from aiohttp.abc import AbstractResolver
+from urllib.parse import urlsplit, urljoin
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from metrics import CACHE_REQUESTS
+
+DEFAULT_WIDTHS = (160, 320, 640)
+THUMBNAIL_FORMAT = "webp"
+MAX_REDIRECTS = 3
+# Kept in the cache directory but out of the LRU, so eviction never removes it
+SIGNING_KEY_FILE = "signing.key"
+# Failed sources remembered at most, the oldest are forgotten first
+MAX_FAILURES = 10000
+
+
+def is_public_address(address):
+    ip = ipaddress.ip_address(address.split("%")[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def is_ip_literal(host):
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+        return True
+    except ValueError:
+        return False
+
+
+class PublicResolver(AbstractResolver):
+    """Resolves hostnames to their public addresses only, so thumbnail sources can't reach internal services."""
+
+    def __init__(self):
+        self.resolver = aiohttp.DefaultResolver()
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        addresses = [address for address in await self.resolver.resolve(host, port, family) if is_public_address(address['host'])]
+        if not addresses:
+            raise OSError(f"{host} doesn't resolve to a public address")
+        return addresses
+
+    async def close(self):
+        await self.resolver.close()
+
+
+def scan_files(cache_dir):
+    """Returns (mtime, path, size) of every file under `cache_dir`, oldest first."""
+    entries = []
+    for root, _, filenames in os.walk(cache_dir):
+        for filename in filenames:
+            if filename == SIGNING_KEY_FILE:
+                continue
+            path = os.path.join(root, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, path, stat.st_size))
+    entries.sort()
+    return entries
+
+
+def read_pointer(url_path, thumbnail_path):
+    """Returns the digest a url pointer file names if its thumbnail exists, touching both files."""
+    try:
+        with open(url_path) as file:
+            digest = file.read().strip()
+    except FileNotFoundError:
+        return None
+    path = thumbnail_path(digest)
+    try:
+        os.utime(path)
+        os.utime(url_path)
+    except FileNotFoundError:
+        return None
+    return digest
+
+
+def write_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Written beside the target and renamed, so readers never see a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+def remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def load_signing_key(cache_dir):
+    """
+    Returns the key thumbnail urls are signed with.
+
+    NEXAFEED_THUMBNAIL_KEY takes precedence; otherwise a key is generated once and kept in
+    the cache directory, so signed urls survive restarts and are shared by every worker.
+    """
+    key = os.environ.get('NEXAFEED_THUMBNAIL_KEY')
+    if key:
+        return key.encode()
+    path = os.path.join(cache_dir, SIGNING_KEY_FILE)
+    try:
+        with open(path, "rb") as file:
+            return file.read()
+    except FileNotFoundError:
+        pass
+    try:
+        with open(path, "xb") as file:
+            file.write(secrets.token_hex(32).encode())
+    except FileExistsError:
+        # Another worker created it first
+        pass
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def render_thumbnails(data, widths, quality=80):
+    """
+    Decode an image once and downscale it to every width, run inside the worker pool.
+
+    :return: A dict of width to encoded image bytes. Images narrower than a width are not upscaled.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft("RGB", (max(widths), max(widths)))
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        rendered = {}
+        for width in sorted(widths, reverse=True):
+            if image.width > width:
+                height = max(1, round(image.height * width / image.width))
+                image = image.resize((width, height), Image.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, THUMBNAIL_FORMAT, quality=quality, method=4)
+            rendered[width] = output.getvalue()
+    return rendered
+
+
+class ThumbnailManager:
+    """
+    Fetches remote thumbnails once and serves downscaled copies from disk.
+
+    Rendered files are addressed by the hash of the source image, so the same picture
+    linked from many entries is stored once. A small pointer file maps each source url
+    to that hash. The cache is trimmed in least recently used order to stay in budget.
+    File access runs in threads, off the event loop.
+
+    Only urls signed with `sign` are served, which the feed API does for the thumbnails
+    of the entries it returns, and sources are only fetched from public addresses.
+    Sources that fail to download or decode aren't tried again for `failure_ttl` seconds.
+    """
+
+    def __init__(self, cache_dir, widths=DEFAULT_WIDTHS, max_bytes=256 * 1024 * 1024, max_source_bytes=10 * 1024 * 1024, workers=2, prewarm_concurrency=4,
+                 failure_ttl=3600):
+        self.cache_dir = cache_dir
+        self.widths = tuple(sorted(widths))
+        self.max_bytes = max_bytes
+        self.max_source_bytes = max_source_bytes
+        self.failure_ttl = failure_ttl
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.prewarm_semaphore = asyncio.Semaphore(prewarm_concurrency)
+        self.inflight = {}
+        self.background = set()
+        # Source url -> monotonic time until which it isn't fetched again
+        self.failures = OrderedDict()
+        self.files = OrderedDict()
+        self.total_bytes = 0
+        self.session = None
+        os.makedirs(os.path.join(cache_dir, "urls"), exist_ok=True)
+        self.signing_key = load_signing_key(cache_dir)
+        self.scan_task = None
+
+    def start(self):
+        if self.scan_task is None:
+            self.scan_task = asyncio.get_running_loop().create_task(self.scan())
+
+    async def scan(self):
+        """Rebuilds the LRU order from the files on disk, oldest access first."""
+        scanned = OrderedDict((path, size) for _, path, size in await asyncio.to_thread(scan_files, self.cache_dir))
+        # Files stored while the scan ran are the most recently used
+        for path, size in self.files.items():
+            scanned.pop(path, None)
+            scanned[path] = size
+        self.files = scanned
+        self.total_bytes = sum(scanned.values())
+        await self.evict()
+
+    def sign(self, url):
+        return hmac.new(self.signing_key, url.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def verify(self, url, signature):
+        return bool(signature) and hmac.compare_digest(self.sign(url), signature)
+
+    def get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(resolver=PublicResolver())
+            self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=20))
+        return self.session
+
+    def snap_width(self, width):
+        """Returns the smallest rendered width that covers the requested one."""
+        return next((w for w in self.widths if w >= width), self.widths[-1])
+
+    def url_path(self, url):
+        return os.path.join(self.cache_dir, "urls", hashlib.sha256(url.encode()).hexdigest())
+
+    def thumbnail_path(self, digest, width):
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}-{width}.{THUMBNAIL_FORMAT}")
+
+    async def lookup(self, url, width):
+        """Returns (path, digest) of a rendered thumbnail, or None if it isn't cached."""
+        url_path = self.url_path(url)
+        digest = await asyncio.to_thread(read_pointer, url_path, lambda digest: self.thumbnail_path(digest, width))
+        if digest is None:
+            return None
+        path = self.thumbnail_path(digest, width)
+        for touched in (path, url_path):
+            if touched in self.files:
+                self.files.move_to_end(touched)
+        return path, digest
+
+    def failed_recently(self, url):
+        until = self.failures.get(url)
+        if until is None:
+            return False
+        if until > time.monotonic():
+            return True
+        del self.failures[url]
+        return False
+
+    def record_failure(self, url):
+        self.failures.pop(url, None)
+        self.failures[url] = time.monotonic() + self.failure_ttl
+        while len(self.failures) > MAX_FAILURES:
+            self.failures.popitem(last=False)
+
+    async def get(self, url, width):
+        """
+        Returns (path, etag) of the thumbnail of `url` at the snapped width, rendering it if needed.
+
+        :return: None if the source couldn't be fetched or decoded, now or within `failure_ttl`.
+        """
+        width = self.snap_width(width)
+        cached = await self.lookup(url, width)
+        CACHE_REQUESTS.inc("thumbnails", "miss" if cached is None else "hit")
+        if cached is None:
+            if self.failed_recently(url):
+                return None
+            task = self.inflight.get(url)
+            if task is None:
+                task = asyncio.ensure_future(self.render(url))
+                self.inflight[url] = task
+                task.add_done_callback(lambda _: self.inflight.pop(url, None))
+            if not await asyncio.shield(task):
+                return None
+            cached = await self.lookup(url, width)
+            if cached is None:
+                return None
+        path, digest = cached
+        return path, f'"{digest[:32]}-{width}"'
+
+    async def render(self, url):
+        rendered = await self.render_source(url)
+        if not rendered:
+            self.record_failure(url)
+        return rendered
+
+    async def render_source(self, url):
+        data = await self.download(url)
+        if not data:
+            return False
+
+        digest = hashlib.sha256(data).hexdigest()
+        paths = [self.thumbnail_path(digest, width) for width in self.widths]
+        if not all(await asyncio.to_thread(lambda: [os.path.exists(path) for path in paths])):
+            try:
+                rendered = await asyncio.get_running_loop().run_in_executor(self.executor, render_thumbnails, data, self.widths)
+            except Exception as e:
+                print(f"Failed to render thumbnail for {url}: {e}")
+                return False
+            for width, image in rendered.items():
+                await self.store(self.thumbnail_path(digest, width), image)
+        await self.store(self.url_path(url), digest.encode())
+        await self.evict()
+        return True
+
+    async def download(self, url):
+        try:
+            # Redirects are followed by hand, so each hop is checked like the first
+            for _ in range(MAX_REDIRECTS + 1):
+                parts = urlsplit(url)
+                if parts.scheme not in ("http", "https") or not parts.hostname:
+                    return None
+                if is_ip_literal(parts.hostname) and not is_public_address(parts.hostname.strip("[]")):
+                    return None
+                from user_agent import generate_user_agent
+                async with self.get_session().get(url, headers={'User-Agent': generate_user_agent()}, allow_redirects=False) as response:
+                    if response.status in (301, 302, 303, 307, 308) and response.headers.get('Location'):
+                        url = urljoin(url, response.headers['Location'])
+                        continue
+                    if response.status != 200:
+                        return None
+                    if response.content_length and response.content_length > self.max_source_bytes:
+                        return None
+                    chunks = []
+                    size = 0
+                    async for chunk in response.content.iter_chunked(64 * 1024):
+                        size += len(chunk)
+                        if size > self.max_source_bytes:
+                            return None
+                        chunks.append(chunk)
+                    return b"".join(chunks)
+            return None
+        except Exception as e:
+            print(f"Failed to fetch thumbnail source {url}: {e}")
+            return None
+
+    async def store(self, path, data):
+        await asyncio.to_thread(write_file, path, data)
+        self.total_bytes += len(data) - self.files.pop(path, 0)
+        self.files[path] = len(data)
+
+    async def evict(self):
+        removed = []
+        while self.total_bytes > self.max_bytes and self.files:
+            path, size = self.files.popitem(last=False)
+            self.total_bytes -= size
+            removed.append(path)
+        if removed:
+            await asyncio.to_thread(remove_files, removed)
+
+    def prewarm(self, urls):
+        """Renders thumbnails for newly ingested entries in the background."""
+        for url in set(filter(None, urls)):
+            if url not in self.inflight and not self.failed_recently(url):
+                task = asyncio.ensure_future(self._prewarm(url))
+                self.background.add(task)
+                task.add_done_callback(self.background.discard)
+
+    async def _prewarm(self, url):
+        async with self.prewarm_semaphore:
+            await self.get(url, self.widths[0])
+
+    async def close(self):
+        for task in list(self.background):
+            task.cancel()
+        if self.scan_task is not None:
+            self.scan_task.cancel()
+        if self.session is not None:
+            await self.session.close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,212 @@
+import random
+import asyncio
+import hashlib
+import argparse
+from datetime import datetime, timezone, timedelta
+from xml.sax.saxutils import escape, quoteattr
+from aiohttp import web
+
+# Local stand-in for thousands of RSS and Atom feeds, so ingest can be benchmarked without the network.
+# Every feed is generated from its number, so the same options always serve the same corpus.
+# python tools/feed_stub.py --port 8090 --latency 50 --error-rate 0.02 --slow-hosts 0.1
+
+WORDS = (
+    "market release update security research model cloud browser kernel patch launch report privacy network "
+    "chip battery design policy court budget climate energy vaccine study league season transfer museum "
+    "album interview review guide analysis outage funding startup acquisition protocol compiler database"
+).split()
+
+# Formats seen in the wild, from clean RFC 822 to naive ISO 8601 dates
+DATE_FORMATS = [
+    "%a, %d %b %Y %H:%M:%S +0000",
+    "%a, %d %b %Y %H:%M:%S GMT",
+    "%Y-%m-%dT%H:%M:%SZ",
+    "%Y-%m-%dT%H:%M:%S+00:00",
+    "%Y-%m-%d %H:%M:%S"
+]
+
+# Links shared between feeds, like stories syndicated by several sites
+SHARED_STORIES = 500
+
+
+def feed_path(number, hosts):
+    kind = "atom" if number % 3 == 2 else "rss"
+    return f"/h{number % hosts}/feed{number}.{kind}"
+
+
+def feed_urls(base_url, count, hosts=50):
+    return [f"{base_url.rstrip('/')}{feed_path(number, hosts)}" for number in range(count)]
+
+
+class Corpus:
+    """Builds and serves the synthetic feeds, with latency, errors and ETags decided per feed."""
+
+    def __init__(self, seed=1, hosts=50, latency=0.0, slow_hosts=0.0, slow_latency=1.0, error_rate=0.0,
+                 etag_rate=0.8, duplicate_rate=0.05, max_entries=200):
+        self.seed = seed
+        self.hosts = hosts
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self.slow = set(range(int(hosts * slow_hosts)))
+        self.error_rate = error_rate
+        self.etag_rate = etag_rate
+        self.duplicate_rate = duplicate_rate
+        self.max_entries = max_entries
+        self.now = datetime.now(timezone.utc).replace(microsecond=0)
+        self.bodies = {}
+        self.stats = {"requests": 0, "not_modified": 0, "errors": 0, "bytes": 0}
+
+    def rng(self, number):
+        return random.Random(self.seed * 1_000_003 + number)
+
+    def text(self, rng, words):
+        return " ".join(rng.choice(WORDS) for _ in range(words))
+
+    def entries(self, number, rng):
+        # Mostly small feeds, a long tail of large ones
+        count = min(self.max_entries, int(rng.paretovariate(1.5) * 10))
+        date_format = rng.choice(DATE_FORMATS)
+        media = rng.choice(["media_thumbnail", "enclosure", "inline", "youtube", None])
+        entries = []
+        for index in range(count):
+            if rng.random() < self.duplicate_rate:
+                link = f"https://shared.example/story/{rng.randrange(SHARED_STORIES)}"
+            elif entries and rng.random() < self.duplicate_rate:
+                # The same item listed twice in one feed
+                link = entries[-1]["link"]
+            else:
+                link = f"https://site{number % self.hosts}.example/{number}/{index}"
+            paragraphs = [f"<p>{self.text(rng, rng.randint(20, 120))}</p>" for _ in range(rng.randint(1, 8))]
+            image = f"https://img{number % self.hosts}.example/{number}/{index}.jpg"
+            if media == "inline":
+                paragraphs.insert(0, f'<p><img src="{image}" alt=""/></p>')
+            entries.append({
+                "title": self.text(rng, rng.randint(4, 12)).capitalize(),
+                "link": f"https://www.youtube.com/watch?v={number:06d}{index:05d}" if media == "youtube" else link,
+                "date": (self.now - timedelta(hours=index * rng.uniform(1, 48))).strftime(date_format),
+                "content": "".join(paragraphs),
+                "image": image if media in ("media_thumbnail", "enclosure") else None,
+                "media": media,
+                "author": f"Author {rng.randrange(20)}"
+            })
+        return entries
+
+    def render_rss(self, number, entries):
+        items = []
+        for entry in entries:
+            media = ""
+            if entry["media"] == "media_thumbnail":
+                media = f'<media:thumbnail url={quoteattr(entry["image"])}/>'
+            elif entry["media"] == "enclosure":
+                media = f'<enclosure url={quoteattr(entry["image"])} type="image/jpeg" length="0"/>'
+            date = f"<pubDate>{entry['date']}</pubDate>" if number % 5 else f"<dc:date>{entry['date']}</dc:date>"
+            items.append(
+                f"<item><title>{escape(entry['title'])}</title><link>{escape(entry['link'])}</link>"
+                f"<guid>{escape(entry['link'])}</guid>{date}<dc:creator>{entry['author']}</dc:creator>"
+                f"<category>{entry['title'].split()[0]}</category>{media}"
+                f"<description>{escape(entry['content'])}</description></item>"
+            )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:media="http://search.yahoo.com/mrss/">'
+            f"<channel><title>Synthetic feed {number}</title><link>https://site{number % self.hosts}.example/</link>"
+            f"<description>Benchmark feed {number}</description>{''.join(items)}</channel></rss>"
+        )
+
+    def render_atom(self, number, entries):
+        items = []
+        for entry in entries:
+            media = f'<link rel="enclosure" type="image/jpeg" href={quoteattr(entry["image"])}/>' if entry["image"] else ""
+            items.append(
+                f"<entry><title>{escape(entry['title'])}</title><link href={quoteattr(entry['link'])}/>"
+                f"<id>{escape(entry['link'])}</id><updated>{entry['date']}</updated>"
+                f"<author><name>{entry['author']}</name></author>{media}"
+                f'<content type="html">{escape(entry["content"])}</content></entry>'
+            )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom">'
+            f"<title>Synthetic feed {number}</title><link href=\"https://site{number % self.hosts}.example/\"/>"
+            f"<id>urn:feed:{number}</id><updated>{self.now.isoformat()}</updated>{''.join(items)}</feed>"
+        )
+
+    def body(self, number, kind):
+        """Returns (body, etag or None) of one feed, rendered once and kept for later requests."""
+        if number not in self.bodies:
+            rng = self.rng(number)
+            entries = self.entries(number, rng)
+            text = self.render_atom(number, entries) if kind == "atom" else self.render_rss(number, entries)
+            body = text.encode()
+            etag = f'"{hashlib.md5(body).hexdigest()}"' if rng.random() < self.etag_rate else None
+            self.bodies[number] = (body, etag)
+        return self.bodies[number]
+
+    def failure(self, number):
+        # Deterministic, so a failing feed fails on every run
+        rng = random.Random(self.seed * 7_919 + number)
+        if rng.random() >= self.error_rate:
+            return None
+        return rng.choice([500, 503, 404, 403, 200])
+
+    async def serve(self, request):
+        host = int(request.match_info["host"])
+        number = int(request.match_info["number"])
+        self.stats["requests"] += 1
+        delay = self.latency * random.uniform(0.5, 1.5)
+        if host in self.slow:
+            delay += self.slow_latency
+        if delay:
+            await asyncio.sleep(delay)
+
+        failure = self.failure(number)
+        if failure:
+            self.stats["errors"] += 1
+            if failure == 200:
+                # A page that isn't a feed, like a parked domain
+                return web.Response(text="<html><body>Parked domain</body></html>", content_type="text/html")
+            return web.Response(status=failure)
+
+        body, etag = self.body(number, request.match_info["kind"])
+        if etag and request.headers.get("If-None-Match") == etag:
+            self.stats["not_modified"] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        self.stats["bytes"] += len(body)
+        content_type = "application/atom+xml" if request.match_info["kind"] == "atom" else "application/rss+xml"
+        headers = {"ETag": etag} if etag else {}
+        return web.Response(body=body, content_type=content_type, charset="utf-8", headers=headers)
+
+    async def report(self, request):
+        return web.json_response(self.stats)
+
+
+def create_app(**options):
+    corpus = Corpus(**options)
+    app = web.Application()
+    app['corpus'] = corpus
+    app.router.add_get(r'/h{host:\d+}/feed{number:\d+}.{kind:rss|atom}', corpus.serve)
+    app.router.add_get('/stats', corpus.report)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a synthetic feed corpus.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--hosts", type=int, default=50, help="Simulated hosts the feeds are spread over")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean response delay in ms, jittered by 50%%")
+    parser.add_argument("--slow-hosts", type=float, default=0.0, help="Fraction of hosts answering slowly")
+    parser.add_argument("--slow-latency", type=float, default=1000.0, help="Extra delay of slow hosts in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of feeds answering with an error")
+    parser.add_argument("--etag-rate", type=float, default=0.8, help="Fraction of feeds sending an ETag")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05, help="Fraction of entries repeating a link")
+    args = parser.parse_args()
+    web.run_app(create_app(
+        seed=args.seed,
+        hosts=args.hosts,
+        latency=args.latency / 1000,
+        slow_hosts=args.slow_hosts,
+        slow_latency=args.slow_latency / 1000,
+        error_rate=args.error_rate,
+        etag_rate=args.etag_rate,
+        duplicate_rate=args.duplicate_rate
+    ), host=args.host, port=args.port, print=None)
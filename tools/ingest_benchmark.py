@@ -0,0 +1,275 @@
+import io
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import resource
+import subprocess
+from collections import Counter, defaultdict
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+# Measures RSSFetcher.fetch_feeds against a synthetic corpus served by tools/feed_stub.py.
+# Uses the database configured in .env or DATABASE_URL, inside a throwaway category.
+# python tools/ingest_benchmark.py --feeds 2000 --latency 50 [--compare benchmark-results/ingest-abc1234.json]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+import feedparser
+import rss_fetcher
+from db_manager import DBManager
+from rss_fetcher import RSSFetcher
+from feed_stub import feed_urls
+
+# Metrics compared with --compare, and whether a higher value is better
+COMPARED = {
+    "feeds_per_s": True,
+    "entries_per_s": True,
+    "latency_p50_ms": False,
+    "latency_p99_ms": False,
+    "cpu_s": False,
+    "peak_rss_mb": False
+}
+
+
+class StageTimer:
+    """
+    CPU and wall time spent in each wrapped stage.
+
+    Async stages are timed across their awaits, which is only meaningful for stages that
+    don't yield (entry processing) or that run while nothing else does (the final insert).
+    """
+
+    def __init__(self):
+        self.cpu = defaultdict(float)
+        self.wall = defaultdict(float)
+        self.calls = Counter()
+
+    def reset(self):
+        self.cpu.clear()
+        self.wall.clear()
+        self.calls.clear()
+
+    def add(self, name, cpu_started, wall_started):
+        self.cpu[name] += time.process_time() - cpu_started
+        self.wall[name] += time.perf_counter() - wall_started
+        self.calls[name] += 1
+
+    def wrap(self, name, func):
+        def timed(*args, **kwargs):
+            cpu_started, wall_started = time.process_time(), time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(name, cpu_started, wall_started)
+        return timed
+
+    def wrap_async(self, name, func):
+        async def timed(*args, **kwargs):
+            cpu_started, wall_started = time.process_time(), time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self.add(name, cpu_started, wall_started)
+        return timed
+
+
+def instrument(fetcher, db_manager, timer, feeds):
+    """Wraps the ingest stages with the timer and records each feed's latency, status and entry count."""
+    feedparser.parse = timer.wrap("parse", feedparser.parse)
+    rss_fetcher.fetch_media = timer.wrap("media", rss_fetcher.fetch_media)
+    fetcher.remove_old_entries = timer.wrap("trim", fetcher.remove_old_entries)
+    fetcher.process_entry = timer.wrap_async("entries", fetcher.process_entry)
+    fetcher.sources.refresh = timer.wrap("sources", fetcher.sources.refresh)
+    db_manager.insert_many = timer.wrap_async("insert", db_manager.insert_many)
+
+    fetch_single_feed = fetcher.fetch_single_feed
+
+    async def timed_fetch(connector, category, url):
+        started = time.perf_counter()
+        entries, metadata, status = await fetch_single_feed(connector, category, url)
+        feeds.append((time.perf_counter() - started, status, len(entries)))
+        return entries, metadata, status
+
+    fetcher.fetch_single_feed = timed_fetch
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stub(args, port):
+    stub = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, "tools", "feed_stub.py"),
+        "--port", str(port), "--seed", str(args.seed), "--hosts", str(args.hosts),
+        "--latency", str(args.latency), "--slow-hosts", str(args.slow_hosts),
+        "--slow-latency", str(args.slow_latency), "--error-rate", str(args.error_rate),
+        "--etag-rate", str(args.etag_rate), "--duplicate-rate", str(args.duplicate_rate)
+    ])
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return stub
+        except OSError:
+            time.sleep(0.1)
+    stub.terminate()
+    raise RuntimeError("Feed stub did not start")
+
+
+def git_commit():
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    commit = result.stdout.strip() or "unknown"
+    dirty = subprocess.run(["git", "diff", "--quiet", "HEAD"], cwd=ROOT).returncode != 0
+    return f"{commit}-dirty" if dirty else commit
+
+
+async def clean_up(pool, category_id, base_url):
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("DELETE FROM feed_entries WHERE category_id = $1", category_id)
+            await conn.execute("DELETE FROM feed_metadata WHERE url LIKE $1", f"{base_url}%")
+            await conn.execute("DELETE FROM feed_sources WHERE url LIKE $1", f"{base_url}%")
+            await conn.execute("DELETE FROM feed_fetch_log WHERE url LIKE $1", f"{base_url}%")
+
+
+async def run_pass(name, fetcher, pool, category_id, urls, timer, feeds):
+    timer.reset()
+    feeds.clear()
+    async with pool.acquire() as conn:
+        rows_before = await conn.fetchval("SELECT count(*) FROM feed_entries WHERE category_id = $1", category_id)
+
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    # fetch_feeds prints a line per feed
+    with redirect_stdout(io.StringIO()):
+        await fetcher.fetch_feeds(category_id, urls, pool)
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+
+    async with pool.acquire() as conn:
+        rows_after = await conn.fetchval("SELECT count(*) FROM feed_entries WHERE category_id = $1", category_id)
+    latencies = [latency * 1000 for latency, _, _ in feeds]
+    entries = sum(count for _, _, count in feeds)
+    stages = {stage: round(timer.cpu[stage], 3) for stage in sorted(timer.cpu)}
+    # Everything outside the wrapped stages: HTTP, the event loop and the stages' own callers
+    stages["other"] = round(cpu - sum(timer.cpu[stage] for stage in timer.cpu if stage != "media"), 3)
+    return {
+        "pass": name,
+        "feeds": len(urls),
+        "statuses": {str(status): count for status, count in sorted(Counter(status for _, status, _ in feeds).items())},
+        "entries": entries,
+        "inserted": rows_after - rows_before,
+        "wall_s": round(wall, 3),
+        "cpu_s": round(cpu, 3),
+        "feeds_per_s": round(len(urls) / wall, 1),
+        "entries_per_s": round(entries / wall, 1),
+        "latency_p50_ms": round(percentile(latencies, 0.5) or 0, 1),
+        "latency_p99_ms": round(percentile(latencies, 0.99) or 0, 1),
+        "stage_cpu_s": stages,
+        "stage_wall_s": {stage: round(timer.wall[stage], 3) for stage in sorted(timer.wall)},
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+def print_pass(result, baseline=None):
+    print(f"\n{result['pass']} pass: {result['feeds']} feeds in {result['wall_s']:.2f}s, statuses {result['statuses']}")
+    print(f"  {result['entries']} entries parsed, {result['inserted']} rows inserted")
+    for metric, higher_is_better in COMPARED.items():
+        line = f"  {metric:<16} {result[metric]:>10}"
+        if baseline and baseline.get(metric):
+            change = (result[metric] - baseline[metric]) / baseline[metric] * 100
+            regressed = change < 0 if higher_is_better else change > 0
+            line += f"   {change:+6.1f}% vs {baseline[metric]}{'  (worse)' if regressed and abs(change) >= 5 else ''}"
+        print(line)
+    print("  cpu by stage:   " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["stage_cpu_s"].items()))
+
+
+async def benchmark(args):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    urls = feed_urls(base_url, args.feeds, args.hosts)
+    stub = start_stub(args, port)
+
+    db_manager = DBManager(DBManager.dsn_from_env())
+    pool = await db_manager.get_pool()
+    async with pool.acquire() as conn:
+        category_id = await conn.fetchval("INSERT INTO categories (name) VALUES ($1) RETURNING id", "Ingest benchmark")
+
+    fetcher = RSSFetcher(db_manager, max_workers=args.concurrency)
+    timer = StageTimer()
+    feeds = []
+    instrument(fetcher, db_manager, timer, feeds)
+    results = []
+    try:
+        for name in args.passes.split(","):
+            results.append(await run_pass(name, fetcher, pool, category_id, urls, timer, feeds))
+    finally:
+        await fetcher.close()
+        await clean_up(pool, category_id, base_url)
+        async with pool.acquire() as conn:
+            await conn.execute("DELETE FROM categories WHERE id = $1", category_id)
+        await pool.close()
+        stub.terminate()
+        stub.wait()
+
+    return {
+        "commit": git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(),
+        "backend": type(db_manager.backend).__name__,
+        "options": vars(args),
+        "passes": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark feed ingest against a synthetic corpus.")
+    parser.add_argument("--feeds", type=int, default=1000, help="Feeds in the corpus")
+    parser.add_argument("--concurrency", type=int, default=50, help="RSSFetcher max_workers")
+    parser.add_argument("--passes", default="cold,warm", help="Comma separated pass names, later passes revalidate with ETags")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--hosts", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=20.0, help="Mean response delay in ms")
+    parser.add_argument("--slow-hosts", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=1000.0, help="Extra delay of slow hosts in ms")
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--etag-rate", type=float, default=0.8)
+    parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    parser.add_argument("--json", dest="json_path", help="Where to save the results, defaults to benchmark-results/ingest-<commit>.json")
+    parser.add_argument("--compare", help="Earlier results to compare against")
+    args = parser.parse_args()
+
+    report = asyncio.run(benchmark(args))
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as file:
+            earlier = json.load(file)
+        baseline = {result["pass"]: result for result in earlier["passes"]}
+        print(f"Comparing with {earlier['commit']} ({earlier['created']})")
+    for result in report["passes"]:
+        print_pass(result, baseline.get(result["pass"]))
+
+    json_path = args.json_path or os.path.join(ROOT, "benchmark-results", f"ingest-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(json_path)), exist_ok=True)
+    with open(json_path, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nSaved {json_path}")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(ROOT, ".env"))
+    main()
@@ -1,17 +1,150 @@
-import feedparser
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from collections import defaultdict
+from urllib.parse import urlsplit
 import xml.etree.ElementTree as ET
 
-def update_opml(file_path):
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-    for outline in root.findall(".//outline"):
-        xml_url = outline.get('xmlUrl')
-        if xml_url:
-            feed = feedparser.parse(xml_url)
-            if 'title' not in outline.attrib and feed.feed.get('title'):
-                outline.set('title', feed.feed.title)
-            if 'description' not in outline.attrib and feed.feed.get('subtitle'):
-                outline.set('description', feed.feed.subtitle)
-    tree.write('updated_opml.xml', encoding="UTF-8", xml_declaration=True)
-
-update_opml('feeds.opml')
+# Fills in the title, description, site url and update frequency of every feed of an OPML file,
+# writing them to a new OPML file and to the feeds table.
+# Run from anywhere: python tools/opml_finalize.py tools/feeds.opml [--output updated_opml.xml] [--resume]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aiohttp import ClientSession
+from user_agent import generate_user_agent
+from rss_fetcher import RSSFetcher
+
+UPDATE_FEEDS_QUERY = """
+    UPDATE feeds SET
+        name = CASE WHEN name IS NULL OR name = '' OR name = url THEN COALESCE($2, name) ELSE name END,
+        description = COALESCE(NULLIF(description, ''), $3),
+        site_url = COALESCE($4, site_url),
+        update_interval = COALESCE($5, update_interval)
+    WHERE url = $1
+"""
+
+
+def load_checkpoint(path):
+    """Returns {url: details or None} for every feed already handled by an earlier run."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # The last line is cut short when a run is killed mid-write
+                continue
+            done[record["url"]] = record["details"]
+    return done
+
+
+async def describe_all(fetcher, urls, checkpoint, concurrency, per_host, timeout):
+    """Fetches every url, at most `concurrency` at once and `per_host` per host, appending each result to the checkpoint."""
+    semaphore = asyncio.Semaphore(concurrency)
+    host_semaphores = defaultdict(lambda: asyncio.Semaphore(per_host))
+    results = {}
+    started = time.perf_counter()
+
+    async def describe(url, session):
+        async with semaphore, host_semaphores[urlsplit(url).netloc.lower()]:
+            try:
+                details = await fetcher.describe_feed(session, url, timeout)
+                error = None if details else "not a feed"
+            except Exception as e:
+                details, error = None, str(e) or type(e).__name__
+        results[url] = details
+        checkpoint.write(json.dumps({"url": url, "details": details}) + "\n")
+        checkpoint.flush()
+        status = "ok" if details else f"failed ({error})"
+        print(f"[{len(results)}/{len(urls)} {time.perf_counter() - started:.0f}s] {url}: {status}")
+
+    async with ClientSession(connector=fetcher.get_connector(), connector_owner=False, headers={'User-Agent': generate_user_agent()}) as session:
+        await asyncio.gather(*(describe(url, session) for url in urls))
+    return results
+
+
+def update_opml(tree, details):
+    """Sets the attributes the outlines don't have yet, returns how many outlines changed."""
+    changed = 0
+    for outline in tree.getroot().iter("outline"):
+        feed = details.get(outline.get('xmlUrl'))
+        if not feed:
+            continue
+        attributes = {
+            'title': feed['title'],
+            'text': outline.get('title') or feed['title'],
+            'description': feed['description'],
+            'htmlUrl': feed['site_url']
+        }
+        updated = False
+        for name, value in attributes.items():
+            if value and not outline.get(name):
+                outline.set(name, value)
+                updated = True
+        changed += updated
+    return changed
+
+
+async def update_database(details):
+    from db_manager import DBManager
+
+    db_manager = DBManager(DBManager.dsn_from_env())
+    pool = await db_manager.get_pool()
+    try:
+        async with pool.acquire() as conn:
+            await conn.executemany(UPDATE_FEEDS_QUERY, [
+                (url, feed['title'], feed['description'], feed['site_url'], feed['update_interval'])
+                for url, feed in details.items() if feed
+            ])
+    finally:
+        await pool.close()
+
+
+async def run(args):
+    tree = ET.parse(args.opml)
+    urls = list(dict.fromkeys(
+        outline.get('xmlUrl').strip() for outline in tree.getroot().iter("outline") if (outline.get('xmlUrl') or '').strip()
+    ))
+
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint.jsonl"
+    details = load_checkpoint(checkpoint_path) if args.resume else {}
+    pending = [url for url in urls if url not in details]
+    print(f"{len(urls)} feeds, {len(urls) - len(pending)} already done, fetching {len(pending)}")
+
+    fetcher = RSSFetcher(None, max_workers=args.concurrency)
+    try:
+        with open(checkpoint_path, "a" if args.resume else "w") as checkpoint:
+            details.update(await describe_all(fetcher, pending, checkpoint, args.concurrency, args.per_host, args.timeout))
+    finally:
+        await fetcher.close()
+
+    changed = update_opml(tree, details)
+    tree.write(args.output, encoding="UTF-8", xml_declaration=True)
+    found = sum(1 for feed in details.values() if feed)
+    print(f"Described {found} of {len(urls)} feeds, updated {changed} outlines in {args.output}")
+
+    if not args.no_db:
+        await update_database(details)
+        print("Updated the feeds table")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(ROOT, ".env"))
+    parser = argparse.ArgumentParser(description="Fill in feed details in an OPML file and the feeds table.")
+    parser.add_argument("opml", nargs="?", default="feeds.opml", help="OPML file to enrich")
+    parser.add_argument("--output", default="updated_opml.xml", help="Where to write the enriched OPML")
+    parser.add_argument("--concurrency", type=int, default=50, help="Feeds fetched at once")
+    parser.add_argument("--per-host", type=int, default=4, help="Feeds fetched at once from the same host")
+    parser.add_argument("--timeout", type=float, default=20, help="Seconds allowed per feed")
+    parser.add_argument("--checkpoint", help="Progress file, defaults to OUTPUT.checkpoint.jsonl")
+    parser.add_argument("--resume", action="store_true", help="Skip the feeds already in the checkpoint, failed ones included")
+    parser.add_argument("--no-db", action="store_true", help="Only write the OPML file")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,334 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import Counter, defaultdict
+from datetime import datetime, timezone, timedelta
+
+# Load test of the read path: seeds feed_entries, then replays infinite scroll and search sessions
+# against a running server and reports latency, throughput, database versus serialization time and sizes.
+#
+#   python tools/read_load_test.py seed --entries 2000000 --categories 20
+#   python tools/read_load_test.py run --base-url http://127.0.0.1:5000 --users 50 --duration 60
+#   python tools/read_load_test.py clean
+#
+# /api/fetch is rate limited per client address, so every session from this machine shares one bucket.
+# 429s are reported on their own; raise rate_limit.routes.paginate.limit to measure the endpoint itself.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+from feed_stub import WORDS
+from ingest_benchmark import percentile, git_commit
+
+CATEGORY_PREFIX = "Load test"
+LINK_PREFIX = "https://loadtest.example/"
+INSERT_ENTRY_QUERY = """
+    INSERT INTO feed_entries (original_link, category_id, title, content, thumbnail, additional_info, published_date, url)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+"""
+ENTRY_COLUMNS = ["original_link", "category_id", "title", "content", "thumbnail", "additional_info", "published_date", "url"]
+
+# Metrics compared with --compare, and whether a higher value is better
+COMPARED = {
+    "requests_per_s": True,
+    "latency_p50_ms": False,
+    "latency_p99_ms": False,
+    "db_p50_ms": False,
+    "serialize_p50_ms": False,
+    "bytes_avg": False
+}
+
+
+def get_db_manager():
+    from db_manager import DBManager
+    return DBManager(DBManager.dsn_from_env())
+
+
+def fake_entries(rng, category_ids, count, start, run, days, feeds_per_category):
+    """Yields `count` entry rows spread over the categories and the last `days` days."""
+    now = datetime.now(timezone.utc)
+    for number in range(start, start + count):
+        category_id = rng.choice(category_ids)
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12))).capitalize()
+        content = " ".join(rng.choice(WORDS) for _ in range(rng.randint(30, 300)))
+        info = {"tags": rng.sample(WORDS, 3), "creator": f"Author {rng.randrange(200)}"}
+        yield (
+            f"{LINK_PREFIX}{run}/{number}",
+            category_id,
+            title,
+            f"<p>{content}</p>",
+            f"{LINK_PREFIX}img/{number}.jpg" if rng.random() < 0.6 else None,
+            json.dumps(info),
+            now - timedelta(seconds=rng.uniform(0, days * 86400)),
+            f"{LINK_PREFIX}feed/{category_id}/{rng.randrange(feeds_per_category)}"
+        )
+
+
+async def seed(args):
+    db_manager = get_db_manager()
+    pool = await db_manager.get_pool()
+    rng = random.Random(args.seed)
+    run = int(time.time())
+    try:
+        async with pool.acquire() as conn:
+            category_ids = [
+                await conn.fetchval("INSERT INTO categories (name) VALUES ($1) RETURNING id", f"{CATEGORY_PREFIX} {number}")
+                for number in range(args.categories)
+            ]
+        started = time.perf_counter()
+        for start in range(0, args.entries, args.batch_size):
+            rows = list(fake_entries(rng, category_ids, min(args.batch_size, args.entries - start), start, run, args.days, args.feeds_per_category))
+            async with pool.acquire() as conn:
+                if db_manager.backend.name == "postgres":
+                    # COPY is several times faster than executemany for millions of rows
+                    await conn.copy_records_to_table("feed_entries", records=rows, columns=ENTRY_COLUMNS)
+                else:
+                    async with conn.transaction():
+                        await conn.executemany(INSERT_ENTRY_QUERY, rows)
+            done = start + len(rows)
+            print(f"Seeded {done}/{args.entries} entries ({done / (time.perf_counter() - started):.0f}/s)")
+        print(f"Categories: {', '.join(map(str, category_ids))}")
+    finally:
+        await pool.close()
+
+
+async def clean(args):
+    db_manager = get_db_manager()
+    pool = await db_manager.get_pool()
+    try:
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                rows = await conn.fetch("SELECT id FROM categories WHERE name LIKE $1", f"{CATEGORY_PREFIX} %")
+                category_ids = [row["id"] for row in rows]
+                await conn.execute("DELETE FROM feed_entries WHERE category_id = ANY($1::int[])", category_ids)
+                await conn.execute("DELETE FROM categories WHERE id = ANY($1::int[])", category_ids)
+        print(f"Removed {len(category_ids)} load test categories and their entries")
+    finally:
+        await pool.close()
+
+
+async def load_categories():
+    db_manager = get_db_manager()
+    pool = await db_manager.get_pool()
+    try:
+        async with pool.acquire() as conn:
+            rows = await conn.fetch("SELECT id FROM categories WHERE name LIKE $1 ORDER BY id", f"{CATEGORY_PREFIX} %")
+        return [row["id"] for row in rows]
+    finally:
+        await pool.close()
+
+
+def server_timing(header):
+    """Returns {name: milliseconds} from a Server-Timing header."""
+    timings = {}
+    for metric in (header or "").split(","):
+        name, _, params = metric.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                timings[name] = float(value)
+    return timings
+
+
+class LoadTest:
+    """Virtual users replaying scroll and search sessions, with each request recorded by kind."""
+
+    def __init__(self, session, base_url, category_ids, rng, depth=10, search_rate=0.2, think_time=0.5, retry_limited=False):
+        self.session = session
+        self.base_url = base_url.rstrip("/")
+        self.category_ids = category_ids
+        self.rng = rng
+        self.depth = depth
+        self.search_rate = search_rate
+        self.think_time = think_time
+        self.retry_limited = retry_limited
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.sessions = 0
+
+    async def request(self, kind, category_id, params):
+        """Fetches one page, returns its items, or None when the session can't continue."""
+        started = time.perf_counter()
+        async with self.session.get(f"{self.base_url}/api/fetch/{category_id}", params=params) as response:
+            body = await response.read()
+            latency = (time.perf_counter() - started) * 1000
+            self.statuses[kind][response.status] += 1
+            status, headers = response.status, response.headers
+        if status == 429 and self.retry_limited:
+            await asyncio.sleep(int(headers.get("Retry-After", "1")))
+            return await self.request(kind, category_id, params)
+        if status != 200:
+            return None
+        timings = server_timing(headers.get("Server-Timing"))
+        self.samples[kind].append((latency, timings.get("db"), timings.get("serialize"), len(body)))
+        return json.loads(body).get("feed_items") or []
+
+    async def think(self):
+        if self.think_time:
+            await asyncio.sleep(self.rng.expovariate(1 / self.think_time))
+
+    async def scroll(self, kind, category_id, params):
+        items = await self.request(kind, category_id, params)
+        # Readers give up at different depths
+        for _ in range(self.rng.randint(0, self.depth)):
+            if not items:
+                return
+            await self.think()
+            last = items[-1]
+            items = await self.request(
+                "search_page" if "q" in params else "deep_page",
+                category_id,
+                dict(params, last_id=str(last["id"]), last_pd=str(last["published_date"]))
+            )
+
+    async def user(self, deadline):
+        while time.perf_counter() < deadline:
+            category_id = self.rng.choice(self.category_ids)
+            if self.rng.random() < self.search_rate:
+                await self.scroll("search", category_id, {"q": " ".join(self.rng.sample(WORDS, self.rng.randint(1, 2)))})
+            else:
+                await self.scroll("first_page", category_id, {})
+            self.sessions += 1
+            await self.think()
+
+    def report(self, duration):
+        kinds = {}
+        all_samples = []
+        for kind in sorted(set(self.samples) | set(self.statuses)):
+            samples = self.samples[kind]
+            all_samples.extend(samples)
+            kinds[kind] = summarize(samples, duration)
+            kinds[kind]["statuses"] = {str(status): count for status, count in sorted(self.statuses[kind].items())}
+        overall = summarize(all_samples, duration)
+        overall["statuses"] = {
+            str(status): sum(statuses[status] for statuses in self.statuses.values())
+            for status in sorted(set().union(*self.statuses.values()))
+        }
+        overall["sessions"] = self.sessions
+        return {"overall": overall, "kinds": kinds}
+
+
+def summarize(samples, duration):
+    latencies = [sample[0] for sample in samples]
+    db = [sample[1] for sample in samples if sample[1] is not None]
+    serialize = [sample[2] for sample in samples if sample[2] is not None]
+    sizes = [sample[3] for sample in samples]
+    rounded = lambda value: round(value, 1) if value is not None else None
+    return {
+        "requests": len(samples),
+        "requests_per_s": round(len(samples) / duration, 1),
+        "latency_p50_ms": rounded(percentile(latencies, 0.5)),
+        "latency_p90_ms": rounded(percentile(latencies, 0.9)),
+        "latency_p99_ms": rounded(percentile(latencies, 0.99)),
+        "latency_max_ms": rounded(max(latencies, default=None)),
+        "db_p50_ms": rounded(percentile(db, 0.5)),
+        "db_p99_ms": rounded(percentile(db, 0.99)),
+        "serialize_p50_ms": rounded(percentile(serialize, 0.5)),
+        "serialize_p99_ms": rounded(percentile(serialize, 0.99)),
+        "bytes_avg": round(sum(sizes) / len(sizes)) if sizes else None,
+        "bytes_max": max(sizes, default=None)
+    }
+
+
+def print_summary(name, summary, baseline=None):
+    print(f"\n{name}: {summary['requests']} requests, {summary['requests_per_s']}/s, statuses {summary['statuses']}")
+    print(f"  latency p50/p90/p99/max  {summary['latency_p50_ms']} / {summary['latency_p90_ms']} / {summary['latency_p99_ms']} / {summary['latency_max_ms']} ms")
+    print(f"  db p50/p99               {summary['db_p50_ms']} / {summary['db_p99_ms']} ms")
+    print(f"  serialize p50/p99        {summary['serialize_p50_ms']} / {summary['serialize_p99_ms']} ms")
+    print(f"  response size avg/max    {summary['bytes_avg']} / {summary['bytes_max']} bytes")
+    if baseline:
+        changes = []
+        for metric, higher_is_better in COMPARED.items():
+            if summary.get(metric) is not None and baseline.get(metric):
+                change = (summary[metric] - baseline[metric]) / baseline[metric] * 100
+                regressed = (change < 0 if higher_is_better else change > 0) and abs(change) >= 5
+                changes.append(f"{metric} {change:+.1f}%{' (worse)' if regressed else ''}")
+        if changes:
+            print("  vs baseline:             " + ", ".join(changes))
+
+
+async def run(args):
+    from aiohttp import ClientSession, TCPConnector
+
+    category_ids = [int(category_id) for category_id in args.category.split(",")] if args.category else await load_categories()
+    if not category_ids:
+        raise SystemExit("No load test categories, run the seed command first or pass --category")
+
+    rng = random.Random(args.seed)
+    async with ClientSession(connector=TCPConnector(limit=args.users)) as session:
+        test = LoadTest(session, args.base_url, category_ids, rng, args.depth, args.search_rate, args.think_time, args.retry_limited)
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(test.user(deadline) for _ in range(args.users)))
+        duration = time.perf_counter() - started
+
+    return dict(
+        test.report(duration),
+        commit=git_commit(),
+        created=datetime.now(timezone.utc).isoformat(),
+        duration_s=round(duration, 1),
+        options=vars(args)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed and load test the /api/fetch read path.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="Insert synthetic entries into new load test categories")
+    seed_parser.add_argument("--entries", type=int, default=1_000_000)
+    seed_parser.add_argument("--categories", type=int, default=10)
+    seed_parser.add_argument("--feeds-per-category", type=int, default=50)
+    seed_parser.add_argument("--days", type=int, default=365, help="Entries are spread over this many past days")
+    seed_parser.add_argument("--batch-size", type=int, default=10_000)
+    seed_parser.add_argument("--seed", type=int, default=1)
+
+    commands.add_parser("clean", help="Remove the load test categories and their entries")
+
+    run_parser = commands.add_parser("run", help="Replay client sessions against a running server")
+    run_parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+    run_parser.add_argument("--category", help="Comma separated category ids, defaults to the seeded ones")
+    run_parser.add_argument("--users", type=int, default=20, help="Concurrent sessions")
+    run_parser.add_argument("--duration", type=float, default=30, help="Seconds to run")
+    run_parser.add_argument("--depth", type=int, default=10, help="Most pages a session scrolls past the first")
+    run_parser.add_argument("--search-rate", type=float, default=0.2, help="Fraction of sessions that search")
+    run_parser.add_argument("--think-time", type=float, default=0.5, help="Mean pause between pages in seconds")
+    run_parser.add_argument("--retry-limited", action="store_true", help="Wait out 429s instead of ending the session")
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--json", dest="json_path", help="Where to save the results, defaults to benchmark-results/read-<commit>.json")
+    run_parser.add_argument("--compare", help="Earlier results to compare against")
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        asyncio.run(seed(args))
+        return
+    if args.command == "clean":
+        asyncio.run(clean(args))
+        return
+
+    report = asyncio.run(run(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        print(f"Comparing with {baseline['commit']} ({baseline['created']})")
+    print_summary("overall", report["overall"], baseline and baseline["overall"])
+    for kind, summary in report["kinds"].items():
+        print_summary(kind, summary, baseline and baseline["kinds"].get(kind))
+
+    json_path = args.json_path or os.path.join(ROOT, "benchmark-results", f"read-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(json_path)), exist_ok=True)
+    with open(json_path, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nSaved {json_path}")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(ROOT, ".env"))
+    main()
@@ -0,0 +1,35 @@
+import argparse
+from aiohttp import web
+
+# Local stand-in for Reddit's /api/info.json listing, so ingest can run without reaching Reddit.
+# Set `reddit.api_base` in config.yaml to http://127.0.0.1:<port> to use it.
+
+def fake_submission(post_id):
+    # Deterministic media per id: some videos, some images, some without media
+    kind = int(post_id, 36) % 3
+    data = {'id': post_id, 'name': f"t3_{post_id}", 'media': None}
+    if kind == 0:
+        data['media'] = {'reddit_video': {'fallback_url': f"https://v.redd.it/{post_id}/DASH_720.mp4"}}
+    elif kind == 1:
+        data['preview'] = {'images': [{'source': {'url': f"https://i.redd.it/{post_id}.png"}}]}
+    return {'kind': 't3', 'data': data}
+
+async def info(request):
+    fullnames = [name for name in request.query.get('id', '').split(',') if name.startswith('t3_')]
+    request.app['stats']['requests'] += 1
+    print(f"info request #{request.app['stats']['requests']} for {len(fullnames)} posts")
+    children = [fake_submission(name[3:]) for name in fullnames]
+    return web.json_response({'kind': 'Listing', 'data': {'children': children}})
+
+def create_app():
+    app = web.Application()
+    app['stats'] = {'requests': 0}
+    app.router.add_get('/api/info.json', info)
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake Reddit info listing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+    web.run_app(create_app(), host=args.host, port=args.port)
@@ -0,0 +1,110 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+# Reports where NexaFeed's cold start goes: import time per module and the time to the first served request.
+# Run from anywhere: python tools/startup_profile.py [--runs 5] [--path /api/categories] [--json report.json]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter, so every measurement is a cold start
+COLD_START_SCRIPT = """
+import time
+started = time.perf_counter()
+import json, asyncio
+import main
+imported = time.perf_counter()
+
+async def run():
+    async with main.app.test_app() as test_app:
+        ready = time.perf_counter()
+        response = await test_app.test_client().get({path!r})
+        served = time.perf_counter()
+        print(json.dumps({{
+            "status": response.status_code,
+            "import_s": imported - started,
+            "startup_s": ready - imported,
+            "first_request_s": served - ready,
+            "total_s": served - started
+        }}))
+
+asyncio.run(run())
+"""
+
+def import_times():
+    """Returns [(module, self_us, cumulative_us, depth)] from `python -X importtime -c "import main"`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+def cold_start(path):
+    launched = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", COLD_START_SCRIPT.format(path=path)],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - launched
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith("{"):
+            timings = json.loads(line)
+            timings["wall_s"] = wall
+            return timings
+    raise RuntimeError(f"Cold start failed:\n{result.stderr[-2000:]}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile NexaFeed's cold start.")
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts to measure, the median is reported")
+    parser.add_argument("--path", default="/api/categories", help="Request used as the first request")
+    parser.add_argument("--top", type=int, default=15, help="Modules to list by cumulative import time")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    modules = import_times()
+    total_us = next((cumulative for name, _, cumulative, depth in modules if name == "main" and depth == 0), 0)
+    # Self time summed per top-level package, so a package counts the same whichever module imports it first
+    packages = {}
+    for name, self_us, _, _ in modules:
+        package = name.split(".")[0]
+        count, package_us = packages.get(package, (0, 0))
+        packages[package] = (count + 1, package_us + self_us)
+    heaviest = sorted(packages.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+
+    print(f"Importing main: {total_us / 1000:.1f} ms")
+    print(f"{'package':<30} {'modules':>8} {'ms':>8}")
+    for package, (count, package_us) in heaviest:
+        print(f"{package:<30} {count:>8} {package_us / 1000:>8.1f}")
+
+    runs = [cold_start(args.path) for _ in range(args.runs)]
+    keys = ["wall_s", "import_s", "startup_s", "first_request_s", "total_s"]
+    median = {key: statistics.median(run[key] for run in runs) for key in keys}
+    print(f"\nCold start, median of {args.runs} (first request: GET {args.path} -> {runs[-1]['status']})")
+    print(f"  process launch to first response: {median['wall_s'] * 1000:.0f} ms")
+    print(f"  imports:                          {median['import_s'] * 1000:.0f} ms")
+    print(f"  startup hooks:                    {median['startup_s'] * 1000:.0f} ms")
+    print(f"  first request:                    {median['first_request_s'] * 1000:.0f} ms")
+
+    if args.json_path:
+        report = {
+            "import_main_ms": total_us / 1000,
+            "packages": [{"package": package, "modules": count, "ms": package_us / 1000} for package, (count, package_us) in heaviest],
+            "cold_start_median": median,
+            "runs": runs
+        }
+        with open(args.json_path, "w") as file:
+            json.dump(report, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import hmac
+import hashlib
+import asyncio
+import argparse
+import secrets
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+from aiohttp import web, ClientSession, ClientTimeout
+
+# Local stand-in for a WebSub hub and the feed it pushes, so subscriptions can be tested end to end.
+# Serves an Atom feed at /feed.xml that advertises the hub at /hub. POST /publish adds an entry
+# to the feed and delivers it to every verified subscriber, signed with its secret.
+# python tools/websub_hub.py --port 8098, then add http://127.0.0.1:8098/feed.xml as a feed
+# and set websub.callback_base to the app's url.
+
+
+def render_feed(app):
+    base = app['base_url']
+    entries = "".join(
+        f"<entry><title>{escape(entry['title'])}</title><link href=\"{base}/entries/{entry['id']}\"/>"
+        f"<id>{base}/entries/{entry['id']}</id><updated>{entry['updated']}</updated>"
+        f"<summary>{escape(entry['title'])}</summary></entry>"
+        for entry in reversed(app['entries'])
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom">'
+        f'<title>WebSub stub feed</title><link href="{base}/"/>'
+        f'<link rel="hub" href="{base}/hub"/><link rel="self" href="{base}/feed.xml"/>'
+        f"<id>{base}/feed.xml</id><updated>{datetime.now(timezone.utc).isoformat()}</updated>{entries}</feed>"
+    )
+
+
+def add_entry(app):
+    number = len(app['entries']) + 1
+    app['entries'].append({'id': number, 'title': f"Pushed entry {number}", 'updated': datetime.now(timezone.utc).isoformat()})
+
+
+async def feed(request):
+    request.app['stats']['polls'] += 1
+    return web.Response(text=render_feed(request.app), content_type="application/atom+xml")
+
+
+async def verify_intent(app, form):
+    callback, mode = form['hub.callback'], form['hub.mode']
+    challenge = secrets.token_hex(8)
+    params = {'hub.mode': mode, 'hub.topic': form['hub.topic'], 'hub.challenge': challenge, 'hub.lease_seconds': str(app['lease'])}
+    try:
+        async with app['session'].get(callback, params=params) as response:
+            verified = response.status == 200 and (await response.text()) == challenge
+    except Exception as e:
+        print(f"verification of {callback} failed: {e}")
+        return
+    print(f"{mode} {callback}: {'verified' if verified else 'not verified'}")
+    if verified and mode == "subscribe":
+        app['subscribers'][callback] = form.get('hub.secret')
+    elif verified and mode == "unsubscribe":
+        app['subscribers'].pop(callback, None)
+
+
+async def hub(request):
+    form = await request.post()
+    if form.get('hub.mode') not in ("subscribe", "unsubscribe") or not form.get('hub.callback') or not form.get('hub.topic'):
+        return web.Response(status=400, text="hub.mode, hub.callback and hub.topic are required")
+    if form['hub.topic'] != f"{request.app['base_url']}/feed.xml":
+        return web.Response(status=404, text="Unknown topic")
+    # Verification happens after answering, like real hubs do
+    asyncio.get_running_loop().create_task(verify_intent(request.app, dict(form)))
+    return web.Response(status=202)
+
+
+async def publish(request):
+    app = request.app
+    for _ in range(int(request.query.get('count', 1))):
+        add_entry(app)
+    body = render_feed(app).encode()
+    results = {}
+    for callback, secret in list(app['subscribers'].items()):
+        headers = {'Content-Type': "application/atom+xml", 'Link': f'<{app["base_url"]}/hub>; rel="hub", <{app["base_url"]}/feed.xml>; rel="self"'}
+        if secret:
+            headers['X-Hub-Signature'] = "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        try:
+            async with app['session'].post(callback, data=body, headers=headers) as response:
+                results[callback] = response.status
+        except Exception as e:
+            results[callback] = str(e)
+    print(f"published entry {len(app['entries'])} to {len(results)} subscribers: {results}")
+    return web.json_response({'entries': len(app['entries']), 'deliveries': results})
+
+
+async def stats(request):
+    return web.json_response({**request.app['stats'], 'subscribers': list(request.app['subscribers'])})
+
+
+async def open_session(app):
+    app['session'] = ClientSession(timeout=ClientTimeout(total=10))
+
+
+async def close_session(app):
+    await app['session'].close()
+
+
+def create_app(base_url, lease, entries):
+    app = web.Application()
+    app['base_url'] = base_url
+    app['lease'] = lease
+    app['entries'] = []
+    app['subscribers'] = {}
+    app['stats'] = {'polls': 0}
+    for _ in range(entries):
+        add_entry(app)
+    app.on_startup.append(open_session)
+    app.on_cleanup.append(close_session)
+    app.router.add_get('/feed.xml', feed)
+    app.router.add_post('/hub', hub)
+    app.router.add_post('/publish', publish)
+    app.router.add_get('/stats', stats)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a feed and a WebSub hub pushing it.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--lease", type=int, default=3600, help="Lease granted to subscribers, in seconds")
+    parser.add_argument("--entries", type=int, default=3, help="Entries in the feed before the first publish")
+    args = parser.parse_args()
+    web.run_app(create_app(f"http://{args.host}:{args.port}", args.lease, args.entries), host=args.host, port=args.port)
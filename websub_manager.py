@@ -0,0 +1,259 @@
+import re
+import hmac
+import asyncio
+import hashlib
+import secrets
+import aiohttp
+from datetime import datetime, timezone, timedelta
+from metrics import WEBSUB_NOTIFICATIONS
+
+LINK_PATTERN = re.compile(r'<([^>]*)>\s*((?:;\s*[^;,]*)*)')
+REL_PATTERN = re.compile(r'rel\s*=\s*"?([^";]+)"?', re.IGNORECASE)
+# Algorithms hubs may sign deliveries with, by the prefix of X-Hub-Signature
+SIGNATURE_ALGORITHMS = {
+    "sha1": hashlib.sha1,
+    "sha256": hashlib.sha256,
+    "sha384": hashlib.sha384,
+    "sha512": hashlib.sha512
+}
+
+
+def parse_link_header(value):
+    """Returns the (href, rels) pairs of an HTTP Link header."""
+    links = []
+    for href, params in LINK_PATTERN.findall(value or ""):
+        match = REL_PATTERN.search(params)
+        links.append((href.strip(), match.group(1).lower().split() if match else []))
+    return links
+
+
+def discover_hub(feed, headers=None):
+    """
+    Returns the (hub, topic) a feed advertises, or (None, None) if it has no hub.
+
+    Link headers take precedence over the feed's own links, as the WebSub spec asks.
+    The topic is the feed's rel="self" url, which hubs expect instead of the url it was fetched from.
+    """
+    links = []
+    if headers is not None:
+        for value in headers.getall('Link', []) if hasattr(headers, 'getall') else [headers.get('Link')]:
+            links.extend(parse_link_header(value))
+    links.extend((link.get('href'), (link.get('rel') or '').lower().split()) for link in feed.feed.get('links', []))
+
+    hub = next((href for href, rels in links if href and 'hub' in rels), None)
+    topic = next((href for href, rels in links if href and 'self' in rels), None)
+    return hub, topic
+
+
+def now():
+    return datetime.now(timezone.utc)
+
+
+class WebSubManager:
+    """
+    WebSub (PubSubHubbub) subscriptions for the feeds whose hubs push new entries.
+
+    Feeds advertising a hub are subscribed as the fetcher comes across them. The hub
+    verifies each subscription with a GET on its callback, /api/websub/<id>, and then
+    POSTs new content there, signed with the subscription's secret. Pushed feeds are
+    still polled every `poll_interval` seconds in case deliveries get lost, and leases
+    are renewed `renew_before` seconds before they run out.
+    """
+
+    def __init__(self, db_manager, callback_base, lease_seconds=864000, renew_before=86400, poll_interval=21600,
+                 retry_interval=3600, check_interval=600):
+        self.db_manager = db_manager
+        self.callback_base = callback_base.rstrip('/')
+        self.lease_seconds = lease_seconds
+        self.renew_before = timedelta(seconds=renew_before)
+        self.poll_interval = timedelta(seconds=poll_interval)
+        self.retry_interval = timedelta(seconds=retry_interval)
+        self.check_interval = check_interval
+        # Subscriptions by feed url, reloaded on every check so other workers' changes show up
+        self.subscriptions = {}
+        self.session = None
+        self.task = None
+
+    def get_session(self):
+        if self.session is None or self.session.closed:
+            from user_agent import generate_user_agent
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15), headers={'User-Agent': generate_user_agent()})
+        return self.session
+
+    def callback_url(self, subscription):
+        return f"{self.callback_base}/api/websub/{subscription['id']}"
+
+    async def load(self, pool):
+        async with pool.acquire() as conn:
+            rows = await conn.fetch("SELECT * FROM websub_subscriptions")
+        self.subscriptions = {row['url']: dict(row) for row in rows}
+
+    async def get(self, pool, subscription_id):
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow("SELECT * FROM websub_subscriptions WHERE id = $1", subscription_id)
+        return dict(row) if row else None
+
+    def is_pushed(self, url):
+        subscription = self.subscriptions.get(url)
+        return subscription is not None and subscription['state'] == 'active' and subscription['expires_at'] > now()
+
+    def poll_due(self, url, last_checked):
+        """False for feeds pushed by their hub that were polled less than `poll_interval` ago."""
+        if not last_checked or not self.is_pushed(url):
+            return True
+        return now() - last_checked >= self.poll_interval
+
+    async def subscribe_discovered(self, pool, hubs):
+        """Subscribes to the hubs found while polling, unless already subscribed or tried recently."""
+        pending = []
+        for url, (hub, topic) in hubs.items():
+            subscription = self.subscriptions.get(url)
+            if subscription and subscription['hub'] == hub and subscription['topic'] == topic:
+                if self.is_pushed(url) or now() - subscription['requested_at'] < self.retry_interval:
+                    continue
+            pending.append(self.subscribe(pool, url, hub, topic))
+        await asyncio.gather(*pending)
+
+    async def subscribe(self, pool, url, hub, topic):
+        current = self.subscriptions.get(url)
+        # A renewal keeps the feed pushed until the hub confirms the new lease
+        state = 'active' if self.is_pushed(url) and current['hub'] == hub else 'pending'
+        async with pool.acquire() as conn:
+            # The secret survives resubscriptions, so deliveries signed before a renewal still verify
+            row = await conn.fetchrow("""
+                INSERT INTO websub_subscriptions (url, hub, topic, secret, state, requested_at)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                ON CONFLICT (url) DO UPDATE SET hub = EXCLUDED.hub, topic = EXCLUDED.topic, state = EXCLUDED.state,
+                    requested_at = EXCLUDED.requested_at
+                RETURNING *
+            """, url, hub, topic, secrets.token_hex(20), state, now())
+        subscription = self.subscriptions[url] = dict(row)
+        await self.request(pool, subscription, "subscribe")
+
+    async def unsubscribe(self, pool, subscription):
+        async with pool.acquire() as conn:
+            await conn.execute("UPDATE websub_subscriptions SET state = 'unsubscribing', requested_at = $2 WHERE id = $1", subscription['id'], now())
+        subscription['state'] = 'unsubscribing'
+        await self.request(pool, subscription, "unsubscribe")
+
+    async def request(self, pool, subscription, mode):
+        """Sends a (un)subscription request, the hub confirms it later through `verify`."""
+        form = {
+            'hub.mode': mode,
+            'hub.topic': subscription['topic'],
+            'hub.callback': self.callback_url(subscription),
+            'hub.secret': subscription['secret'],
+            'hub.lease_seconds': str(self.lease_seconds)
+        }
+        try:
+            async with self.get_session().post(subscription['hub'], data=form) as response:
+                if response.status in (202, 204):
+                    return True
+                print(f"WebSub hub {subscription['hub']} refused to {mode} {subscription['url']}: {response.status}")
+        except Exception as e:
+            print(f"WebSub hub {subscription['hub']} unreachable for {subscription['url']}: {e}")
+        if mode == "subscribe":
+            # Polling carries on as before, the next poll after retry_interval tries again
+            async with pool.acquire() as conn:
+                await conn.execute("UPDATE websub_subscriptions SET state = 'failed' WHERE id = $1", subscription['id'])
+            subscription['state'] = 'failed'
+        return False
+
+    async def verify(self, pool, subscription_id, params):
+        """
+        Answers a hub's verification of intent.
+
+        :return: The challenge to echo back, '' to acknowledge a denial, or None if the
+            request doesn't match a subscription we asked for.
+        """
+        subscription = await self.get(pool, subscription_id)
+        if subscription is None or params.get('hub.topic') != subscription['topic']:
+            return None
+        mode = params.get('hub.mode')
+
+        async with pool.acquire() as conn:
+            if mode == 'denied':
+                print(f"WebSub hub denied the subscription to {subscription['url']}: {params.get('hub.reason')}")
+                await conn.execute("UPDATE websub_subscriptions SET state = 'denied' WHERE id = $1", subscription_id)
+                subscription['state'] = 'denied'
+            elif mode == 'subscribe' and subscription['state'] in ('pending', 'active'):
+                try:
+                    lease = int(params.get('hub.lease_seconds') or self.lease_seconds)
+                except ValueError:
+                    lease = self.lease_seconds
+                verified_at = now()
+                subscription.update(state='active', verified_at=verified_at, expires_at=verified_at + timedelta(seconds=lease))
+                await conn.execute(
+                    "UPDATE websub_subscriptions SET state = 'active', verified_at = $2, expires_at = $3 WHERE id = $1",
+                    subscription_id, subscription['verified_at'], subscription['expires_at']
+                )
+            elif mode == 'unsubscribe' and subscription['state'] == 'unsubscribing':
+                await conn.execute("DELETE FROM websub_subscriptions WHERE id = $1", subscription_id)
+                self.subscriptions.pop(subscription['url'], None)
+                return params.get('hub.challenge', '')
+            else:
+                return None
+        self.subscriptions[subscription['url']] = subscription
+        return '' if mode == 'denied' else params.get('hub.challenge', '')
+
+    async def receive(self, pool, subscription_id, body, signature):
+        """
+        Checks a content delivery.
+
+        :return: The feed url the delivery belongs to, '' for deliveries that must be
+            acknowledged but ignored, or None for unknown subscriptions.
+        """
+        subscription = await self.get(pool, subscription_id)
+        if subscription is None or subscription['state'] not in ('active', 'unsubscribing'):
+            WEBSUB_NOTIFICATIONS.inc("unknown")
+            return None
+        algorithm, _, digest = (signature or '').partition('=')
+        hash_function = SIGNATURE_ALGORITHMS.get(algorithm.lower())
+        expected = hmac.new(subscription['secret'].encode(), body, hash_function).hexdigest() if hash_function else None
+        if expected is None or not hmac.compare_digest(expected, digest.strip().lower()):
+            WEBSUB_NOTIFICATIONS.inc("bad_signature")
+            return ''
+        WEBSUB_NOTIFICATIONS.inc("accepted")
+        async with pool.acquire() as conn:
+            await conn.execute("UPDATE websub_subscriptions SET last_push_at = $2 WHERE id = $1", subscription_id, now())
+        return subscription['url']
+
+    async def renew(self, pool):
+        """Renews leases running out soon and drops the subscriptions of feeds that were removed."""
+        async with pool.acquire() as conn:
+            orphaned = {row['url'] for row in await conn.fetch(
+                "SELECT url FROM websub_subscriptions s WHERE NOT EXISTS (SELECT 1 FROM feeds WHERE feeds.url = s.url)"
+            )}
+        renewals = []
+        for url, subscription in list(self.subscriptions.items()):
+            if url in orphaned:
+                if subscription['state'] == 'active':
+                    renewals.append(self.unsubscribe(pool, subscription))
+                elif subscription['state'] != 'unsubscribing':
+                    async with pool.acquire() as conn:
+                        await conn.execute("DELETE FROM websub_subscriptions WHERE id = $1", subscription['id'])
+                    del self.subscriptions[url]
+            elif subscription['state'] == 'active' and subscription['expires_at'] - now() < self.renew_before:
+                renewals.append(self.subscribe(pool, url, subscription['hub'], subscription['topic']))
+        await asyncio.gather(*renewals)
+
+    def start(self, pool):
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self.run(pool))
+
+    async def run(self, pool):
+        while True:
+            try:
+                await self.load(pool)
+                await self.renew(pool)
+            except Exception as e:
+                print(f"WebSub lease renewal failed: {e}")
+            await asyncio.sleep(self.check_interval)
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        if self.session is not None:
+            await self.session.close()